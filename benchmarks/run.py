@@ -0,0 +1,369 @@
+"""Time and memory-profile every pipeline stage on synthetic panels.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.run --sizes 1000 10000 --output bench.json
+    python -m benchmarks.run --sizes 1000 --compare bench.json
+
+Results are written as JSON with one record per panel size, stage and model,
+together with the commit and configuration hash they were measured at, so runs
+of different commits can be compared with ``--compare``.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_panel
+from src import config
+from src.helper.utils import config_hash, get_freq
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("load", "eda", "features", "models", "metrics")
+DEFAULT_MODELS = (
+    "naive",
+    "seasonal_naive",
+    "mean",
+    "drift",
+    "croston",
+    "croston_sba",
+    "tsb",
+    "adida",
+    "lightgbm",
+)
+
+
+def profile(fn, *args, trace_memory=True, **kwargs):
+    """Run ``fn`` and measure its wall time and peak traced memory.
+
+    Args:
+        fn (callable): Function to run.
+        trace_memory (bool): Trace allocations with ``tracemalloc``. Slows down
+            allocation-heavy Python code, but numpy buffers are traced cheaply.
+
+    Returns:
+        tuple: (result, measurements) with "wall_time" in seconds and "peak_mb",
+            None when memory is not traced.
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        wall_time = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+    return result, {"wall_time": wall_time, "peak_mb": peak}
+
+
+def _split(df, horizon):
+    """Hold out the last ``horizon`` periods of the panel."""
+    offset = pd.tseries.frequencies.to_offset(
+        get_freq(config.FORECASTING_CONFIG["interval"])
+    )
+    cutoff = df["ds"].max() - horizon * offset
+    return df[df["ds"] <= cutoff], df[df["ds"] > cutoff]
+
+
+def _run_model(train, model_name, horizon, n_jobs):
+    from src.models.model_run import model_run
+
+    id_col = config.FORECASTING_CONFIG["partition_dim"]
+    reference = None
+    if model_name == "cold_start":
+        short = train["kind"] == "short"
+        reference, train = train[~short], train[short]
+    columns = [id_col, "ds", config.FORECASTING_CONFIG["target"]]
+    if model_name == "cold_start":
+        columns += config.FORECASTING_CONFIG["cold_start"]["attributes"]
+    forecasts, _ = model_run(
+        train[columns], model_name, horizon, n_jobs=n_jobs, reference=reference
+    )
+    return forecasts
+
+
+def benchmark_size(
+    n_series, length, horizon, models, stages, n_jobs, trace_memory=True
+):
+    """Benchmark the requested stages on one synthetic panel.
+
+    Args:
+        n_series (int): Number of series of the panel.
+        length (int): Periods of the longest series.
+        horizon (int): Periods forecast by the models.
+        models (list): Models timed in the "models" stage.
+        stages (list): Stages to run, a subset of ``STAGES``.
+        n_jobs (int): Worker processes for the models.
+        trace_memory (bool): Measure peak memory with ``tracemalloc``.
+
+    Returns:
+        list: One record per stage and model.
+    """
+    from src.data.etl import load_data, save_data
+    from src.helper.metrics import evaluate
+    from src.models.feature_engineering import FeatureEngineering
+    from src.models.model_run import identify_timeseries
+
+    run_config = config.FORECASTING_CONFIG
+    id_col = run_config["partition_dim"]
+    target_col = run_config["target"]
+    records = []
+
+    def _record(stage, measurements, model=None, n_rows=None):
+        record = {
+            "n_series": n_series,
+            "stage": stage,
+            "model": model,
+            "n_rows": n_rows,
+            **measurements,
+        }
+        if n_rows:
+            record["rows_per_sec"] = n_rows / max(measurements["wall_time"], 1e-9)
+        records.append(record)
+        logger.info(
+            f"{n_series} series | {stage}{f' {model}' if model else ''}: "
+            f"{measurements['wall_time']:.3f}s, peak {measurements['peak_mb']} MB"
+        )
+
+    df, measurements = profile(
+        generate_panel, n_series, length, trace_memory=trace_memory
+    )
+    _record("generate", measurements, n_rows=len(df))
+
+    if "load" in stages:
+        with tempfile.TemporaryDirectory() as directory:
+            save_data(df, directory)
+            df, measurements = profile(load_data, directory, trace_memory=trace_memory)
+        _record("load", measurements, n_rows=len(df))
+
+    if "eda" in stages:
+        _, measurements = profile(
+            identify_timeseries,
+            df[[id_col, "ds", target_col]],
+            trace_memory=trace_memory,
+        )
+        _record("eda", measurements, n_rows=len(df))
+
+    if "features" in stages:
+        _, measurements = profile(
+            FeatureEngineering().transform,
+            df[[id_col, "ds", target_col]],
+            trace_memory=trace_memory,
+        )
+        _record("features", measurements, n_rows=len(df))
+
+    train, test = _split(df, horizon)
+    scored = test[[id_col, "ds", target_col]]
+    forecast_cols = []
+    if "models" in stages:
+        for model_name in models:
+            try:
+                forecasts, measurements = profile(
+                    _run_model,
+                    train,
+                    model_name,
+                    horizon,
+                    n_jobs,
+                    trace_memory=trace_memory,
+                )
+            except Exception as e:
+                logger.warning(f"{model_name} failed on {n_series} series: {e}")
+                continue
+            _record("models", measurements, model=model_name, n_rows=len(train))
+            scored = scored.merge(forecasts, on=[id_col, "ds"], how="left")
+            forecast_cols.append(model_name)
+
+    if "metrics" in stages and forecast_cols:
+        _, measurements = profile(
+            evaluate,
+            scored,
+            forecast_cols,
+            id_col=id_col,
+            target_col=target_col,
+            train=train,
+            trace_memory=trace_memory,
+        )
+        _record("metrics", measurements, n_rows=len(scored) * len(forecast_cols))
+    return records
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    sizes,
+    length=120,
+    horizon=14,
+    models=DEFAULT_MODELS,
+    stages=STAGES,
+    n_jobs=None,
+    trace_memory=True,
+):
+    """Benchmark every panel size and collect the results with their context.
+
+    Returns:
+        dict: Run metadata and the list of "results" records.
+    """
+    if n_jobs is None:
+        n_jobs = config.FORECASTING_CONFIG["execution"]["n_jobs"]
+    results = []
+    for n_series in sizes:
+        results.extend(
+            benchmark_size(
+                n_series, length, horizon, models, stages, n_jobs, trace_memory
+            )
+        )
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "commit": _commit(),
+        "config_hash": config_hash(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": config.SEED,
+        "settings": {
+            "sizes": list(sizes),
+            "length": length,
+            "horizon": horizon,
+            "n_jobs": n_jobs,
+            "trace_memory": trace_memory,
+        },
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": usage / 1024,
+        "max_child_rss_mb": children / 1024,
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2, min_seconds=0.05):
+    """Find stages that got slower or use more memory than in a baseline run.
+
+    Args:
+        current (dict): Output of ``run_benchmarks``.
+        baseline (dict): Earlier output of ``run_benchmarks``.
+        tolerance (float): Relative increase reported as a regression.
+        min_seconds (float): Stages faster than this in both runs are ignored,
+            their timings being mostly noise.
+
+    Returns:
+        list: One dict per regression with both values and their ratio.
+    """
+
+    def _key(record):
+        return record["n_series"], record["stage"], record["model"]
+
+    before = {_key(record): record for record in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        old = before.get(_key(record))
+        if old is None:
+            continue
+        for metric in ("wall_time", "peak_mb"):
+            new_value, old_value = record.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            if metric == "wall_time" and max(new_value, old_value) < min_seconds:
+                continue
+            ratio = new_value / old_value
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    {
+                        "n_series": record["n_series"],
+                        "stage": record["stage"],
+                        "model": record["model"],
+                        "metric": metric,
+                        "baseline": old_value,
+                        "current": new_value,
+                        "ratio": ratio,
+                    }
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--length", type=int, default=120)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        help='Models to time, "all" for every model',
+    )
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    models = args.models
+    if models == ["all"]:
+        from src.models.model_run import MODELS
+
+        models = list(MODELS)
+
+    report = run_benchmarks(
+        args.sizes,
+        args.length,
+        args.horizon,
+        models,
+        args.stages,
+        args.n_jobs,
+        not args.no_memory,
+    )
+    output = args.output or (
+        config.OUTPUT_DIR / "benchmarks" / f"{report['commit'] or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    logger.info(f"Wrote {len(report['results'])} results to {output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            report, json.loads(args.compare.read_text()), args.tolerance
+        )
+        for r in regressions:
+            logger.warning(
+                f"Regression: {r['n_series']} series | {r['stage']} "
+                f"{r['model'] or ''} {r['metric']} {r['baseline']:.3f} -> "
+                f"{r['current']:.3f} ({r['ratio']:.2f}x)"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
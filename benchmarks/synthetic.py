@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import get_freq, get_season_length
+
+KINDS = ("smooth", "seasonal", "intermittent", "short")
+DEFAULT_MIX = {"smooth": 0.3, "seasonal": 0.4, "intermittent": 0.2, "short": 0.1}
+
+
+def _generate_chunk(rng, kinds, length, season_length, min_history):
+    """Values of a chunk of series as a (n_series, length) matrix, NaN before launch."""
+    n_series = len(kinds)
+    t = np.arange(length)[None, :]
+    level = rng.lognormal(3.0, 1.0, (n_series, 1))
+    trend = rng.normal(0.0, 0.002, (n_series, 1))
+    noise = rng.normal(0.0, 0.1, (n_series, length))
+    values = level * (1 + trend * t + noise)
+
+    seasonal = (kinds == "seasonal") | (kinds == "short")
+    amplitude = rng.uniform(0.1, 0.5, (n_series, 1))
+    phase = rng.uniform(0, 2 * np.pi, (n_series, 1))
+    cycle = amplitude * np.sin(2 * np.pi * t / season_length + phase)
+    values = np.where(seasonal[:, None], values + level * cycle, values)
+
+    intermittent = kinds == "intermittent"
+    occurrence = rng.uniform(0.05, 0.4, (n_series, 1))
+    demand = rng.random((n_series, length)) < occurrence
+    sizes = rng.gamma(2.0, level / 4, (n_series, length))
+    values = np.where(intermittent[:, None], np.where(demand, sizes, 0.0), values)
+    values = np.maximum(values, 0.0).round(2)
+
+    # Short series launched shortly before the end of the panel
+    launch = np.zeros(n_series, dtype=np.int64)
+    short = kinds == "short"
+    launch[short] = length - rng.integers(
+        1, max(min(min_history, length), 2), short.sum()
+    )
+    values[t < launch[:, None]] = np.nan
+    return values
+
+
+def generate_panel(
+    n_series,
+    length=120,
+    mix=None,
+    start="2022-01-01",
+    interval=None,
+    seed=None,
+    chunk_size=50_000,
+):
+    """Generate a seeded long-format panel with a mix of series behaviours.
+
+    "smooth" series are noisy levels with a small trend, "seasonal" ones add a
+    cycle of the interval's season length, "intermittent" ones are mostly
+    zero with gamma-distributed demand sizes and "short" ones are seasonal
+    series launched fewer than ``min_history`` periods before the end.
+
+    Args:
+        n_series (int): Number of series.
+        length (int): Periods of the longest series.
+        mix (dict, optional): Share of every kind of series. Defaults to
+            ``DEFAULT_MIX``.
+        start (str): First timestamp of the panel.
+        interval (str, optional): Interval of the timestamps. Defaults to the
+            configured interval.
+        seed (int, optional): Random seed. Defaults to ``SEED``.
+        chunk_size (int): Series generated at a time, bounding peak memory.
+
+    Returns:
+        pd.DataFrame: Columns ``partition_dim``, "ds", ``target``, "kind" and
+            "category", sorted by series and timestamp. IDs and kinds are
+            categorical.
+    """
+    run_config = config.FORECASTING_CONFIG
+    interval = interval or run_config["interval"]
+    mix = mix or DEFAULT_MIX
+    rng = np.random.default_rng(config.SEED if seed is None else seed)
+    season_length = get_season_length(interval)
+    min_history = run_config["eda"]["min_history"]
+
+    shares = np.array([mix.get(kind, 0.0) for kind in KINDS], dtype=np.float64)
+    kind_codes = rng.choice(len(KINDS), n_series, p=shares / shares.sum())
+    kinds = np.array(KINDS)[kind_codes]
+    dates = pd.date_range(start, periods=length, freq=get_freq(interval))
+    width = len(str(n_series - 1))
+    # Categorical like the columns of ``load_data``, so a million IDs stay cheap
+    ids = np.char.add("s", np.char.zfill(np.arange(n_series).astype(str), width))
+    frames = []
+    for first in range(0, n_series, chunk_size):
+        values = _generate_chunk(
+            rng, kinds[first : first + chunk_size], length, season_length, min_history
+        )
+        observed = ~np.isnan(values)
+        rows, cols = np.nonzero(observed)
+        series = first + rows
+        frames.append(
+            pd.DataFrame(
+                {
+                    run_config["partition_dim"]: pd.Categorical.from_codes(
+                        series, categories=ids
+                    ),
+                    "ds": dates[cols],
+                    run_config["target"]: values[observed],
+                    "kind": pd.Categorical.from_codes(
+                        kind_codes[series], categories=KINDS
+                    ),
+                    "category": (series % 20).astype(np.int16),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
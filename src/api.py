@@ -0,0 +1,72 @@
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from src.models.inference_service import InferenceService
+
+
+class ForecastRequest(BaseModel):
+    model: str
+    series: List[str]
+    horizon: int = 1
+    run_id: Optional[str] = None
+
+
+class PrecomputeRequest(BaseModel):
+    model: str
+    horizon: int
+    run_id: Optional[str] = None
+
+
+def create_app(service=None):
+    """Build the HTTP inference service.
+
+    Args:
+        service (InferenceService, optional): Service the endpoints delegate to.
+            Defaults to a service on the configured model registry.
+
+    Returns:
+        FastAPI: The application, e.g. ``uvicorn src.api:app``.
+    """
+    service = service or InferenceService()
+    app = FastAPI(title="forecast-anything")
+
+    @app.post("/forecast")
+    async def forecast(request: ForecastRequest):
+        try:
+            forecasts = await service.predict(
+                request.model, request.series, request.horizon, request.run_id
+            )
+        except (KeyError, FileNotFoundError) as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        forecasts["ds"] = forecasts["ds"].astype(str)
+        return forecasts.to_dict(orient="records")
+
+    @app.post("/precompute")
+    def precompute(request: PrecomputeRequest):
+        try:
+            service.precompute(request.model, request.horizon, request.run_id)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return {"status": "ok"}
+
+    @app.post("/refresh/{model}")
+    def refresh(model: str):
+        service.refresh(model)
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    def stats():
+        return service.stats()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+app = create_app()
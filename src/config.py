@@ -15,12 +15,118 @@ LOG_DIR = PROJECT_DIR / "logs"
 # --- Unified Forecasting Configuration ---
 FORECASTING_CONFIG = {
     "num_trails": 200,
-    "target": "",
-    "partition_dim": "",  # Dimension which defines the splits of dims
+    "target": "y",
+    "partition_dim": "unique_id",  # Dimension which defines the splits of dims
     "interval": "day",
+    "execution": {
+        "n_jobs": -1,  # Worker processes for per-series models, -1 uses all cores
+        "chunk_size": 500,  # Series per task sent to a worker
+    },
+    "cache": {
+        "enabled": True,  # Reuse stage outputs of unchanged data, config and code
+        "max_bytes": 10 * 2**30,  # Least recently used entries evicted beyond this
+    },
+    "tuning": {
+        "n_jobs": 4,  # Trials evaluated in parallel per series
+        "patience": 30,  # Stop after this many trials without improvement
+        "n_folds": 3,  # Rolling-origin holdouts each trial is scored on
+    },
+    "backtest": {
+        "n_folds": 3,  # Forecast origins evaluated per series
+        "step": None,  # Periods between origins, defaults to the horizon
+        "window": "expanding",  # "expanding" or "rolling" training window
+        "window_size": None,  # Periods kept by a rolling window
+    },
+    "selection": {
+        "enabled": False,  # Blend every bucket's models by their holdout scores
+        "strategy": "ensemble",  # "select" the best model or "ensemble" the top_k
+        "top_k": 3,  # Models blended per series by inverse holdout error
+        "n_folds": 1,  # Holdouts every candidate is scored on
+        "metric": "mae",  # Used by buckets without a "metric"
+    },
+    "serving": {
+        "max_models": 8,  # Models kept loaded in the LRU cache
+        "max_batch_size": 256,  # Requests coalesced into one predict call
+        "max_wait_ms": 5,  # Longest a request waits for its batch to fill
+        "latency_window": 10_000,  # Requests the latency percentiles cover
+    },
+    "update": {
+        "refit_every": 7,  # Incremental updates between full re-estimations
+        "drift_threshold": 3.0,  # Error ratio at which a series counts as drifted
+        "drift_share": 0.1,  # Share of drifted series that triggers a refit
+        "error_smoothing": 0.1,  # Weight of the newest error in the error average
+    },
+    "monitoring": {
+        "n_bins": 10,  # Quantile bins of the per-series value histograms
+        "fast_smoothing": 0.1,  # Weight of the newest error in the recent error
+        "slow_smoothing": 0.01,  # Weight of the newest error in the usual error
+        "histogram_smoothing": 0.02,  # Weight of the newest value in the histogram
+        "degrade_ratio": 1.5,  # Recent over usual error that flags a series
+        "psi_threshold": 0.2,  # Population stability index that flags drift
+        "min_obs": 14,  # Observations a series needs before it can be flagged
+    },
+    "hierarchy": {
+        # "bottom_up", "top_down", "ols", "wls_struct" or "mint"
+        "method": "mint",
+        "total": True,  # Add a node summing every series
+    },
+    "cold_start": {
+        "attributes": [],  # Columns describing a series, e.g. category or price
+        "curve_length": 90,  # Periods after launch kept per launch curve
+        "k": 10,  # Analogues blended per new series
+        "n_lists": None,  # Lists of the nearest neighbour index, None for sqrt(n)
+        "n_probe": 8,  # Lists scanned per lookup
+        "shrinkage": 3,  # Observed periods at which own and analogue scale weigh equal
+    },
+    "neural": {
+        "input_size": 56,  # Periods the network looks back
+        "horizon": 14,  # Periods forecast at once, longer horizons are recursive
+        "hidden_size": 256,
+        "n_blocks": 3,
+        "n_layers": 2,
+        "batch_size": 1024,  # Windows per training step
+        "inference_batch_size": 8192,  # Series per forward pass when forecasting
+        "learning_rate": 1e-3,
+        "max_steps": 2000,
+        "val_check_steps": 50,  # Training steps between validation checks
+        "patience": 5,  # Validation checks without improvement before stopping
+        "intra_op_threads": None,  # Threads per torch op, None for the default
+        "inter_op_threads": 1,  # Torch ops run in parallel
+    },
+    "probabilistic": {
+        "quantiles": [0.1, 0.5, 0.9],  # Levels forecast by the "quantile" inference
+        "n_paths": 1000,  # Bootstrap paths per intermittent series
+        "max_path_elements": 20_000_000,  # Path values held in memory at once
+    },
+    "lightgbm": {
+        "num_boost_round": 500,
+        "params": {
+            "objective": "regression",
+            "learning_rate": 0.05,
+            "num_leaves": 63,
+            "min_data_in_leaf": 20,
+            "feature_fraction": 0.9,
+            "verbose": -1,
+        },
+    },
+    "llm_features": {
+        "max_concurrency": 8,  # LLM calls in flight at once
+        "max_retries": 3,  # Retries of a failed call, with exponential backoff
+        "requests_per_minute": 500,
+        "tokens_per_minute": 200_000,
+        "token_budget": None,  # Optional cap on the tokens spent by one run
+    },
     "eda": {
-        "correlation_threshold": 0.8,
+        "correlation_threshold": 0.8,  # Features correlated above are redundant
         "zero_threshold": 0.6, # Threshold to identify intermittent series
+        "min_history": 28,  # Series with fewer observations are new products
+        "seasonality_threshold": 0.3,  # Minimum autocorrelation of a seasonal period
+        "max_season_length": 366,  # Longest seasonal period searched for
+        "n_lags": 28,  # Lags of the ACF and PACF in the EDA report
+        "n_plots": 12,  # Sampled series plotted in the EDA report
+        "max_cross_lag": 14,  # Longest lag of the feature cross-correlations
+        "granger_lags": [1, 7],  # Orders of the Granger causality tests
+        "granger_alpha": 0.05,  # Significance level of the Granger tests
     },
     "feature_engineering": {
         "lags": [1, 7, 14],
@@ -37,11 +143,12 @@ FORECASTING_CONFIG = {
             # For series with many zero values.
             "models": ["croston", "adida"],
             "metric": ["mae", "mase"],
-            "inference": ["point"],
+            "inference": ["point"],  # Add "quantile" for probabilistic forecasts
+            "params": {"alpha": 0.1, "beta": 0.1},
         },
         "new_product": {
             # Cold start for newly launched products.
-            "models": [],
+            "models": ["cold_start"],
         },
     },
 }
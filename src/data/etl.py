@@ -1,5 +1,206 @@
+import logging
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Largest integer a float32 represents exactly
+FLOAT32_EXACT_INT = 2**24
+
+
+def _dataset(path, file_format=None, partitioning="hive"):
+    """Open a Parquet or CSV file or directory as a pyarrow dataset."""
+    path = Path(path)
+    if file_format is None:
+        files = [path] if path.is_file() else path.rglob("*")
+        first = next((file for file in files if file.is_file()), path)
+        file_format = "csv" if ".csv" in first.suffixes else "parquet"
+    return ds.dataset(path, format=file_format, partitioning=partitioning)
+
+
+def _scalar(value, field_type):
+    """Convert a filter bound to the type of the column it is compared with."""
+    timestamp = pd.Timestamp(value)
+    if pa.types.is_timestamp(field_type):
+        if field_type.tz is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize(field_type.tz)
+        return pa.scalar(timestamp, type=field_type)
+    if pa.types.is_date(field_type):
+        return pa.scalar(timestamp.date(), type=field_type)
+    return pa.scalar(timestamp.strftime("%Y-%m-%d"), type=field_type)
+
+
+def _build_filter(dataset, id_col, time_col, start=None, end=None, series=None):
+    """Build the pushdown filter on the date range and series subset.
+
+    Filters on partition columns prune whole files before anything is read.
+    """
+    expression = None
+
+    def _and(condition):
+        return condition if expression is None else expression & condition
+
+    if start is not None or end is not None:
+        field_type = dataset.schema.field(time_col).type
+        if start is not None:
+            expression = _and(ds.field(time_col) >= _scalar(start, field_type))
+        if end is not None:
+            expression = _and(ds.field(time_col) <= _scalar(end, field_type))
+    if series is not None:
+        field_type = dataset.schema.field(id_col).type
+        values = pa.array(list(series)).cast(field_type)
+        expression = _and(ds.field(id_col).isin(values))
+    return expression
+
+
+def _downcast(table, id_col, target_col):
+    """Choose compact dtypes at read time.
+
+    IDs and strings become categoricals with sorted categories, integers are
+    downcast to the smallest type holding their range, and floats to float32
+    when every value survives the round trip exactly.
+    The target never goes below float32 and only becomes float32 when it holds
+    integers float32 represents exactly, so sales values are never rounded.
+    """
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        kind = column.type
+        is_string = pa.types.is_string(kind) or pa.types.is_large_string(kind)
+        if name == id_col or is_string:
+            columns.append(pc.dictionary_encode(column))
+            continue
+        if not (pa.types.is_integer(kind) or pa.types.is_floating(kind)):
+            columns.append(column)
+            continue
+
+        low, high = (value.as_py() for value in pc.min_max(column).values())
+        if low is None:
+            columns.append(column)
+        elif pa.types.is_integer(kind):
+            for candidate in (pa.int8(), pa.int16(), pa.int32(), pa.int64()):
+                info = np.iinfo(candidate.to_pandas_dtype())
+                if info.min <= low and high <= info.max:
+                    column = column.cast(candidate)
+                    break
+            columns.append(column)
+        elif kind.bit_width <= 32:
+            columns.append(column)
+        elif name == target_col:
+            integral = pc.all(pc.equal(pc.floor(column), column)).as_py()
+            bounded = max(abs(low), abs(high)) < FLOAT32_EXACT_INT
+            exact = integral and bounded
+            columns.append(column.cast(pa.float32()) if exact else column)
+        else:
+            narrow = column.cast(pa.float32())
+            round_trip = pc.equal(narrow.cast(kind), column)
+            exact = pc.all(pc.or_(round_trip, pc.is_nan(column))).as_py()
+            columns.append(narrow if exact else column)
+    return pa.table(columns, names=table.column_names)
+
+
+def _to_pandas(table, id_col, target_col):
+    df = _downcast(table, id_col, target_col).to_pandas()
+    # Dictionaries list values in order of appearance. Sorted categories keep
+    # the order of sorting by a column the same as sorting by its values.
+    for name in df.select_dtypes("category"):
+        categories = df[name].cat.categories
+        df[name] = df[name].cat.reorder_categories(categories.sort_values())
+    return df
+
+
+def load_data(
+    path,
+    start=None,
+    end=None,
+    series=None,
+    columns=None,
+    id_col=None,
+    time_col="ds",
+    target_col=None,
+    file_format=None,
+):
+    """Load a Parquet or CSV dataset, optionally hive-partitioned by series and date.
+
+    Args:
+        path (str or Path): File or directory of the dataset.
+        start (str or datetime, optional): First date to load, inclusive.
+        end (str or datetime, optional): Last date to load, inclusive.
+        series (list, optional): Series IDs to load.
+        columns (list, optional): Columns to load. Defaults to all columns.
+        id_col (str, optional): Series column. Defaults to ``partition_dim``.
+        time_col (str, optional): Timestamp column. Defaults to "ds".
+        target_col (str, optional): Target column. Defaults to ``target``.
+        file_format (str, optional): "parquet" or "csv", inferred from the files.
+
+    Returns:
+        pd.DataFrame: Loaded data with compact dtypes.
+    """
+    id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+    target_col = target_col or config.FORECASTING_CONFIG["target"]
+
+    dataset = _dataset(path, file_format)
+    expression = _build_filter(dataset, id_col, time_col, start, end, series)
+    table = dataset.to_table(columns=columns, filter=expression)
+    logger.info(f"Loaded {table.num_rows} rows from {path}")
+    return _to_pandas(table, id_col, target_col)
+
+
+def iter_partitions(
+    path,
+    start=None,
+    end=None,
+    series=None,
+    columns=None,
+    id_col=None,
+    time_col="ds",
+    target_col=None,
+    file_format=None,
+):
+    """Stream a dataset one partition at a time.
+
+    Takes the same arguments as ``load_data``. Only one partition is held in
+    memory at a time, so datasets larger than RAM can be processed. Partitions
+    are the dataset's files, so a hive-partitioned dataset yields one frame per
+    partition directory.
+
+    Yields:
+        pd.DataFrame: Rows of one partition with compact dtypes.
+    """
+    id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+    target_col = target_col or config.FORECASTING_CONFIG["target"]
+
+    dataset = _dataset(path, file_format)
+    expression = _build_filter(dataset, id_col, time_col, start, end, series)
+    for fragment in dataset.get_fragments(filter=expression):
+        scanner = ds.Scanner.from_fragment(
+            fragment, schema=dataset.schema, columns=columns, filter=expression
+        )
+        table = scanner.to_table()
+        if table.num_rows:
+            yield _to_pandas(table, id_col, target_col)
+
 
+def save_data(df, path, partition_cols=None, file_format="parquet"):
+    """Write a frame as a dataset, hive-partitioned by ``partition_cols``.
 
-def load_data(path):
-    pass
+    Args:
+        df (pd.DataFrame): Data to write.
+        path (str or Path): Output directory.
+        partition_cols (list, optional): Columns to partition the files by.
+        file_format (str): "parquet" or "csv".
+    """
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        path,
+        format=file_format,
+        partitioning=partition_cols,
+        partitioning_flavor="hive" if partition_cols else None,
+        existing_data_behavior="overwrite_or_ignore",
+    )
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from typing import List
 
+from pydantic import BaseModel, Field
 
 
 class NewsFeatures(BaseModel):
@@ -0,0 +1,244 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import stable_hash
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Hash of the source files of the ``src`` package, computed once per process.
+
+    Any edit to the code, committed or not, changes the version and so every
+    cache key, so results of old code are never reused.
+    """
+    digest = hashlib.sha256()
+    root = config.PROJECT_DIR / "src"
+    for path in sorted(root.rglob("*.py")):
+        digest.update(str(path.relative_to(root)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def fingerprint(df):
+    """Content hash of a frame's values, index, column names and dtypes.
+
+    Args:
+        df (pd.DataFrame): Frame to hash.
+
+    Returns:
+        str: First 16 hex digits of the SHA-256 of the row hashes.
+    """
+    digest = hashlib.sha256()
+    layout = [list(map(str, df.columns)), list(map(str, df.dtypes))]
+    digest.update(json.dumps(layout).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _list_columns(df):
+    """Object columns holding lists, which Parquet returns as arrays."""
+    columns = []
+    for column in df.select_dtypes(object):
+        values = df[column].dropna()
+        if len(values) and isinstance(values.iloc[0], list):
+            columns.append(column)
+    return columns
+
+
+class StageCache:
+    """Content-addressed store of pipeline stage outputs with LRU eviction.
+
+    A stage's key hashes its input data, the ``FORECASTING_CONFIG`` sections it
+    depends on, its parameters and the code version, so a stage is only
+    recomputed when one of them changes. Every entry is a directory under
+    ``OUTPUT_DIR/cache`` holding frames as Parquet and arrays as ``.npy``. It is
+    written to a temporary directory and renamed into place, so a crashed run
+    leaves either a complete entry or none and a rerun resumes from the last
+    completed stage. The least recently used entries are evicted once the cache
+    grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        """
+        Args:
+            path (str or Path, optional): Root directory of the cache. Defaults to
+                ``OUTPUT_DIR/cache``.
+            max_bytes (int, optional): Size the cache is evicted down to.
+                Defaults to the ``cache`` configuration.
+        """
+        self.path = Path(path or config.OUTPUT_DIR / "cache")
+        self.max_bytes = max_bytes or config.FORECASTING_CONFIG["cache"]["max_bytes"]
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, stage, inputs=(), sections=(), params=None):
+        """Key of a stage run.
+
+        Args:
+            stage (str): Name of the stage, prefixed to the key.
+            inputs (list): Input frames, or their ``fingerprint`` when already
+                computed.
+            sections (list): Keys of ``FORECASTING_CONFIG`` the stage reads.
+            params (dict, optional): Other arguments the output depends on.
+
+        Returns:
+            str: "<stage>-<hash>".
+        """
+        run_config = config.FORECASTING_CONFIG
+        digest = stable_hash(
+            {
+                "inputs": [
+                    item if isinstance(item, str) else fingerprint(item)
+                    for item in inputs
+                ],
+                "config": {s: run_config.get(s) for s in sorted(set(sections))},
+                "params": params or {},
+                "code": code_version(),
+            }
+        )
+        return f"{stage}-{digest}"
+
+    def load(self, key):
+        """Stored output of ``key``, None on a miss. Marks the entry as used."""
+        entry = self.path / key
+        try:
+            manifest = json.loads((entry / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+        items = []
+        for item in manifest["items"]:
+            if item["kind"] == "frame":
+                value = pd.read_parquet(entry / item["file"])
+                # Parquet returns list cells as arrays
+                for column in item["list_columns"]:
+                    value[column] = value[column].map(list)
+            elif item["kind"] == "array":
+                value = np.load(entry / item["file"], allow_pickle=False)
+            else:
+                value = None
+            items.append(value)
+        os.utime(entry / MANIFEST)
+        return tuple(items) if manifest["tuple"] else items[0]
+
+    def save(self, key, value):
+        """Store a stage output, a frame, array, None or a tuple of them.
+
+        An existing entry of ``key`` is replaced.
+        """
+        is_tuple = isinstance(value, tuple)
+        tmp = self.path / f".tmp-{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True)
+        try:
+            items = []
+            for i, item in enumerate(value if is_tuple else (value,)):
+                if isinstance(item, pd.DataFrame):
+                    file = f"{i}.parquet"
+                    item.to_parquet(tmp / file)
+                    items.append(
+                        {
+                            "kind": "frame",
+                            "file": file,
+                            "list_columns": _list_columns(item),
+                        }
+                    )
+                elif isinstance(item, np.ndarray):
+                    file = f"{i}.npy"
+                    np.save(tmp / file, item, allow_pickle=False)
+                    items.append({"kind": "array", "file": file})
+                elif item is None:
+                    items.append({"kind": "none"})
+                else:
+                    raise TypeError(f"Cannot cache {type(item).__name__} outputs")
+            (tmp / MANIFEST).write_text(
+                json.dumps({"tuple": is_tuple, "items": items}, indent=2)
+            )
+            target = self.path / key
+            if target.exists():
+                # Updated entries replace the stored one, which is removed after
+                stale = self.path / f".tmp-{uuid.uuid4().hex}"
+                os.replace(target, stale)
+                shutil.rmtree(stale, ignore_errors=True)
+            os.replace(tmp, target)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Fine if another run stored the same entry first
+            if not (self.path / key / MANIFEST).exists():
+                logger.warning(f"Could not cache {key}: {e}")
+                return
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+
+    def run(self, stage, fn, *args, inputs=(), sections=(), params=None, **kwargs):
+        """Return the stored output of a stage, computing and storing it on a miss.
+
+        Args:
+            stage (str): Name of the stage.
+            fn (callable): Computes the stage from ``*args`` and ``**kwargs``.
+            inputs (list): Input frames or fingerprints the output depends on.
+            sections (list): Keys of ``FORECASTING_CONFIG`` the stage reads.
+            params (dict, optional): Other arguments the output depends on.
+
+        Returns:
+            The output of ``fn``.
+        """
+        key = self.key(stage, inputs, sections, params)
+        value = self.load(key)
+        if value is not None:
+            self.hits += 1
+            logger.info(f"Cache hit for {key}")
+            return value
+        self.misses += 1
+        value = fn(*args, **kwargs)
+        self.save(key, value)
+        return value
+
+    def entries(self):
+        """Stored entries as a frame of key, size in bytes and last use."""
+        rows = []
+        if self.path.exists():
+            for entry in self.path.iterdir():
+                manifest = entry / MANIFEST
+                if entry.name.startswith(".") or not manifest.exists():
+                    continue
+                rows.append(
+                    {
+                        "key": entry.name,
+                        "bytes": sum(f.stat().st_size for f in entry.iterdir()),
+                        "last_used": manifest.stat().st_mtime,
+                    }
+                )
+        return pd.DataFrame(rows, columns=["key", "bytes", "last_used"])
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache fits ``max_bytes``.
+
+        Args:
+            keep (str, optional): Key never evicted, e.g. the entry just stored.
+
+        Returns:
+            list: Keys of the evicted entries.
+        """
+        entries = self.entries().sort_values("last_used", ascending=False)
+        over = entries["bytes"].cumsum() > self.max_bytes
+        evicted = [key for key in entries.loc[over, "key"] if key != keep]
+        for key in evicted:
+            shutil.rmtree(self.path / key, ignore_errors=True)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} cache entries")
+        return evicted
@@ -1,61 +1,432 @@
 import numpy as np
+import pandas as pd
+
+from src.helper.utils import quantile_column
+
+# Metrics understood by every scoring function in this module
+METRICS = ("mae", "rmse", "mape", "wape", "bias", "rmsle", "mase", "rmsse")
+
+# Additive per-series statistics every metric is derived from. Because they are
+# sums, scores for a group or the whole panel come from adding them up.
+STATS = (
+    "n",
+    "sum_err",
+    "sum_abs_err",
+    "sum_sq_err",
+    "sum_abs_true",
+    "sum_ape",
+    "n_ape",
+    "sum_sq_log_err",
+    "n_scaled",
+    "sum_scaled_abs_err",
+    "sum_scaled_sq_err",
+)
+
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    return np.divide(num, den, out=out, where=den > 0)
+
+
+_FORMULAS = {
+    "mae": lambda s: _ratio(s["sum_abs_err"], s["n"]),
+    "rmse": lambda s: np.sqrt(_ratio(s["sum_sq_err"], s["n"])),
+    "mape": lambda s: _ratio(s["sum_ape"], s["n_ape"]),
+    "wape": lambda s: _ratio(s["sum_abs_err"], s["sum_abs_true"]),
+    "bias": lambda s: _ratio(s["sum_err"], s["sum_abs_true"]),
+    "rmsle": lambda s: np.sqrt(_ratio(s["sum_sq_log_err"], s["n"])),
+    "mase": lambda s: _ratio(s["sum_scaled_abs_err"], s["n_scaled"]),
+    "rmsse": lambda s: np.sqrt(_ratio(s["sum_scaled_sq_err"], s["n_scaled"])),
+}
+
+
+def in_sample_scale(y_train, seasonality=1):
+    """
+    Calculate the in-sample seasonal naive errors used to scale MASE and RMSSE
+    Args:
+        y_train (array-like): Training history, 1-D or (n_series, T) padded with NaN
+        seasonality (int): Seasonality period of the naive benchmark
+    Returns:
+        tuple: (scale_mae, scale_mse) per series, NaN where the history is too short
+    """
+    y_train = np.atleast_2d(np.asarray(y_train, dtype=np.float64))
+    diff = y_train[:, seasonality:] - y_train[:, :-seasonality]
+    valid = ~np.isnan(diff)
+    n = valid.sum(axis=1)
+    scale_mae = _ratio(np.where(valid, np.abs(diff), 0.0).sum(axis=1), n)
+    scale_mse = _ratio(np.where(valid, diff**2, 0.0).sum(axis=1), n)
+    return scale_mae, scale_mse
+
+
+def _pointwise(y_true, y_pred, scale_mae=None, scale_mse=None):
+    """Per-point contributions to ``STATS`` with missing points zeroed out."""
+    valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+    y_true = np.where(valid, y_true, 0.0)
+    y_pred = np.where(valid, y_pred, 0.0)
+    err = y_pred - y_true
+    abs_err = np.abs(err)
+    nonzero = valid & (y_true != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_err = np.log1p(np.maximum(y_pred, 0.0)) - np.log1p(np.maximum(y_true, 0.0))
+        ape = np.where(nonzero, abs_err / np.abs(y_true), 0.0)
+    points = {
+        "n": valid.astype(np.float64),
+        "sum_err": err,
+        "sum_abs_err": abs_err,
+        "sum_sq_err": err**2,
+        "sum_abs_true": np.abs(y_true),
+        "sum_ape": ape,
+        "n_ape": nonzero.astype(np.float64),
+        "sum_sq_log_err": np.where(valid, log_err**2, 0.0),
+    }
+    if scale_mae is None:
+        scale_mae = scale_mse = np.nan
+    scaled = valid & (scale_mae > 0) & (scale_mse > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        points["n_scaled"] = scaled.astype(np.float64)
+        points["sum_scaled_abs_err"] = np.where(scaled, abs_err / scale_mae, 0.0)
+        points["sum_scaled_sq_err"] = np.where(scaled, err**2 / scale_mse, 0.0)
+    return points
+
+
+def error_stats(y_true, y_pred, y_train=None, seasonality=1):
+    """
+    Calculate the additive error statistics of every series in a panel
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values with the same shape as y_true
+        y_train (array-like, optional): Training history used to scale MASE/RMSSE
+        seasonality (int): Seasonality period for the scaling benchmark
+    Returns:
+        dict: Array of shape (n_series,) for each entry of ``STATS``
+    """
+    y_true = np.atleast_2d(np.asarray(y_true, dtype=np.float64))
+    y_pred = np.atleast_2d(np.asarray(y_pred, dtype=np.float64))
+    if y_true.shape != y_pred.shape:
+        raise ValueError(f"Shape mismatch: {y_true.shape} vs {y_pred.shape}")
+
+    scale_mae = scale_mse = None
+    if y_train is not None:
+        scale_mae, scale_mse = in_sample_scale(y_train, seasonality)
+        scale_mae, scale_mse = scale_mae[:, None], scale_mse[:, None]
+    points = _pointwise(y_true, y_pred, scale_mae, scale_mse)
+    return {name: values.sum(axis=1) for name, values in points.items()}
+
+
+def metrics_from_stats(stats, metrics=METRICS):
+    """
+    Calculate metrics from (possibly aggregated) error statistics
+    Args:
+        stats (dict or pd.DataFrame): Entries of ``STATS``
+        metrics (list): Names of the metrics to compute
+    Returns:
+        dict: Metric values keyed by metric name
+    """
+    unknown = set(metrics) - set(_FORMULAS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+    return {metric: _FORMULAS[metric](stats) for metric in metrics}
+
+
+def _score(metric, y_true, y_pred, y_train=None, seasonality=1):
+    """Score one metric: a float for a single series, an array for a panel."""
+    single = np.ndim(y_true) == 1
+    stats = error_stats(y_true, y_pred, y_train, seasonality)
+    value = _FORMULAS[metric](stats)
+    return float(value[0]) if single else value
+
+
+def mae(y_true, y_pred):
+    """
+    Calculate the Mean Absolute Error (MAE)
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values
+    Returns:
+        float or np.ndarray: MAE value, per series for a panel
+    """
+    return _score("mae", y_true, y_pred)
+
+
+def rmse(y_true, y_pred):
+    """
+    Calculate the Root Mean Squared Error (RMSE)
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values
+    Returns:
+        float or np.ndarray: RMSE value, per series for a panel
+    """
+    return _score("rmse", y_true, y_pred)
+
+
+def mape(y_true, y_pred):
+    """
+    Calculate the Mean Absolute Percentage Error (MAPE), skipping zero actuals
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values
+    Returns:
+        float or np.ndarray: MAPE value as a fraction, per series for a panel
+    """
+    return _score("mape", y_true, y_pred)
+
+
+def bias(y_true, y_pred):
+    """
+    Calculate the forecast bias, sum of (forecast - actual) over sum of actuals
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values
+    Returns:
+        float or np.ndarray: Bias value, per series for a panel
+    """
+    return _score("bias", y_true, y_pred)
 
 
 def rmsle(y_true, y_pred):
     """
     Calculate the Root Mean Squared Logarithmic Error (RMSLE)
     Args:
-        y_true (array-like): True values
+        y_true (array-like): True values, 1-D or (n_series, horizon)
         y_pred (array-like): Predicted values
     Returns:
-        float: RMSLE value
+        float or np.ndarray: RMSLE value, per series for a panel
     """
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
-    log_true = np.log1p(y_true)
-    log_pred = np.log1p(y_pred)
-    squared_log_error = np.square(log_true - log_pred)
-    mean_squared_log_error = np.mean(squared_log_error)
-    rmsle_value = np.sqrt(mean_squared_log_error)
-
-    print("RMSLE:", rmsle_value)
-    return rmsle_value
+    return _score("rmsle", y_true, y_pred)
 
 
 def wape(y_true, y_pred):
     """
     Calculate the Weighted Absolute Percentage Error (WAPE)
     Args:
-        y_true (array-like): True values
+        y_true (array-like): True values, 1-D or (n_series, horizon)
         y_pred (array-like): Predicted values
     Returns:
-        float: WAPE value
+        float or np.ndarray: WAPE value, per series for a panel
     """
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
-    absolute_error = np.abs(y_true - y_pred)
-    wape_value = np.sum(absolute_error) / np.sum(np.abs(y_true))
+    return _score("wape", y_true, y_pred)
+
 
-    print("WAPE:", wape_value)
-    return wape_value
+def mase(y_true, y_pred, y_train, seasonality=1):
+    """
+    Calculate the Mean Absolute Scaled Error (MASE)
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        y_pred (array-like): Predicted values
+        y_train (array-like): Training history the errors are scaled by
+        seasonality (int): Seasonality period of the naive benchmark
+    Returns:
+        float or np.ndarray: MASE value, per series for a panel
+    """
+    return _score("mase", y_true, y_pred, y_train, seasonality)
 
 
-def rmsse(y_true, y_pred, seasonality=1):
+def rmsse(y_true, y_pred, y_train, seasonality=1):
     """
     Calculate the Root Mean Squared Scaled Error (RMSSE)
     Args:
-        y_true (array-like): True values
+        y_true (array-like): True values, 1-D or (n_series, horizon)
         y_pred (array-like): Predicted values
-        seasonality (int): Seasonality period for the time series data (e.g., 1 for no seasonality, 12 for monthly data if annual seasonality)
+        y_train (array-like): Training history the errors are scaled by
+        seasonality (int): Seasonality period of the naive benchmark
+    Returns:
+        float or np.ndarray: RMSSE value, per series for a panel
+    """
+    return _score("rmsse", y_true, y_pred, y_train, seasonality)
+
+
+def evaluate(
+    df,
+    forecast_cols,
+    metrics=None,
+    id_col="unique_id",
+    target_col="y",
+    group_col=None,
+    train=None,
+    time_col="ds",
+    seasonality=1,
+):
+    """
+    Score forecasts stored in a long-format frame per series, per group and overall
+    Args:
+        df (pd.DataFrame): Frame with id, target and one column per forecast
+        forecast_cols (list): Forecast columns to score, typically one per model
+        metrics (list, optional): Metrics to compute. Defaults to all ``METRICS``
+            that can be computed with the given inputs.
+        id_col (str): Series column
+        target_col (str): Target column
+        group_col (str, optional): Column of ``df`` to aggregate series by
+        train (pd.DataFrame, optional): Training history in the same layout, used
+            to scale MASE/RMSSE
+        time_col (str): Timestamp column used to order ``train``
+        seasonality (int): Seasonality period of the scaling benchmark
     Returns:
-        float: RMSSE value
+        dict: Frames keyed by "series", "group" (when group_col is given) and
+            "overall", with one row per model and level and one column per metric
     """
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
-    n = len(y_true)
-    num = np.sqrt(np.mean((y_true - y_pred) ** 2))
-    denom = np.sqrt(np.mean(np.diff(y_true, n=seasonality) ** 2))
-    rmsse_value = num / denom
+    if metrics is None:
+        scaled = ("mase", "rmsse")
+        metrics = [m for m in METRICS if train is not None or m not in scaled]
+
+    keys = [id_col] if group_col is None else [id_col, group_col]
+    y_true = df[target_col].to_numpy(dtype=np.float64)
+    scale_mae = scale_mse = None
+    if train is not None:
+        train = train.sort_values([id_col, time_col], kind="stable")
+        grouped = train.groupby(id_col, observed=True, sort=False)[target_col]
+        diff = grouped.diff(seasonality)
+        scales = (
+            pd.DataFrame({id_col: train[id_col], "abs": diff.abs(), "sq": diff**2})
+            .groupby(id_col, observed=True)[["abs", "sq"]]
+            .mean()
+        )
+        scale_mae = df[id_col].map(scales["abs"]).to_numpy(dtype=np.float64)
+        scale_mse = df[id_col].map(scales["sq"]).to_numpy(dtype=np.float64)
+
+    frames = []
+    for col in forecast_cols:
+        points = _pointwise(
+            y_true, df[col].to_numpy(dtype=np.float64), scale_mae, scale_mse
+        )
+        frame = pd.DataFrame(points, index=df.index)
+        frame[keys] = df[keys]
+        frame = frame.groupby(keys, observed=True, sort=False)[list(STATS)].sum()
+        frames.append(frame.reset_index().assign(model=col))
+    stats = pd.concat(frames, ignore_index=True)
+
+    def _level(by):
+        level = stats.groupby(by, observed=True, sort=False)[list(STATS)].sum()
+        scores = pd.DataFrame(metrics_from_stats(level, metrics), index=level.index)
+        return scores.reset_index()
+
+    results = {"series": _level(["model", id_col])}
+    if group_col is not None:
+        results["group"] = _level(["model", group_col])
+    results["overall"] = _level(["model"])
+    return results
+
+
+def pinball_loss(y_true, y_quantiles, quantiles):
+    """
+    Calculate the pinball (quantile) loss of every point and quantile at once
+    Args:
+        y_true (array-like): True values of any shape
+        y_quantiles (array-like): Quantile forecasts with the shape of y_true plus
+            a last axis of one column per quantile
+        quantiles (list): Quantile levels of the last axis
+    Returns:
+        np.ndarray: Loss with the shape of y_quantiles, NaN where a value is missing
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)[..., None]
+    error = y_true - np.asarray(y_quantiles, dtype=np.float64)
+    q = np.asarray(quantiles, dtype=np.float64)
+    return np.maximum(q * error, (q - 1) * error)
+
+
+def coverage(y_true, lower, upper):
+    """
+    Calculate the share of true values inside their prediction intervals
+    Args:
+        y_true (array-like): True values, 1-D or (n_series, horizon)
+        lower (array-like): Lower bounds with the same shape as y_true
+        upper (array-like): Upper bounds with the same shape as y_true
+    Returns:
+        float or np.ndarray: Coverage, per series for a panel
+    """
+    single = np.ndim(y_true) == 1
+    y_true = np.atleast_2d(np.asarray(y_true, dtype=np.float64))
+    lower = np.atleast_2d(np.asarray(lower, dtype=np.float64))
+    upper = np.atleast_2d(np.asarray(upper, dtype=np.float64))
+    valid = ~(np.isnan(y_true) | np.isnan(lower) | np.isnan(upper))
+    inside = valid & (y_true >= lower) & (y_true <= upper)
+    value = _ratio(inside.sum(axis=1), valid.sum(axis=1))
+    return float(value[0]) if single else value
+
+
+def evaluate_quantiles(
+    df,
+    models,
+    quantiles,
+    id_col="unique_id",
+    target_col="y",
+    group_col=None,
+):
+    """
+    Score quantile forecasts stored in a long-format frame per series, per group
+    and overall, from additive statistics like ``evaluate``
+    Args:
+        df (pd.DataFrame): Frame with id, target and the quantile columns of every
+            model, named as by ``quantile_column``
+        models (list): Models to score
+        quantiles (list): Quantile levels to score
+        id_col (str): Series column
+        target_col (str): Target column
+        group_col (str, optional): Column of ``df`` to aggregate series by
+    Returns:
+        dict: Frames keyed by "series", "group" (when group_col is given) and
+            "overall", with one row per model and level and the columns
+            "pinball" (mean loss over points and quantiles), "scaled_pinball"
+            (total loss over total absolute actuals, the weighted quantile
+            loss), "below_q<level>" (share of actuals below each quantile,
+            ideally the level) and "coverage_<level>" (share of actuals inside
+            every central interval formed by a pair of quantiles q and 1 - q)
+    """
+    quantiles = sorted(quantiles)
+    keys = [id_col] if group_col is None else [id_col, group_col]
+    y_true = df[target_col].to_numpy(dtype=np.float64)
+    pairs = [
+        (q, 1 - q) for q in quantiles if q < 0.5 and np.isclose(1 - q, quantiles).any()
+    ]
+
+    frames = []
+    for model in models:
+        columns = [quantile_column(model, q) for q in quantiles]
+        values = df[columns].to_numpy(dtype=np.float64)
+        valid = ~(np.isnan(y_true)[:, None] | np.isnan(values))
+        loss = np.where(valid, pinball_loss(y_true, values, quantiles), 0.0)
+        stats = {
+            "n": valid.sum(axis=1).astype(np.float64),
+            "sum_pinball": loss.sum(axis=1),
+            "sum_abs_true": np.where(valid.all(axis=1), np.abs(y_true), 0.0),
+        }
+        for i, q in enumerate(quantiles):
+            stats[f"n_q{q:g}"] = valid[:, i].astype(np.float64)
+            stats[f"below_q{q:g}"] = valid[:, i] & (y_true <= values[:, i])
+        for low, high in pairs:
+            i, j = quantiles.index(low), int(np.isclose(high, quantiles).argmax())
+            both = valid[:, i] & valid[:, j]
+            inside = both & (y_true >= values[:, i]) & (y_true <= values[:, j])
+            stats[f"n_interval_{low:g}"] = both.astype(np.float64)
+            stats[f"inside_{low:g}"] = inside.astype(np.float64)
+        frame = pd.DataFrame(stats, index=df.index)
+        frame[keys] = df[keys]
+        frame = frame.groupby(keys, observed=True, sort=False).sum()
+        frames.append(frame.reset_index().assign(model=model))
+    stats = pd.concat(frames, ignore_index=True)
+    sums = [c for c in stats.columns if c not in keys and c != "model"]
+
+    def _level(by):
+        level = stats.groupby(by, observed=True, sort=False)[sums].sum()
+        scores = {
+            "pinball": _ratio(level["sum_pinball"], level["n"]),
+            # Total loss over total actuals, times 2 so the median gives the WAPE
+            "scaled_pinball": _ratio(
+                2 * level["sum_pinball"] / len(quantiles), level["sum_abs_true"]
+            ),
+        }
+        for q in quantiles:
+            scores[f"below_q{q:g}"] = _ratio(level[f"below_q{q:g}"], level[f"n_q{q:g}"])
+        for low, high in pairs:
+            scores[f"coverage_{high - low:g}"] = _ratio(
+                level[f"inside_{low:g}"], level[f"n_interval_{low:g}"]
+            )
+        return pd.DataFrame(scores, index=level.index).reset_index()
 
-    print("RMSSE:", rmsse_value)
-    return rmsse_value
+    results = {"series": _level(["model", id_col])}
+    if group_col is not None:
+        results["group"] = _level(["model", group_col])
+    results["overall"] = _level(["model"])
+    return results
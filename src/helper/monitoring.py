@@ -0,0 +1,311 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.metrics import STATS, _pointwise, in_sample_scale, metrics_from_stats
+from src.helper.utils import get_season_length, split_series, stack_series
+
+logger = logging.getLogger(__name__)
+
+# Per-series arrays that make up the state of a monitor, besides ``STATS``
+_STATE = ("scale_mae", "scale_mse", "fast", "slow", "edges", "reference", "recent")
+_EPS = 1e-4
+
+
+class ForecastMonitor:
+    """Running forecast accuracy and data drift of every series of a panel.
+
+    Actuals are ingested as they land together with the forecasts made for
+    them. Every observation updates a constant amount of per-series state:
+
+    - the additive error statistics of ``src.helper.metrics``, so WAPE, RMSSE,
+      bias and the other metrics of a series, a group or the whole panel are
+      read off without revisiting past forecasts,
+    - a fast and a slow exponentially weighted absolute error, whose ratio
+      shows a series getting worse than it usually is,
+    - an exponentially weighted histogram of the values over quantile bins of
+      the reference history, compared with the reference histogram by the
+      population stability index (PSI).
+
+    The state is a handful of arrays with one row per series, stored in a
+    single ``.npz`` file under ``OUTPUT_DIR/monitoring``.
+    """
+
+    def __init__(self, name="default", path=None, id_col=None, target_col=None):
+        """
+        Args:
+            name (str): Name of the monitor, e.g. the model it watches.
+            path (str or Path, optional): File the state is stored in. Defaults
+                to ``OUTPUT_DIR/monitoring/<name>.npz``.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        self.settings = dict(run_config["monitoring"])
+        self.name = name
+        self.path = Path(path or config.OUTPUT_DIR / "monitoring" / f"{name}.npz")
+        self.id_col = id_col or run_config["partition_dim"]
+        self.target_col = target_col or run_config["target"]
+        self.ids = pd.Index([], dtype=object)
+        self.groups = np.empty(0, dtype=object)
+        self.stats = {stat: np.empty(0) for stat in STATS}
+        n_bins = self.settings["n_bins"]
+        self.state = {
+            "scale_mae": np.empty(0),
+            "scale_mse": np.empty(0),
+            "fast": np.empty(0),
+            "slow": np.empty(0),
+            "edges": np.empty((0, n_bins - 1)),
+            "reference": np.empty((0, n_bins)),
+            "recent": np.empty((0, n_bins)),
+        }
+
+    def _positions(self, ids):
+        """Rows of ``ids`` in the state, adding rows for series not seen before."""
+        ids = pd.Index(ids).astype(str)
+        new = ids.unique().difference(self.ids)
+        if len(new):
+            n_bins = self.settings["n_bins"]
+            self.ids = self.ids.append(pd.Index(new, dtype=object))
+            self.groups = np.append(self.groups, np.full(len(new), None))
+            for stat in STATS:
+                self.stats[stat] = np.append(self.stats[stat], np.zeros(len(new)))
+            for name in ("scale_mae", "scale_mse"):
+                self.state[name] = np.append(
+                    self.state[name], np.full(len(new), np.nan)
+                )
+            for name in ("fast", "slow"):
+                self.state[name] = np.append(self.state[name], np.zeros(len(new)))
+            self.state["edges"] = np.vstack(
+                [self.state["edges"], np.full((len(new), n_bins - 1), np.nan)]
+            )
+            for name in ("reference", "recent"):
+                self.state[name] = np.vstack(
+                    [self.state[name], np.full((len(new), n_bins), 1 / n_bins)]
+                )
+        return self.ids.get_indexer(ids)
+
+    def set_reference(self, train, seasonality=None, group_col=None):
+        """Take error scales and reference distributions from the training data.
+
+        Args:
+            train (pd.DataFrame): Long-format history the models were fitted on.
+            seasonality (int, optional): Period of the naive benchmark that
+                scales RMSSE. Defaults to the configured interval's season length.
+            group_col (str, optional): Column of ``train`` grouping the series.
+
+        Returns:
+            ForecastMonitor: The monitor.
+        """
+        seasonality = seasonality or get_season_length(
+            config.FORECASTING_CONFIG["interval"]
+        )
+        ids, starts, ends, values, _ = split_series(
+            train, self.id_col, "ds", self.target_col
+        )
+        panel, _ = stack_series(starts, ends, values)
+        positions = self._positions(ids)
+        scale_mae, scale_mse = in_sample_scale(panel, seasonality)
+        self.state["scale_mae"][positions] = scale_mae
+        self.state["scale_mse"][positions] = scale_mse
+
+        n_bins = self.settings["n_bins"]
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+        with np.errstate(all="ignore"):
+            edges = np.nanquantile(panel, quantiles, axis=1).T
+        counts = _histogram(panel, edges, n_bins)
+        reference = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        self.state["edges"][positions] = edges
+        self.state["reference"][positions] = reference
+        self.state["recent"][positions] = reference
+
+        if group_col is not None:
+            groups = train.groupby(self.id_col, observed=True)[group_col].first()
+            self.groups[positions] = groups.reindex(ids).to_numpy()
+        logger.info(f"Set the reference of {len(ids)} series")
+        return self
+
+    def ingest(self, df, forecast_col, group_col=None):
+        """Update the running statistics with newly landed actuals.
+
+        Args:
+            df (pd.DataFrame): Long-format frame with id, "ds", target and the
+                forecast made for every row.
+            forecast_col (str): Column holding the forecasts.
+            group_col (str, optional): Column of ``df`` grouping the series.
+
+        Returns:
+            ForecastMonitor: The monitor.
+        """
+        df = df.sort_values("ds", kind="stable")
+        positions = self._positions(df[self.id_col])
+        if group_col is not None:
+            self.groups[positions] = df[group_col].to_numpy()
+
+        y_true = df[self.target_col].to_numpy(dtype=np.float64)
+        y_pred = df[forecast_col].to_numpy(dtype=np.float64)
+        points = _pointwise(
+            y_true,
+            y_pred,
+            self.state["scale_mae"][positions],
+            self.state["scale_mse"][positions],
+        )
+        for stat in STATS:
+            np.add.at(self.stats[stat], positions, points[stat])
+
+        # Recursive statistics take the observations of a series in time order,
+        # so rows are applied in rounds of at most one row per series.
+        abs_err = np.abs(y_pred - y_true)
+        valid = ~np.isnan(abs_err)
+        rounds = pd.Series(positions).groupby(positions).cumcount().to_numpy()
+        for r in range(rounds.max(initial=-1) + 1):
+            rows = np.flatnonzero((rounds == r) & valid)
+            self._smooth_errors(positions[rows], abs_err[rows])
+            rows = np.flatnonzero((rounds == r) & ~np.isnan(y_true))
+            self._smooth_histogram(positions[rows], y_true[rows])
+        return self
+
+    def _smooth_errors(self, positions, abs_err):
+        for name in ("fast", "slow"):
+            weight = self.settings[f"{name}_smoothing"]
+            self.state[name][positions] += weight * (
+                abs_err - self.state[name][positions]
+            )
+
+    def _smoothed_error(self, name):
+        """Bias-corrected exponentially weighted absolute error of every series."""
+        total_weight = 1 - (1 - self.settings[f"{name}_smoothing"]) ** self.stats["n"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.state[name] / total_weight
+
+    def _smooth_histogram(self, positions, values):
+        weight = self.settings["histogram_smoothing"]
+        edges = self.state["edges"][positions]
+        known = ~np.isnan(edges).any(axis=1)
+        positions, values, edges = positions[known], values[known], edges[known]
+        bins = (edges < values[:, None]).sum(axis=1)
+        recent = self.state["recent"][positions] * (1 - weight)
+        recent[np.arange(len(positions)), bins] += weight
+        self.state["recent"][positions] = recent
+
+    def psi(self):
+        """Population stability index of the recent values against the reference."""
+        reference = self.state["reference"] + _EPS
+        recent = self.state["recent"] + _EPS
+        return ((recent - reference) * np.log(recent / reference)).sum(axis=1)
+
+    def scores(self, metrics=("wape", "rmsse", "bias"), level="series"):
+        """Accuracy since monitoring started, read off the running statistics.
+
+        Args:
+            metrics (list): Metrics of ``src.helper.metrics`` to compute.
+            level (str): "series", "group" or "overall".
+
+        Returns:
+            pd.DataFrame: One row per series or group, one column per metric.
+        """
+        stats = pd.DataFrame(self.stats)
+        if level == "series":
+            stats.index = pd.Index(self.ids, name=self.id_col)
+        elif level == "group":
+            stats = stats.groupby(pd.Series(self.groups, name="group")).sum()
+        elif level == "overall":
+            stats = stats.sum().to_frame().T
+        else:
+            raise ValueError(f"Unknown level: {level}")
+        return pd.DataFrame(metrics_from_stats(stats, metrics), index=stats.index)
+
+    def status(self):
+        """Accuracy, drift and degradation flags of every series.
+
+        A series is flagged once it has ``min_obs`` observations and either its
+        recent error exceeds ``degrade_ratio`` times its usual error or the PSI
+        of its recent values exceeds ``psi_threshold``.
+
+        Returns:
+            pd.DataFrame: One row per series.
+        """
+        settings = self.settings
+        status = self.scores().reset_index()
+        status.insert(1, "group", self.groups)
+        status["n"] = self.stats["n"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            status["error_ratio"] = self._smoothed_error(
+                "fast"
+            ) / self._smoothed_error("slow")
+        status["psi"] = self.psi()
+        eligible = status["n"] >= settings["min_obs"]
+        status["error_degraded"] = eligible & (
+            status["error_ratio"] > settings["degrade_ratio"]
+        )
+        status["drifted"] = eligible & (status["psi"] > settings["psi_threshold"])
+        status["degraded"] = status["error_degraded"] | status["drifted"]
+        return status
+
+    def retrain_queue(self):
+        """IDs of the degraded series, worst error ratio first."""
+        status = self.status()
+        degraded = status[status["degraded"]]
+        return degraded.sort_values("error_ratio", ascending=False)[
+            self.id_col
+        ].tolist()
+
+    def save(self):
+        """Write the state to ``path`` atomically.
+
+        Returns:
+            Path: The written file.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        staging = self.path.with_name(f".{self.path.stem}.tmp.npz")
+        np.savez(
+            staging,
+            ids=self.ids.to_numpy(dtype=str),
+            groups=np.array(["" if g is None else str(g) for g in self.groups]),
+            **{f"stat_{stat}": values for stat, values in self.stats.items()},
+            **self.state,
+        )
+        staging.replace(self.path)
+        return self.path
+
+    @classmethod
+    def load(cls, name="default", path=None, **kwargs):
+        """Open a stored monitor, or a new one when nothing is stored yet.
+
+        Args:
+            name (str): Name of the monitor.
+            path (str or Path, optional): File the state is stored in.
+            **kwargs: Further arguments of ``ForecastMonitor``.
+
+        Returns:
+            ForecastMonitor: The monitor.
+        """
+        monitor = cls(name, path, **kwargs)
+        if not monitor.path.exists():
+            return monitor
+        with np.load(monitor.path, allow_pickle=False) as stored:
+            monitor.ids = pd.Index(stored["ids"].astype(object))
+            monitor.groups = np.array(
+                [g or None for g in stored["groups"].tolist()], dtype=object
+            )
+            monitor.stats = {stat: stored[f"stat_{stat}"] for stat in STATS}
+            monitor.state = {name: stored[name] for name in _STATE}
+        if monitor.state["reference"].shape[1] != monitor.settings["n_bins"]:
+            monitor.settings["n_bins"] = monitor.state["reference"].shape[1]
+        return monitor
+
+
+def _histogram(panel, edges, n_bins):
+    """Counts of the values of every panel row over that row's bins."""
+    valid = ~np.isnan(panel) & ~np.isnan(edges).any(axis=1)[:, None]
+    bins = np.zeros(panel.shape, dtype=np.intp)
+    with np.errstate(invalid="ignore"):
+        for edge in edges.T:
+            bins += edge[:, None] < panel
+    rows = np.broadcast_to(np.arange(len(panel))[:, None], panel.shape)
+    counts = np.zeros((len(panel), n_bins))
+    np.add.at(counts, (rows[valid], bins[valid]), 1)
+    return counts
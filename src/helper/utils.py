@@ -1,6 +1,11 @@
+import hashlib
+import json
+
 import pandas as pd
 import numpy as np
 
+from src import config
+
 
 def reduce_mem_usage(df, verbose=True):
     """_summary_
@@ -29,12 +34,9 @@ def reduce_mem_usage(df, verbose=True):
                 elif c_min > np.iinfo(np.int64).min and c_max < np.iinfo(np.int64).max:
                     df[col] = df[col].astype(np.int64)
             else:
+                # float16 keeps ~3 significant digits and corrupts sales values,
+                # so floats are never downcast below float32.
                 if (
-                    c_min > np.finfo(np.float16).min
-                    and c_max < np.finfo(np.float16).max
-                ):
-                    df[col] = df[col].astype(np.float16)
-                elif (
                     c_min > np.finfo(np.float32).min
                     and c_max < np.finfo(np.float32).max
                 ):
@@ -49,3 +51,190 @@ def reduce_mem_usage(df, verbose=True):
             )
         )
     return df
+
+
+# Pandas frequency alias and dominant seasonal period for each supported interval
+INTERVAL_FREQ = {
+    "hour": "h",
+    "day": "D",
+    "week": "W",
+    "month": "MS",
+    "quarter": "QS",
+    "year": "YS",
+}
+SEASON_LENGTH = {
+    "hour": 24,
+    "day": 7,
+    "week": 52,
+    "month": 12,
+    "quarter": 4,
+    "year": 1,
+}
+
+
+def get_freq(interval):
+    """Return the pandas frequency alias for a configured interval."""
+    if interval not in INTERVAL_FREQ:
+        raise ValueError(f"Unknown interval: {interval}")
+    return INTERVAL_FREQ[interval]
+
+
+def get_season_length(interval):
+    """Return the seasonal period for a configured interval."""
+    if interval not in SEASON_LENGTH:
+        raise ValueError(f"Unknown interval: {interval}")
+    return SEASON_LENGTH[interval]
+
+
+def _change_points(sorted_ids):
+    """Start of every run of equal IDs in an ID array sorted by series.
+
+    Sorting orders categorical IDs by category, not lexically, so the runs are
+    located on the sorted values rather than by ``np.unique``.
+    """
+    if not len(sorted_ids):
+        return np.empty(0, dtype=np.int64)
+    return np.append(0, np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1)
+
+
+def split_series(df, id_col, time_col, target_col):
+    """Sort a long-format frame and locate the slice of every series.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with one row per series and timestamp.
+        id_col (str): Column identifying the series.
+        time_col (str): Timestamp column.
+        target_col (str): Target column.
+
+    Returns:
+        tuple: (ids, starts, ends, values, last_ds) where ``values[starts[i]:ends[i]]``
+            is the history of ``ids[i]`` and ``last_ds[i]`` its last timestamp.
+    """
+    df = df.sort_values([id_col, time_col], kind="stable")
+    id_values = df[id_col].to_numpy()
+    starts = _change_points(id_values)
+    ids = id_values[starts]
+    ends = np.append(starts[1:], len(df)) if len(starts) else starts
+    values = df[target_col].to_numpy(dtype=np.float64)
+    last_ds = pd.DatetimeIndex(df[time_col].to_numpy()[ends - 1])
+    return ids, starts, ends, values, last_ds
+
+
+def future_dates(last_ds, horizon, freq):
+    """Build the forecast timestamps that follow each series' last observation.
+
+    Args:
+        last_ds (array-like): Last timestamp of every series.
+        horizon (int): Number of periods to forecast.
+        freq (str): Pandas frequency alias.
+
+    Returns:
+        np.ndarray: Array of shape (n_series, horizon) with the future timestamps.
+    """
+    last_ds = pd.DatetimeIndex(last_ds)
+    offset = pd.tseries.frequencies.to_offset(freq)
+    steps = [(last_ds + step * offset).to_numpy() for step in range(1, horizon + 1)]
+    return np.stack(steps, axis=1) if steps else np.empty((len(last_ds), 0), "M8[ns]")
+
+
+def stack_series(starts, ends, values):
+    """Stack the series located by ``split_series`` into a left-aligned panel.
+
+    Args:
+        starts (np.ndarray): Start offset of every series in ``values``.
+        ends (np.ndarray): End offset of every series in ``values``.
+        values (np.ndarray): Concatenated series values.
+
+    Returns:
+        tuple: (panel, lengths) where ``panel`` has shape (n_series, max_length),
+            is NaN-padded on the right and ``lengths`` holds each series' length.
+    """
+    lengths = ends - starts
+    panel = np.full((len(lengths), lengths.max(initial=0)), np.nan)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(len(values)) - np.repeat(starts, lengths)
+    panel[rows, positions] = values
+    return panel, lengths
+
+
+def append_panel(panel, lengths, new_values):
+    """Append new observations after the last position of every panel row.
+
+    Args:
+        panel (np.ndarray): Left-aligned panel of shape (n_series, T).
+        lengths (np.ndarray): Number of leading positions used by every row.
+        new_values (np.ndarray): New observations of shape (n_series, k), NaN
+            where a series has no observation for a period.
+
+    Returns:
+        tuple: (panel, lengths) with the panel widened if needed.
+    """
+    new_values = np.asarray(new_values, dtype=np.float64)
+    lengths = np.asarray(lengths)
+    n_new = new_values.shape[1]
+    width = max(panel.shape[1], lengths.max(initial=0) + n_new)
+    if width > panel.shape[1]:
+        widened = np.full((len(panel), width), np.nan)
+        widened[:, : panel.shape[1]] = panel
+        panel = widened
+    else:
+        panel = panel.copy()
+    columns = lengths[:, None] + np.arange(n_new)[None, :]
+    panel[np.arange(len(panel))[:, None], columns] = new_values
+    return panel, lengths + n_new
+
+
+def quantile_column(model_name, q):
+    """Name of the column holding quantile ``q`` of a model, e.g. "naive_q0.9"."""
+    return f"{model_name}_q{q:g}"
+
+
+def config_hash(section=None):
+    """Short, stable hash of the forecasting configuration or one of its sections.
+
+    Args:
+        section (str, optional): Key of ``FORECASTING_CONFIG`` to hash. Defaults to
+            the whole configuration.
+
+    Returns:
+        str: First 12 hex digits of the SHA-256 of the canonical JSON encoding.
+    """
+    settings = config.FORECASTING_CONFIG
+    if section is not None:
+        settings = settings[section]
+    return stable_hash(settings)
+
+
+def stable_hash(obj):
+    """Short SHA-256 of the canonical JSON encoding of ``obj``."""
+    encoded = json.dumps(obj, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def series_hashes(df, id_col, time_col, target_col):
+    """Content hash of every series of a long-format frame.
+
+    Every (timestamp, value) row is hashed and the row hashes of a series are
+    summed with wraparound, so the hash changes with any added, removed or
+    revised observation but not with the order of the rows.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with one row per series and timestamp.
+        id_col (str): Column identifying the series.
+        time_col (str): Timestamp column.
+        target_col (str): Target column.
+
+    Returns:
+        pd.Series: uint64 hashes indexed by series ID.
+    """
+    df = df.sort_values(id_col, kind="stable")
+    id_values = df[id_col].to_numpy()
+    starts = _change_points(id_values)
+    ids = id_values[starts]
+    rows = pd.util.hash_pandas_object(df[[time_col, target_col]], index=False)
+    hashes = (
+        np.add.reduceat(rows.to_numpy(), starts)
+        if len(starts)
+        else np.empty(0, dtype=np.uint64)
+    )
+    return pd.Series(hashes, index=pd.Index(ids, name=id_col), name="data_hash")
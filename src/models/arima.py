@@ -1,28 +1,437 @@
-from statsforecast.models import AutoARIMA
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsforecast.models import AutoARIMA, Naive
 from statsforecast import StatsForecast
 
-import config
+from src import config
+from src.helper.utils import (
+    future_dates,
+    get_freq,
+    get_season_length,
+    quantile_column,
+    split_series,
+    stack_series,
+)
+
+# Orders in the layout of statsforecast's "arma" field
+ORDERS = ("p", "q", "P", "Q", "season_length", "d", "D")
+
+
+def _system(orders, coef):
+    """State space matrices of series that share the same orders.
+
+    Args:
+        orders (tuple): (p, q, P, Q, season_length, d, D).
+        coef (np.ndarray): AR, MA, seasonal AR and seasonal MA coefficients of
+            every series, shape (n_series, p + q + P + Q).
+
+    Returns:
+        tuple: (Z, T, V) with Z of shape (rd,) and T, V of shape (n_series, rd, rd),
+            as built by statsforecast's ``make_arima``.
+    """
+    p, q, P, Q, m, d, D = orders
+    n_series = len(coef)
+    ar, ma = coef[:, :p], coef[:, p : p + q]
+    sar, sma = coef[:, p + q : p + q + P], coef[:, p + q + P : p + q + P + Q]
+    phi = np.zeros((n_series, p + m * P))
+    phi[:, :p] = ar
+    theta = np.zeros((n_series, q + m * Q))
+    theta[:, :q] = ma
+    for j in range(P):
+        phi[:, (j + 1) * m - 1] += sar[:, j]
+        phi[:, (j + 1) * m : (j + 1) * m + p] -= ar * sar[:, j : j + 1]
+    for j in range(Q):
+        theta[:, (j + 1) * m - 1] += sma[:, j]
+        theta[:, (j + 1) * m : (j + 1) * m + q] += ma * sma[:, j : j + 1]
+    delta = np.array([1.0])
+    for _ in range(d):
+        delta = np.convolve(delta, [1.0, -1.0])
+    for _ in range(D):
+        delta = np.convolve(delta, np.r_[1.0, np.zeros(m - 1), -1.0])
+    delta = -delta[1:]
+
+    n_ar, n_ma, n_diff = phi.shape[1], theta.shape[1], len(delta)
+    r = max(n_ar, n_ma + 1)
+    rd = r + n_diff
+    Z = np.concatenate([[1.0], np.zeros(r - 1), delta])
+    T = np.zeros((n_series, rd, rd))
+    T[:, :n_ar, 0] = phi
+    T[:, np.arange(r - 1), np.arange(1, r)] = 1.0
+    if n_diff:
+        T[:, r] = Z
+        T[:, r + np.arange(1, n_diff), r + np.arange(n_diff - 1)] = 1.0
+    R = np.zeros((n_series, rd))
+    R[:, 0] = 1.0
+    R[:, 1 : 1 + n_ma] = theta
+    V = R[:, :, None] * R[:, None, :]
+    return Z, T, V
+
+
+def _groups(state):
+    """Rows of series sharing the same orders, with their state space size."""
+    orders = np.stack([np.asarray(state[name]) for name in ORDERS], axis=1)
+    unique, inverse = np.unique(orders.astype(int), axis=0, return_inverse=True)
+    for k, group in enumerate(unique):
+        rows = np.flatnonzero(inverse.ravel() == k)
+        n_coef = int(group[:4].sum())
+        Z, T, V = _system(tuple(group), state["coef"][rows, :n_coef])
+        yield rows, Z, T, V
+
+
+def forecast_state(state, horizon):
+    """Forecast ARIMA models from their final Kalman filter states.
+
+    Series with the same orders are forecast together, so the fleet is
+    covered by one batched recursion per distinct set of orders.
+
+    Args:
+        state (dict): Columnar states as returned by ``ARIMA.state``.
+        horizon (int): Number of periods to forecast.
+
+    Returns:
+        tuple: (mean, se) arrays of shape (n_series, horizon).
+    """
+    n_series = len(state["sigma2"])
+    mean = np.full((n_series, horizon), np.nan)
+    se = np.full((n_series, horizon), np.nan)
+    steps = np.arange(1, horizon + 1)
+    for rows, Z, T, V in _groups(state):
+        rd = len(Z)
+        a = state["kalman_a"][rows, :rd]
+        P = state["kalman_P"][rows, :rd, :rd]
+        for step in range(horizon):
+            a = np.einsum("nij,nj->ni", T, a)
+            P = V + T @ P @ T.transpose(0, 2, 1)
+            mean[rows, step] = a @ Z
+            se[rows, step] = np.einsum("i,nij,j->n", Z, P, Z)
+    regression = state["intercept"][:, None] + state["drift"][:, None] * (
+        state["n_obs"][:, None] + steps
+    )
+    with np.errstate(invalid="ignore"):
+        se = np.sqrt(se * state["sigma2"][:, None])
+    return mean + regression, se
+
+
+def update_state(state, y_new, lengths=None):
+    """Run the Kalman filter of ARIMA models over new observations.
+
+    The orders and coefficients are kept fixed and only the filter state moves,
+    which gives the same forecasts as refiltering the full history with the
+    fitted model. A missing observation only propagates the state.
+
+    Args:
+        state (dict): Columnar states as returned by ``ARIMA.state``.
+        y_new (np.ndarray): New observations of shape (n_series, k).
+        lengths (np.ndarray, optional): Number of leading periods of ``y_new``
+            each series advances over, the rest are padding. Defaults to all k.
+
+    Returns:
+        dict: The advanced states.
+    """
+    y_new = np.atleast_2d(np.asarray(y_new, dtype=np.float64))
+    if lengths is None:
+        lengths = np.full(len(y_new), y_new.shape[1])
+    state = {
+        **state,
+        "kalman_a": np.array(state["kalman_a"], dtype=np.float64),
+        "kalman_P": np.array(state["kalman_P"], dtype=np.float64),
+        "kalman_Pn": np.array(state["kalman_Pn"], dtype=np.float64),
+        "n_obs": np.asarray(state["n_obs"]) + lengths,
+    }
+    n_obs = state["n_obs"] - lengths
+    for rows, Z, T, V in _groups(state):
+        rd = len(Z)
+        a = state["kalman_a"][rows, :rd]
+        P = state["kalman_P"][rows, :rd, :rd]
+        intercept, drift = state["intercept"][rows], state["drift"][rows]
+        for t in range(y_new.shape[1]):
+            active = t < lengths[rows]
+            a_pred = np.einsum("nij,nj->ni", T, a)
+            P_pred = V + T @ P @ T.transpose(0, 2, 1)
+            # The filter tracks the series net of intercept and drift
+            y = y_new[rows, t] - intercept - drift * (n_obs[rows] + t + 1)
+            innovation = y - a_pred @ Z
+            PZ = P_pred @ Z
+            variance = PZ @ Z
+            observed = active & ~np.isnan(innovation) & (variance > 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gain = np.where(observed[:, None], PZ / variance[:, None], 0.0)
+            innovation = np.where(observed, innovation, 0.0)
+            a_next = a_pred + gain * innovation[:, None]
+            P_next = P_pred - gain[:, :, None] * PZ[:, None, :]
+            a = np.where(active[:, None], a_next, a)
+            P = np.where(active[:, None, None], P_next, P)
+        state["kalman_a"][rows, :rd] = a
+        state["kalman_P"][rows, :rd, :rd] = P
+        moved = (lengths[rows] > 0)[:, None, None]
+        state["kalman_Pn"][rows, :rd, :rd] = np.where(
+            moved,
+            V + T @ P @ T.transpose(0, 2, 1),
+            state["kalman_Pn"][rows, :rd, :rd],
+        )
+    return state
 
 
 class ARIMA:
+    """AutoARIMA fitted on every series of a long-format panel through StatsForecast.
+
+    After fitting, every series is kept as its orders, coefficients and final
+    Kalman filter state in columnar arrays, padded to the largest state of the
+    panel. Forecasts and updates are computed from these arrays, so the fitted
+    statsforecast models, which carry their full history and residuals, are
+    not kept.
+    """
+
+    alias = "arima"
+
+    def __init__(
+        self,
+        season_length=None,
+        n_jobs=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """
+        Args:
+            season_length (int, optional): Seasonal period. Defaults to the period of
+                the configured interval.
+            n_jobs (int, optional): Worker processes used by StatsForecast.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        self.logger = logging.getLogger(__name__)
+        self.season_length = season_length or get_season_length(run_config["interval"])
+        self.freq = get_freq(run_config["interval"])
+        self.n_jobs = n_jobs or run_config["execution"]["n_jobs"]
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.ids = None
+        self.last_ds = None
+        self.state_ = None
+        self.params = None
 
-    def __init__(self):
-        self.logger = None
-
-    def train(self, train, test, eda):
-        self.model = AutoARIMA(
-            train,
-            start_p=0,
-            start_q=0,
-            max_p=3,
-            max_q=3,
-            m=1,
-            seasonal=True,
-            trace=True,
-            error_action="ignore",
-            suppress_warnings=True,
+    def train(self, train, test=None, eda=None):
+        """Fit one AutoARIMA per series of the panel.
+
+        Series whose fit fails fall back to a naive forecast so a single bad
+        series does not abort the panel.
+
+        Args:
+            train (pd.DataFrame): Long-format frame with id, timestamp and target.
+            test (pd.DataFrame, optional): Unused, kept for interface compatibility.
+            eda (dict, optional): Unused, kept for interface compatibility.
+
+        Returns:
+            ARIMA: The fitted model.
+        """
+        model = StatsForecast(
+            models=[
+                AutoARIMA(
+                    start_p=0,
+                    start_q=0,
+                    max_p=3,
+                    max_q=3,
+                    season_length=self.season_length,
+                    alias=self.alias,
+                )
+            ],
+            freq=self.freq,
+            n_jobs=self.n_jobs,
+            fallback_model=Naive(),
+        )
+        model.fit(
+            train[[self.id_col, self.time_col, self.target_col]],
+            id_col=self.id_col,
+            time_col=self.time_col,
+            target_col=self.target_col,
+        )
+        fitted = [getattr(f, "model_", None) for f in model.fitted_[:, 0]]
+        self.ids = np.asarray(model.uids)
+        self.last_ds = model.last_dates.to_numpy()
+        self.params = self._summarize(fitted)
+        self.state_ = self._columnar(fitted)
+        self.logger.info(f"Fitted AutoARIMA on {len(self.params)} series")
+        return self
+
+    @classmethod
+    def from_state(cls, ids, state, last_ds, **kwargs):
+        """Rebuild a fitted model from the columnar state of ``state``.
+
+        Args:
+            ids (array-like): Series IDs, aligned with the state.
+            state (dict): Output arrays of ``state``.
+            last_ds (array-like): Last timestamp of every series.
+            **kwargs: Arguments of the constructor.
+
+        Returns:
+            ARIMA: Model that forecasts and updates without its history.
+        """
+        model = cls(**kwargs)
+        model.ids = np.asarray(ids)
+        model.last_ds = np.asarray(last_ds, dtype="datetime64[ns]")
+        model.state_ = {name: np.asarray(value) for name, value in state.items()}
+        return model
+
+    def update(self, new_df):
+        """Advance every series over newly arrived rows without re-estimation.
+
+        The selected orders and coefficients are kept and only the state of the
+        Kalman filter is rolled forward through the new observations. Series
+        that fell back to a naive forecast are random walks and restart from
+        their latest value.
+
+        Args:
+            new_df (pd.DataFrame): Rows following the training data, in the same
+                long format. Series unknown to the model are ignored.
+
+        Returns:
+            ARIMA: The updated model.
+        """
+        if self.state_ is None:
+            raise ValueError("Model must be trained before updating. Call train().")
+
+        ids, starts, ends, values, last_ds = split_series(
+            new_df, self.id_col, self.time_col, self.target_col
         )
+        positions = pd.Index(self.ids).get_indexer(ids)
+        unknown = positions < 0
+        if unknown.any():
+            self.logger.warning(
+                f"Ignoring {unknown.sum()} series unknown to the model, "
+                "retrain to add them"
+            )
+        panel, lengths = stack_series(starts, ends, values)
+        new_obs = np.full((len(self.ids), panel.shape[1]), np.nan)
+        new_lengths = np.zeros(len(self.ids), dtype=int)
+        new_obs[positions[~unknown]] = panel[~unknown]
+        new_lengths[positions[~unknown]] = lengths[~unknown]
+        self.state_ = update_state(self.state_, new_obs, new_lengths)
+        self.last_ds = self.last_ds.copy()
+        self.last_ds[positions[~unknown]] = np.asarray(last_ds)[~unknown]
+        return self
+
+    def _summarize(self, fitted):
+        """Collect the selected orders and fit statistics of every series."""
+        rows = []
+        for model in fitted:
+            if model is None or "arma" not in model:
+                rows.append({})
+                continue
+            p, q, P, Q, m, d, D = model["arma"]
+            rows.append(
+                {
+                    "p": p,
+                    "d": d,
+                    "q": q,
+                    "P": P,
+                    "D": D,
+                    "Q": Q,
+                    "season_length": m,
+                    "sigma2": model["sigma2"],
+                    "aic": model["aic"],
+                    "coef": dict(model["coef"]),
+                }
+            )
+        columns = ["p", "d", "q", "P", "D", "Q", "season_length", "sigma2", "aic"]
+        params = pd.DataFrame(rows, columns=columns + ["coef"])
+        params.insert(0, self.id_col, self.ids)
+        return params
+
+    def _columnar(self, fitted):
+        """Columnar orders, coefficients and final Kalman states of every series.
+
+        Series that fell back to a naive forecast are stored as the random walk
+        ARIMA(0, 1, 0) it is equivalent to.
+        """
+        n_series = len(fitted)
+        orders = np.zeros((n_series, len(ORDERS)), dtype=np.int64)
+        orders[:, ORDERS.index("season_length")] = self.season_length
+        intercept, drift = np.zeros(n_series), np.zeros(n_series)
+        sigma2, n_obs = np.full(n_series, np.nan), np.zeros(n_series)
+        coefs, kalman = [], []
+        for i, model in enumerate(fitted):
+            if model is not None and "arma" in model:
+                orders[i] = model["arma"]
+                coef = dict(model["coef"])
+                intercept[i] = coef.pop("intercept", 0.0)
+                drift[i] = coef.pop("drift", 0.0)
+                sigma2[i] = model["sigma2"]
+                n_obs[i] = len(model["x"])
+                coefs.append(np.fromiter(coef.values(), dtype=np.float64))
+                kalman.append(tuple(model["model"][k] for k in ("a", "P", "Pn")))
+                continue
+            # Naive fallback: a random walk whose state is the last value
+            orders[i, ORDERS.index("d")] = 1
+            if model is not None:
+                sigma2[i] = model["sigma"] ** 2
+                last = model["mean"][0]
+            else:
+                last = np.nan
+            coefs.append(np.zeros(0))
+            Pn = np.zeros((2, 2))
+            Pn[0, 0] = 1.0
+            kalman.append((np.array([0.0, last]), np.zeros((2, 2)), Pn))
+
+        n_coef = max((len(c) for c in coefs), default=0)
+        rd = max((len(a) for a, _, _ in kalman), default=0)
+        state = {name: orders[:, k] for k, name in enumerate(ORDERS)}
+        state["coef"] = np.full((n_series, n_coef), np.nan)
+        state["kalman_a"] = np.zeros((n_series, rd))
+        state["kalman_P"] = np.zeros((n_series, rd, rd))
+        state["kalman_Pn"] = np.zeros((n_series, rd, rd))
+        for i, (coef, (a, P, Pn)) in enumerate(zip(coefs, kalman)):
+            state["coef"][i, : len(coef)] = coef
+            state["kalman_a"][i, : len(a)] = a
+            state["kalman_P"][i, : len(a), : len(a)] = P
+            state["kalman_Pn"][i, : len(a), : len(a)] = Pn
+        state.update(intercept=intercept, drift=drift, sigma2=sigma2, n_obs=n_obs)
+        return state
 
-    def forecast(self, horizon):
-        forecast_output = self.model.forecast(h=horizon)
-        return forecast_output
+    def state(self):
+        """Fitted state of every series for the model registry.
+
+        Returns:
+            tuple: (ids, arrays, None) with the orders, coefficients, intercept,
+                drift, residual variance, number of observations and the final
+                Kalman state "kalman_a" with its covariances "kalman_P" and
+                "kalman_Pn", padded to the largest state of the panel.
+        """
+        if self.state_ is None:
+            raise ValueError("Model must be trained first. Call train().")
+        return self.ids, dict(self.state_), None
+
+    def forecast(self, horizon, quantiles=None):
+        """Forecast every fitted series.
+
+        Args:
+            horizon (int): Number of periods to forecast.
+            quantiles (list, optional): Quantile levels, taken from the analytic
+                Gaussian prediction intervals of the fitted models.
+
+        Returns:
+            pd.DataFrame: Columns ``[id_col, time_col, "arima"]``, plus one
+                column per quantile named by ``quantile_column``.
+        """
+        if self.state_ is None:
+            raise ValueError("Model must be trained before forecasting. Call train().")
+        mean, se = forecast_state(self.state_, horizon)
+        dates = future_dates(self.last_ds, horizon, self.freq)
+        forecasts = pd.DataFrame(
+            {
+                self.id_col: np.repeat(self.ids, horizon),
+                self.time_col: dates.ravel(),
+                self.alias: mean.ravel(),
+            }
+        )
+        for q in quantiles or []:
+            z = stats.norm.ppf(q)
+            values = mean if z == 0 else mean + z * se
+            forecasts[quantile_column(self.alias, q)] = values.ravel()
+        return forecasts
@@ -0,0 +1,288 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src import config
+from src.helper.metrics import evaluate
+from src.helper.utils import get_freq, get_season_length
+from src.models.feature_engineering import FeatureEngineering
+from src.models.model_run import MODELS, _resolve_n_jobs, identify_timeseries, model_run
+
+logger = logging.getLogger(__name__)
+
+
+def make_cutoffs(last_ds, horizon, n_folds, step=None, freq=None):
+    """Forecast origins of a backtest, oldest first.
+
+    The last origin leaves exactly ``horizon`` periods of the panel to forecast
+    and earlier origins are ``step`` periods apart.
+
+    Args:
+        last_ds (pd.Timestamp): Last timestamp of the panel.
+        horizon (int): Number of periods forecast from every origin.
+        n_folds (int): Number of origins.
+        step (int, optional): Periods between origins. Defaults to ``horizon``.
+        freq (str, optional): Pandas frequency alias. Defaults to the configured
+            interval.
+
+    Returns:
+        list: Timestamps of the last training observation of every fold.
+    """
+    offset = pd.tseries.frequencies.to_offset(
+        freq or get_freq(config.FORECASTING_CONFIG["interval"])
+    )
+    step = step or horizon
+    last_ds = pd.Timestamp(last_ds)
+    return [last_ds - (horizon + fold * step) * offset for fold in range(n_folds)][
+        ::-1
+    ]
+
+
+def _forecast_fold(train, model_name, horizon, n_jobs, features=None, reference=None):
+    """Forecast one fold with a model, reusing precomputed features if given."""
+    if model_name == "lightgbm" and features is not None:
+        from src.models.lightgbm import LightGBM
+
+        model = LightGBM(n_jobs=n_jobs)
+        return model.train(train, features=features).forecast(horizon), []
+    forecasts, report = model_run(
+        train,
+        model_name,
+        horizon,
+        n_jobs=n_jobs,
+        reference=reference if model_name == "cold_start" else None,
+    )
+    return forecasts, report.attrs["failures"]
+
+
+def _run_fold(fold, cutoff, train, test, buckets, horizon, n_jobs, metrics, features):
+    """Fit every bucket's models on one fold and score them on the fold's test rows.
+
+    Args:
+        fold (int): Position of the fold, oldest first.
+        cutoff (pd.Timestamp): Last training timestamp of the fold.
+        train (pd.DataFrame): Training rows of the fold.
+        test (pd.DataFrame): Rows forecast by the fold.
+        buckets (dict): ``(series_ids, models)`` keyed by bucket.
+        horizon (int): Number of periods to forecast.
+        n_jobs (int): Worker processes for the per-series models.
+        metrics (list): Metrics to compute.
+        features (pd.DataFrame, optional): Precomputed features of ``train``.
+
+    Returns:
+        dict: Metrics per series, model and bucket, failures and wall time.
+    """
+    start = time.perf_counter()
+    run_config = config.FORECASTING_CONFIG
+    id_col = run_config["partition_dim"]
+    target_col = run_config["target"]
+    seasonality = get_season_length(run_config["interval"])
+
+    frames = []
+    failures = []
+    for bucket, (ids, models) in buckets.items():
+        in_bucket = train[id_col].isin(ids).to_numpy()
+        bucket_train = train[in_bucket]
+        bucket_test = test[test[id_col].isin(ids)]
+        if bucket_train.empty or bucket_test.empty:
+            continue
+        bucket_features = None if features is None else features[in_bucket]
+
+        scored = bucket_test[[id_col, "ds", target_col]]
+        for model_name in models:
+            forecasts, model_failures = _forecast_fold(
+                bucket_train,
+                model_name,
+                horizon,
+                n_jobs,
+                bucket_features,
+                reference=train[~in_bucket],
+            )
+            failures.extend((model_name, *failure) for failure in model_failures)
+            scored = scored.merge(forecasts, on=[id_col, "ds"], how="left")
+
+        scores = evaluate(
+            scored,
+            models,
+            metrics,
+            id_col=id_col,
+            target_col=target_col,
+            train=bucket_train,
+            seasonality=seasonality,
+        )["series"]
+        frames.append(scores.assign(bucket=bucket))
+
+    return {
+        "fold": fold,
+        "cutoff": cutoff,
+        "scores": pd.concat(frames, ignore_index=True) if frames else None,
+        "failures": failures,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+def backtest(
+    df,
+    horizon,
+    models=None,
+    n_folds=None,
+    step=None,
+    window=None,
+    window_size=None,
+    metrics=None,
+    n_jobs=None,
+):
+    """Backtest models on rolling forecast origins over the whole panel.
+
+    Every fold trains on the panel up to its origin and forecasts the next
+    ``horizon`` periods. Series are first routed to their bucket and evaluated
+    with that bucket's models, unless ``models`` is given. Lag and rolling
+    features are computed once on the full panel and sliced per fold, which is
+    leak-free since they only use past observations. Folds run in parallel
+    worker processes and the remaining workers are shared by the per-series
+    models inside each fold.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with ``partition_dim``, "ds" and
+            ``target`` columns.
+        horizon (int): Number of periods forecast from every origin.
+        models (list, optional): Models to evaluate on every series.
+        n_folds (int, optional): Number of origins. Defaults to the configuration.
+        step (int, optional): Periods between origins. Defaults to ``horizon``.
+        window (str, optional): "expanding" keeps all history before an origin,
+            "rolling" only the last ``window_size`` periods.
+        window_size (int, optional): Periods kept by a rolling window.
+        metrics (list, optional): Metrics to compute, defaults to all metrics.
+        n_jobs (int, optional): Worker processes, -1 for all cores, 1 runs inline.
+
+    Returns:
+        pd.DataFrame: Tidy table with one row per fold, bucket, model and series,
+            the fold's cutoff and one column per metric. Failed series are listed
+            in ``attrs["failures"]`` and fold timings in ``attrs["timings"]``.
+    """
+    run_config = config.FORECASTING_CONFIG
+    bt_config = run_config["backtest"]
+    id_col = run_config["partition_dim"]
+    n_folds = n_folds or bt_config["n_folds"]
+    step = step or bt_config["step"]
+    window = window or bt_config["window"]
+    window_size = window_size or bt_config["window_size"]
+    n_jobs = _resolve_n_jobs(
+        run_config["execution"]["n_jobs"] if n_jobs is None else n_jobs
+    )
+    if window not in ("expanding", "rolling"):
+        raise ValueError(f"Unknown window: {window}")
+    if window == "rolling" and not window_size:
+        raise ValueError("A rolling window needs a window_size")
+
+    if models is not None:
+        buckets = {"all": (df[id_col].unique(), list(models))}
+    else:
+        routing = identify_timeseries(df)
+        buckets = {}
+        for bucket, bucket_config in run_config["models"].items():
+            ids = routing.loc[routing["bucket"] == bucket, id_col].to_numpy()
+            bucket_models = [m for m in bucket_config["models"] if m in MODELS]
+            if len(ids) and bucket_models:
+                buckets[bucket] = (ids, bucket_models)
+
+    # Features depend only on past values, so one pass serves every fold.
+    features = None
+    if any("lightgbm" in bucket_models for _, bucket_models in buckets.values()):
+        features = FeatureEngineering().transform(df)
+
+    offset = pd.tseries.frequencies.to_offset(get_freq(run_config["interval"]))
+    cutoffs = make_cutoffs(df["ds"].max(), horizon, n_folds, step)
+    folds = []
+    for fold, cutoff in enumerate(cutoffs):
+        in_train = (df["ds"] <= cutoff).to_numpy()
+        if window == "rolling":
+            in_train &= (df["ds"] > cutoff - window_size * offset).to_numpy()
+        in_test = (df["ds"] > cutoff) & (df["ds"] <= cutoff + horizon * offset)
+        fold_features = None if features is None else features[in_train]
+        folds.append((fold, cutoff, df[in_train], df[in_test], fold_features))
+
+    n_workers = min(n_jobs, len(folds))
+    inner_jobs = max(n_jobs // max(n_workers, 1), 1)
+    results = []
+
+    def _collect(result):
+        results.append(result)
+        logger.info(
+            f"Fold {result['fold']} ({result['cutoff']:%Y-%m-%d}) finished in "
+            f"{result['wall_time']:.2f}s ({len(result['failures'])} failures)"
+        )
+
+    if n_workers <= 1:
+        for fold, cutoff, train, test, fold_features in folds:
+            _collect(
+                _run_fold(
+                    fold,
+                    cutoff,
+                    train,
+                    test,
+                    buckets,
+                    horizon,
+                    inner_jobs,
+                    metrics,
+                    fold_features,
+                )
+            )
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    _run_fold,
+                    fold,
+                    cutoff,
+                    train,
+                    test,
+                    buckets,
+                    horizon,
+                    inner_jobs,
+                    metrics,
+                    fold_features,
+                )
+                for fold, cutoff, train, test, fold_features in folds
+            ]
+            for future in as_completed(futures):
+                _collect(future.result())
+
+    results.sort(key=lambda result: result["fold"])
+    frames = [
+        result["scores"].assign(fold=result["fold"], cutoff=result["cutoff"])
+        for result in results
+        if result["scores"] is not None
+    ]
+    scores = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not scores.empty:
+        leading = ["fold", "cutoff", "bucket", "model", id_col]
+        scores = scores[leading + [c for c in scores.columns if c not in leading]]
+    scores.attrs["failures"] = [
+        (result["fold"], *failure)
+        for result in results
+        for failure in result["failures"]
+    ]
+    scores.attrs["timings"] = [
+        {"fold": r["fold"], "cutoff": r["cutoff"], "wall_time": r["wall_time"]}
+        for r in results
+    ]
+    return scores
+
+
+def summarize(scores, by=("bucket", "model")):
+    """Average the backtest metrics over folds and series.
+
+    Args:
+        scores (pd.DataFrame): Output of ``backtest``.
+        by (tuple): Columns to group by.
+
+    Returns:
+        pd.DataFrame: Mean of every metric per group.
+    """
+    id_col = config.FORECASTING_CONFIG["partition_dim"]
+    keys = {"fold", "cutoff", "bucket", "model", id_col}
+    metrics = [c for c in scores.columns if c not in keys]
+    return scores.groupby(list(by), observed=True)[metrics].mean().reset_index()
@@ -1,11 +1,20 @@
 import numpy as np
 
+from src.helper.utils import append_panel
+
 
 class BaselineForecaster:
     """
-    A collection of baseline forecasting methods for benchmarking
+    A collection of baseline forecasting methods for benchmarking.
+
+    Works on a single series (1-D array) or on a panel of series stored as a
+    ``(n_series, T)`` array, in which case every method is computed for all
+    series at once without a per-series loop. Ragged panels are supported either
+    through per-series ``lengths`` or by padding missing values with NaN.
     """
-    
+
+    METHODS = ("naive", "seasonal_naive", "mean", "drift")
+
     def __init__(self, method='naive', seasonality=1):
         """
         Initialize the baseline forecaster
@@ -16,55 +25,126 @@ class BaselineForecaster:
         self.method = method
         self.seasonality = seasonality
         self.y_train = None
-        
-    def fit(self, y_train):
+
+    def fit(self, y_train, lengths=None):
         """
         Fit the baseline model
         Args:
-            y_train (array-like): Training data
+            y_train (array-like): Training data, a 1-D series or a (n_series, T) panel.
+                NaN values are treated as missing.
+            lengths (array-like, optional): Number of valid leading values of each
+                row of a ragged panel. Values past the length are ignored.
         """
-        self.y_train = np.array(y_train)
+        y_train = np.asarray(y_train, dtype=np.float64)
+        self._single = y_train.ndim == 1
+        self.y_train = np.atleast_2d(y_train)
+
+        mask = ~np.isnan(self.y_train)
+        if lengths is not None:
+            positions = np.arange(self.y_train.shape[1])
+            mask &= positions < np.asarray(lengths)[:, None]
+        self._mask = mask
+        self._n_valid = mask.sum(axis=1)
+        self._first_idx = mask.argmax(axis=1)
+        self._last_idx = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+        # Without lengths, new observations follow the last observed value
+        self._lengths = np.asarray(
+            np.where(self._n_valid > 0, self._last_idx + 1, 0)
+            if lengths is None
+            else lengths
+        )
         return self
-    
+
+    def update(self, new_obs):
+        """
+        Append newly arrived observations; the baseline methods have no parameters
+        to re-estimate.
+        Args:
+            new_obs (array-like): New values, shape (k,) for a single series or
+                (n_series, k) for a panel, NaN where a series has no observation.
+        """
+        if self.y_train is None:
+            raise ValueError("Model must be fitted before updating. Call fit() first.")
+        new_obs = np.asarray(new_obs, dtype=np.float64)
+        single = self._single
+        panel, lengths = append_panel(
+            self.y_train, self._lengths, np.atleast_2d(new_obs)
+        )
+        self.fit(panel, lengths=lengths)
+        self._single = single
+        return self
+
     def forecast(self, horizon):
         """
         Generate forecasts
         Args:
             horizon (int): Number of periods to forecast
         Returns:
-            array: Forecast values
+            array: Forecast values, shape (horizon,) for a single series or
+                (n_series, horizon) for a panel.
         """
         if self.y_train is None:
             raise ValueError("Model must be fitted before prediction. Call fit() first.")
-        
-        if self.method == 'naive':
-            return self._naive_forecast(horizon)
-        elif self.method == 'seasonal_naive':
-            return self._seasonal_naive_forecast(horizon)
-        elif self.method == 'mean':
-            return self._mean_forecast(horizon)
-        elif self.method == 'drift':
-            return self._drift_forecast(horizon)
-        else:
+
+        kernels = {
+            'naive': self._naive_forecast,
+            'seasonal_naive': self._seasonal_naive_forecast,
+            'mean': self._mean_forecast,
+            'drift': self._drift_forecast,
+        }
+        if self.method not in kernels:
             raise ValueError(f"Unknown method: {self.method}")
-    
+        return self._finalize(kernels[self.method](horizon))
+
+    def forecast_all(self, horizon):
+        """
+        Generate forecasts for every baseline method
+        Args:
+            horizon (int): Number of periods to forecast
+        Returns:
+            dict: Forecast array of each method in ``METHODS``.
+        """
+        if self.y_train is None:
+            raise ValueError("Model must be fitted before prediction. Call fit() first.")
+
+        return {
+            'naive': self._finalize(self._naive_forecast(horizon)),
+            'seasonal_naive': self._finalize(self._seasonal_naive_forecast(horizon)),
+            'mean': self._finalize(self._mean_forecast(horizon)),
+            'drift': self._finalize(self._drift_forecast(horizon)),
+        }
+
+    def _finalize(self, forecast):
+        """Blank out series without history and unwrap single-series input."""
+        forecast[self._n_valid == 0] = np.nan
+        return forecast[0] if self._single else forecast
+
+    def _last_values(self):
+        return self.y_train[np.arange(len(self.y_train)), self._last_idx]
+
     def _naive_forecast(self, horizon):
         """Naive forecast: last observed value"""
-        return np.full(horizon, self.y_train[-1])
-    
+        return np.repeat(self._last_values()[:, None], horizon, axis=1)
+
     def _seasonal_naive_forecast(self, horizon):
         """Seasonal naive forecast: values from same season in previous cycle"""
-        forecast = np.array([self.y_train[-(self.seasonality - i % self.seasonality)] 
-                           for i in range(horizon)])
-        return forecast
-    
+        steps = np.arange(horizon) % self.seasonality
+        idx = self._last_idx[:, None] - self.seasonality + 1 + steps[None, :]
+        in_history = idx >= self._first_idx[:, None]
+        forecast = np.take_along_axis(self.y_train, np.maximum(idx, 0), axis=1)
+        return np.where(in_history, forecast, np.nan)
+
     def _mean_forecast(self, horizon):
         """Mean forecast: historical mean"""
-        return np.full(horizon, np.mean(self.y_train))
-    
+        total = np.where(self._mask, self.y_train, 0.0).sum(axis=1)
+        mean = total / np.maximum(self._n_valid, 1)
+        return np.repeat(mean[:, None], horizon, axis=1)
+
     def _drift_forecast(self, horizon):
         """Drift forecast: linear extrapolation"""
-        n = len(self.y_train)
-        drift = (self.y_train[-1] - self.y_train[0]) / (n - 1)
-        forecast = np.array([self.y_train[-1] + drift * i for i in range(1, horizon + 1)])
-        return forecast
\ No newline at end of file
+        rows = np.arange(len(self.y_train))
+        last = self.y_train[rows, self._last_idx]
+        first = self.y_train[rows, self._first_idx]
+        span = self._last_idx - self._first_idx
+        drift = np.divide(last - first, span, out=np.zeros_like(last), where=span > 0)
+        return last[:, None] + drift[:, None] * np.arange(1, horizon + 1)[None, :]
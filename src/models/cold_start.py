@@ -0,0 +1,393 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+from src import config
+from src.helper.utils import future_dates, get_freq, split_series, stack_series
+
+logger = logging.getLogger(__name__)
+
+
+class _IVFIndex:
+    """Inverted-file index for approximate nearest neighbour search.
+
+    The vectors are clustered with k-means and stored in one list per
+    centroid. A query scans only the lists of its ``n_probe`` nearest
+    centroids, so the cost of a lookup grows with the list sizes rather than
+    the number of indexed vectors.
+    """
+
+    def __init__(self, n_lists, n_probe):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroids = None
+        self.lists = None
+        self.vectors = None
+        self.assignment = None
+
+    def fit(self, vectors):
+        n_lists = max(min(self.n_lists or int(np.sqrt(len(vectors))), len(vectors)), 1)
+        kmeans = KMeans(n_lists, n_init=1, max_iter=20, random_state=config.SEED)
+        assignment = kmeans.fit_predict(vectors)
+        return self.restore(kmeans.cluster_centers_, vectors, assignment)
+
+    def restore(self, centroids, vectors, assignment):
+        """Rebuild the lists from the centroids and the list of every vector."""
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.vectors = np.asarray(vectors, dtype=np.float64)
+        self.assignment = np.asarray(assignment, dtype=np.int64)
+        self.lists = [
+            np.flatnonzero(self.assignment == i) for i in range(len(self.centroids))
+        ]
+        return self
+
+    def add(self, vectors):
+        """Append vectors to the lists of their nearest centroids."""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        offset = len(self.vectors)
+        self.vectors = np.vstack([self.vectors, vectors])
+        assignment = _sq_distances(vectors, self.centroids).argmin(axis=1)
+        self.assignment = np.concatenate([self.assignment, assignment])
+        for i in np.unique(assignment):
+            new = offset + np.flatnonzero(assignment == i)
+            self.lists[i] = np.concatenate([self.lists[i], new])
+
+    def search(self, queries, k):
+        """Indices and squared distances of the ``k`` nearest vectors per query.
+
+        Rows are padded with -1 and infinite distances when the probed lists
+        hold fewer than ``k`` vectors.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(
+            _sq_distances(queries, self.centroids), n_probe - 1, axis=1
+        )[:, :n_probe]
+        indices = np.full((len(queries), k), -1)
+        distances = np.full((len(queries), k), np.inf)
+        for q, probe in enumerate(probes):
+            candidates = np.concatenate([self.lists[i] for i in probe])
+            if not len(candidates):
+                continue
+            d = _sq_distances(queries[q : q + 1], self.vectors[candidates])[0]
+            n = min(k, len(candidates))
+            nearest = np.argpartition(d, n - 1)[:n]
+            nearest = nearest[np.argsort(d[nearest])]
+            indices[q, :n] = candidates[nearest]
+            distances[q, :n] = d[nearest]
+        return indices, distances
+
+
+def _sq_distances(a, b):
+    """Squared Euclidean distances between the rows of ``a`` and ``b``."""
+    return np.maximum(
+        (a**2).sum(axis=1)[:, None] - 2 * a @ b.T + (b**2).sum(axis=1)[None, :], 0.0
+    )
+
+
+class ColdStartForecaster:
+    """Forecast newly launched series from the launch curves of similar series.
+
+    Every series launched within the reference panel, i.e. first observed
+    after the panel starts, contributes its first ``curve_length`` periods
+    once it has them, divided by their mean, and an embedding of its
+    attributes: one-hot categories and standardized numeric columns. Series
+    observed since the start of the panel are left out, as their first
+    periods are only the start of the data window, not a launch. A new series
+    is matched to its ``k`` nearest analogues through an inverted-file index
+    over the embeddings, and their curves are blended with inverse-distance
+    weights.
+    The blended curve is scaled to the periods the new series has already
+    been observed for, shrunk towards the analogues' level while those are
+    few. Without attribute columns every new series gets the average curve.
+    """
+
+    alias = "cold_start"
+
+    def __init__(
+        self,
+        attributes=None,
+        curve_length=None,
+        k=None,
+        n_lists=None,
+        n_probe=None,
+        shrinkage=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """
+        Args:
+            attributes (list, optional): Columns describing a series, constant
+                within it. Defaults to the configuration.
+            curve_length (int, optional): Periods after launch kept per curve.
+            k (int, optional): Analogues blended per new series.
+            n_lists (int, optional): Lists of the index, defaults to the square
+                root of the number of curves.
+            n_probe (int, optional): Lists scanned per lookup.
+            shrinkage (float, optional): Observed periods at which the series'
+                own scale and the analogues' level weigh the same.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        cs_config = run_config["cold_start"]
+        self.logger = logging.getLogger(__name__)
+        self.attributes = list(
+            cs_config["attributes"] if attributes is None else attributes
+        )
+        self.curve_length = curve_length or cs_config["curve_length"]
+        self.k = k or cs_config["k"]
+        self.n_lists = n_lists or cs_config["n_lists"]
+        self.n_probe = n_probe or cs_config["n_probe"]
+        self.shrinkage = cs_config["shrinkage"] if shrinkage is None else shrinkage
+        self.freq = get_freq(run_config["interval"])
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.index = None
+        self.curves = None
+        self.levels = None
+        self.ids = None
+        self.launched_after = None
+
+    def _launch_curves(self, df, launched_after):
+        """Normalized curves and levels of the series launched after a date.
+
+        Only series first observed after ``launched_after`` and with a full
+        curve are kept.
+        """
+        ids, starts, ends, values, _ = split_series(
+            df, self.id_col, self.time_col, self.target_col
+        )
+        first_ds = df.groupby(self.id_col, observed=True)[self.time_col].min()
+        launched = first_ds.reindex(ids).to_numpy() > np.datetime64(launched_after)
+        mature = launched & (ends - starts >= self.curve_length)
+        starts, ids = starts[mature], ids[mature]
+        curves = values[starts[:, None] + np.arange(self.curve_length)[None, :]]
+        levels = np.nanmean(curves, axis=1)
+        curves = np.divide(
+            curves,
+            levels[:, None],
+            out=np.ones_like(curves),
+            where=levels[:, None] > 0,
+        )
+        return ids, np.nan_to_num(curves, nan=1.0), np.nan_to_num(levels)
+
+    def _series_attributes(self, df, ids):
+        return (
+            df.groupby(self.id_col, observed=True)[self.attributes]
+            .first()
+            .reindex(ids)
+        )
+
+    def _fit_encoding(self, attributes):
+        categorical = [
+            c
+            for c in self.attributes
+            if not pd.api.types.is_numeric_dtype(attributes[c])
+        ]
+        self.vocabulary = {
+            c: pd.Index(attributes[c].dropna().astype(str).unique()).sort_values()
+            for c in categorical
+        }
+        numeric = [c for c in self.attributes if c not in self.vocabulary]
+        values = attributes[numeric].to_numpy(dtype=np.float64)
+        self.numeric = numeric
+        self.mean = np.nanmean(values, axis=0) if numeric else np.empty(0)
+        std = np.nanstd(values, axis=0) if numeric else np.empty(0)
+        self.std = np.where(std > 0, std, 1.0)
+
+    def _encode(self, attributes):
+        """Embed series attributes: one-hot categories, standardized numbers."""
+        blocks = []
+        for column, vocabulary in self.vocabulary.items():
+            codes = vocabulary.get_indexer(attributes[column].astype(str))
+            onehot = np.zeros((len(attributes), len(vocabulary)))
+            known = codes >= 0
+            onehot[np.flatnonzero(known), codes[known]] = 1.0
+            blocks.append(onehot)
+        if self.numeric:
+            values = attributes[self.numeric].to_numpy(dtype=np.float64)
+            blocks.append(np.nan_to_num((values - self.mean) / self.std))
+        return np.hstack(blocks) if blocks else np.empty((len(attributes), 0))
+
+    def fit(self, reference):
+        """Index the launch curves of the series launched within a panel.
+
+        Args:
+            reference (pd.DataFrame): Long-format panel of established series
+                with the attribute columns.
+
+        Returns:
+            ColdStartForecaster: The fitted model.
+        """
+        self.launched_after = pd.Timestamp(reference[self.time_col].min())
+        ids, curves, levels = self._launch_curves(reference, self.launched_after)
+        if not len(ids):
+            raise ValueError(
+                f"No series launched after {self.launched_after} with "
+                f"{self.curve_length} periods to take curves from"
+            )
+        attributes = self._series_attributes(reference, ids)
+        self._fit_encoding(attributes)
+        self.ids, self.curves, self.levels = ids, curves, levels
+        embeddings = self._encode(attributes)
+        self.index = None
+        if embeddings.shape[1]:
+            self.index = _IVFIndex(self.n_lists, self.n_probe).fit(embeddings)
+        self.logger.info(f"Indexed the launch curves of {len(ids)} series")
+        return self
+
+    def add(self, matured, launched_after=None):
+        """Add the curves of series that have matured since ``fit``.
+
+        New curves join the list of their nearest existing centroid; the
+        centroids themselves are only recomputed by ``fit``. Series already
+        in the index are skipped.
+
+        Args:
+            matured (pd.DataFrame): Long-format panel of the matured series.
+            launched_after (pd.Timestamp, optional): Only series first observed
+                after this date count as launched, e.g. the start of a
+                reference panel. Defaults to the start of the panel of ``fit``.
+
+        Returns:
+            ColdStartForecaster: The updated model.
+        """
+        if self.curves is None:
+            return self.fit(matured)
+        if matured.empty:
+            return self
+        if launched_after is None:
+            launched_after = self.launched_after
+        ids, curves, levels = self._launch_curves(matured, launched_after)
+        new = ~np.isin(np.asarray(ids).astype(str), np.asarray(self.ids).astype(str))
+        ids, curves, levels = ids[new], curves[new], levels[new]
+        if not len(ids):
+            return self
+        self.ids = np.concatenate([self.ids, ids])
+        self.curves = np.vstack([self.curves, curves])
+        self.levels = np.concatenate([self.levels, levels])
+        if self.index is not None:
+            self.index.add(self._encode(self._series_attributes(matured, ids)))
+        self.logger.info(f"Added the launch curves of {len(ids)} series")
+        return self
+
+    def state(self):
+        """Indexed curves for the model registry.
+
+        Returns:
+            tuple: (ids, arrays, metadata) with the curve, level, attribute
+                embedding and index list of every indexed series, and the
+                centroids and attribute encoding as JSON-serializable metadata.
+        """
+        if self.curves is None:
+            raise ValueError("Model must be fitted first. Call fit().")
+        arrays = {"curves": self.curves, "levels": self.levels}
+        metadata = {
+            "launched_after": self.launched_after.isoformat(),
+            "vocabulary": {c: list(v) for c, v in self.vocabulary.items()},
+            "numeric": self.numeric,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "centroids": None,
+        }
+        if self.index is not None:
+            arrays["embeddings"] = self.index.vectors
+            arrays["lists"] = self.index.assignment
+            metadata["centroids"] = self.index.centroids.tolist()
+        return self.ids, arrays, metadata
+
+    @classmethod
+    def from_state(cls, ids, arrays, metadata, **kwargs):
+        """Rebuild a fitted model from the output of ``state``.
+
+        Args:
+            ids (array-like): IDs of the indexed series.
+            arrays (dict): Arrays of ``state``.
+            metadata (dict): Metadata of ``state``.
+            **kwargs: Arguments of the constructor.
+
+        Returns:
+            ColdStartForecaster: Model that forecasts and adds curves without
+                refitting its index.
+        """
+        model = cls(**kwargs)
+        model.ids = np.asarray(ids)
+        model.curves = np.asarray(arrays["curves"], dtype=np.float64)
+        model.levels = np.asarray(arrays["levels"], dtype=np.float64)
+        model.launched_after = pd.Timestamp(metadata["launched_after"])
+        model.vocabulary = {
+            c: pd.Index(v, dtype=object) for c, v in metadata["vocabulary"].items()
+        }
+        model.numeric = list(metadata["numeric"])
+        model.mean = np.asarray(metadata["mean"], dtype=np.float64)
+        model.std = np.asarray(metadata["std"], dtype=np.float64)
+        if metadata["centroids"] is not None:
+            model.index = _IVFIndex(model.n_lists, model.n_probe).restore(
+                metadata["centroids"], arrays["embeddings"], arrays["lists"]
+            )
+        return model
+
+    def forecast(self, df, horizon):
+        """Forecast new series from the curves of their nearest analogues.
+
+        Args:
+            df (pd.DataFrame): Long-format panel of the new series with the
+                attribute columns. Series must have at least one row, which
+                marks their launch.
+            horizon (int): Number of periods to forecast.
+
+        Returns:
+            pd.DataFrame: Columns ``[id_col, time_col, "cold_start"]``.
+        """
+        if self.curves is None:
+            raise ValueError("Model must be fitted before forecasting. Call fit().")
+
+        ids, starts, ends, values, last_ds = split_series(
+            df, self.id_col, self.time_col, self.target_col
+        )
+        observed, n_observed = stack_series(starts, ends, values)
+
+        if self.index is None:
+            shapes = np.repeat(self.curves.mean(axis=0)[None], len(ids), axis=0)
+            priors = np.full(len(ids), self.levels.mean())
+        else:
+            embeddings = self._encode(self._series_attributes(df, ids))
+            neighbours, distances = self.index.search(embeddings, self.k)
+            weights = np.where(neighbours >= 0, 1 / (np.sqrt(distances) + 1e-3), 0.0)
+            weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+            neighbours = np.maximum(neighbours, 0)
+            shapes = np.einsum("qk,qkt->qt", weights, self.curves[neighbours])
+            priors = (weights * self.levels[neighbours]).sum(axis=1)
+
+        # Scale the shape to the periods observed so far, by least squares
+        width = min(observed.shape[1], self.curve_length)
+        seen = observed[:, :width]
+        valid = ~np.isnan(seen)
+        fitted = np.where(valid, shapes[:, :width], 0.0)
+        num = (np.where(valid, seen, 0.0) * fitted).sum(axis=1)
+        den = (fitted**2).sum(axis=1)
+        own = np.divide(num, den, out=priors.copy(), where=den > 0)
+        n_valid = valid.sum(axis=1)
+        scale = (n_valid * own + self.shrinkage * priors) / np.maximum(
+            n_valid + self.shrinkage, 1e-12
+        )
+
+        # Curves are extended flat beyond their last period
+        steps = np.minimum(
+            n_observed[:, None] + np.arange(horizon)[None, :], self.curve_length - 1
+        )
+        predictions = scale[:, None] * np.take_along_axis(shapes, steps, axis=1)
+        dates = future_dates(last_ds, horizon, self.freq)
+        return pd.DataFrame(
+            {
+                self.id_col: np.repeat(ids, horizon),
+                self.time_col: dates.ravel(),
+                self.alias: predictions.ravel(),
+            }
+        )
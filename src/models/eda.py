@@ -1,19 +1,436 @@
+import base64
+import html
+import io
+import logging
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
 from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
 from statsmodels.tsa.seasonal import seasonal_decompose
 
+from src import config
+from src.helper.utils import get_season_length, split_series, stack_series
+from src.models.feature_selection import FeatureSelector
+
+logger = logging.getLogger(__name__)
+
+# Syntetos-Boylan cut-offs on the average demand interval and squared CV of sizes
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+
+
+def _acf(values, valid, max_lag, adjusted=True):
+    """Autocorrelation of every row for lags 0..max_lag through the FFT.
+
+    Covariances are computed for all lags at once (Wiener-Khinchin), so missing
+    values and ragged lengths are handled without a per-series loop.
+
+    Args:
+        values (np.ndarray): Array of shape (n_series, T).
+        valid (np.ndarray): Boolean mask of the observed values.
+        max_lag (int): Longest lag.
+        adjusted (bool): Normalise every lag by its number of observed pairs.
+            Otherwise all lags are normalised by the number of observations,
+            the usual estimator, which stays within [-1, 1] on short series.
+
+    Returns:
+        tuple: (acf, n_pairs), both of shape (n_series, max_lag + 1). The ACF is
+            NaN where fewer than two pairs are observed.
+    """
+    n_fft = 1 << int(np.ceil(np.log2(2 * values.shape[1])))
+    lags = np.arange(max_lag + 1)
+    count = valid.sum(axis=1)
+    mean = np.where(valid, values, 0.0).sum(axis=1) / np.maximum(count, 1)
+    centered = np.where(valid, values - mean[:, None], 0.0)
+
+    def _correlate(x):
+        spectrum = np.fft.rfft(x, n=n_fft, axis=1)
+        return np.fft.irfft(np.abs(spectrum) ** 2, n=n_fft, axis=1)[:, lags]
+
+    covariance = _correlate(centered)
+    n_pairs = np.rint(_correlate(valid.astype(np.float64)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if adjusted:
+            acf = (covariance / n_pairs) / (covariance[:, :1] / n_pairs[:, :1])
+        else:
+            acf = covariance / covariance[:, :1]
+    acf[n_pairs < 2] = np.nan
+    return acf, n_pairs
+
+
+def _pacf(acf):
+    """Partial autocorrelation from the ACF by the Durbin-Levinson recursion.
+
+    Args:
+        acf (np.ndarray): ACF of shape (n_series, max_lag + 1).
+
+    Returns:
+        np.ndarray: PACF of the same shape, 1 at lag 0.
+    """
+    n_series, n_lags = acf.shape
+    pacf = np.full((n_series, n_lags), np.nan)
+    pacf[:, 0] = 1.0
+    if n_lags < 2:
+        return pacf
+    phi = acf[:, 1:2].copy()
+    pacf[:, 1] = acf[:, 1]
+    for k in range(2, n_lags):
+        previous = acf[:, 1:k]
+        num = acf[:, k] - (phi * previous[:, ::-1]).sum(axis=1)
+        den = 1 - (phi * previous).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phi_kk = num / den
+        phi = np.hstack([phi - phi_kk[:, None] * phi[:, ::-1], phi_kk[:, None]])
+        pacf[:, k] = phi_kk
+    return pacf
+
+
+def _decompose(panel, period):
+    """Classical additive decomposition of every row of a panel.
+
+    The trend is a centred moving average over one season (a 2xm average for an
+    even period), the seasonal component the mean detrended value of each
+    phase, centred, and the remainder what is left.
+
+    Args:
+        panel (np.ndarray): Array of shape (n_series, T), NaN for missing values.
+        period (int): Seasonal period, 1 for a trend-only decomposition.
+
+    Returns:
+        tuple: (trend, seasonal, remainder) arrays shaped like ``panel``.
+    """
+    n_series, length = panel.shape
+    window = max(period, 3)
+    half = window // 2
+    weights = np.ones(2 * half + 1)
+    if window % 2 == 0:
+        weights[[0, -1]] = 0.5
+    weights /= weights.sum()
+
+    trend = np.full_like(panel, np.nan)
+    if length > 2 * half:
+        inner = np.zeros((n_series, length - 2 * half))
+        for offset, weight in enumerate(weights):
+            inner += weight * panel[:, offset : offset + inner.shape[1]]
+        trend[:, half : length - half] = inner
+
+    detrended = panel - trend
+    seasonal = np.zeros_like(panel)
+    if period > 1:
+        phase = np.arange(length) % period
+        index = np.full((n_series, period), np.nan)
+        with warnings.catch_warnings():
+            # Phases without a detrended value give empty means
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for p in range(period):
+                index[:, p] = np.nanmean(detrended[:, phase == p], axis=1)
+            index -= np.nanmean(index, axis=1, keepdims=True)
+        seasonal = np.nan_to_num(index)[:, phase]
+    return trend, seasonal, detrended - seasonal
+
+
+def _strength(component, remainder):
+    """Strength of a component: 1 - Var(R) / Var(component + R), clipped at 0."""
+    valid = ~np.isnan(component) & ~np.isnan(remainder)
+    n = valid.sum(axis=1)
+
+    def _var(x):
+        x = np.where(valid, x, 0.0)
+        mean = x.sum(axis=1) / np.maximum(n, 1)
+        squared = np.where(valid, (x - mean[:, None]) ** 2, 0.0)
+        return squared.sum(axis=1) / np.maximum(n - 1, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = 1 - _var(remainder) / _var(component + remainder)
+    return np.where(n > 2, np.clip(strength, 0.0, 1.0), np.nan)
+
+
+def _finish(fig, show):
+    """Show a figure interactively, or just return it for batch use."""
+    if show:
+        plt.show()
+    return fig
+
+
+def _render_series(series_id, dates, values, trend, seasonal, acf, pacf):
+    """Render the report figure of one series as a base64 PNG.
+
+    Runs in worker processes, so it selects the non-interactive Agg backend
+    and only draws precomputed statistics.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 6))
+    axes[0, 0].plot(dates, values, linewidth=0.8, label="observed")
+    axes[0, 0].plot(dates, trend, linewidth=1.2, label="trend")
+    axes[0, 0].legend(loc="upper left", fontsize="small")
+    axes[0, 0].set_title(f"{series_id}")
+    axes[0, 1].plot(dates, seasonal, linewidth=0.8, color="tab:green")
+    axes[0, 1].set_title("Seasonal component")
+    lags = np.arange(len(acf))
+    bound = 1.96 / np.sqrt(max(np.isfinite(values).sum(), 1))
+    panels = ((axes[1, 0], acf, "ACF"), (axes[1, 1], pacf, "PACF"))
+    for ax, correlations, name in panels:
+        ax.vlines(lags, 0, correlations)
+        ax.axhline(0, color="black", linewidth=0.5)
+        ax.axhspan(-bound, bound, alpha=0.2)
+        ax.set_title(name)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=80)
+    plt.close(fig)
+    return series_id, base64.b64encode(buffer.getvalue()).decode()
+
 
 class TimeSeriesEDA:
 
     def __init__(self):
         pass
 
-    def run(self, **config):
-        """Run the EDA process based on the provided configuration."""
-        pass
+    def run(
+        self,
+        data,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+        series=None,
+        n_plots=None,
+        n_jobs=None,
+        output_dir=None,
+    ):
+        """Profile every series and write a headless EDA report.
+
+        Statistics are computed for all series at once by ``series_statistics``.
+        Figures are only rendered for ``series`` and a seeded sample of
+        ``n_plots`` further series, in worker processes with the Agg backend.
+        The statistics are written to ``series_stats.parquet`` and a single
+        self-contained ``report.html`` with a summary and the figures.
+
+        Args:
+            data (pd.DataFrame): Long-format frame with id, timestamp and target.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+            series (list, optional): Flagged series that are always plotted.
+            n_plots (int, optional): Sampled series plotted in addition.
+            n_jobs (int, optional): Worker processes rendering the figures.
+            output_dir (str or Path, optional): Output directory. Defaults to
+                ``OUTPUT_DIR/eda``.
+
+        Returns:
+            pd.DataFrame: Output of ``series_statistics``.
+        """
+        eda_config = config.FORECASTING_CONFIG["eda"]
+        id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        target_col = target_col or config.FORECASTING_CONFIG["target"]
+        n_plots = eda_config["n_plots"] if n_plots is None else n_plots
+        output_dir = Path(output_dir or config.OUTPUT_DIR / "eda")
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        stats = self.series_statistics(data, id_col, time_col, target_col)
+        stats.to_parquet(output_dir / "series_stats.parquet", index=False)
+
+        ids = stats[id_col].astype(str)
+        flagged = pd.Index([] if series is None else pd.Index(series).astype(str))
+        rest = ids[~ids.isin(flagged)].to_numpy()
+        rng = np.random.default_rng(config.SEED)
+        sampled = rng.choice(rest, min(n_plots, len(rest)), replace=False)
+        selected = list(flagged.intersection(ids)) + sorted(sampled)
+        figures = self._render(data, selected, id_col, time_col, target_col, n_jobs)
+
+        path = output_dir / "report.html"
+        path.write_text(self._report_html(stats, figures, id_col))
+        logger.info(f"Wrote the EDA report of {len(stats)} series to {output_dir}")
+        return stats
+
+    def _render(self, data, selected, id_col, time_col, target_col, n_jobs):
+        """Render the figures of the selected series in a process pool."""
+        if not selected:
+            return {}
+        eda_config = config.FORECASTING_CONFIG["eda"]
+        subset = data[data[id_col].astype(str).isin(selected)]
+        ids, starts, ends, values, _ = split_series(
+            subset, id_col, time_col, target_col
+        )
+        panel, _ = stack_series(starts, ends, values)
+        period = get_season_length(config.FORECASTING_CONFIG["interval"])
+        trend, seasonal, _ = _decompose(panel, period)
+        max_lag = max(min(eda_config["n_lags"], panel.shape[1] - 1), 1)
+        acf, _ = _acf(panel, ~np.isnan(panel), max_lag, adjusted=False)
+        pacf = _pacf(acf)
+        times = subset.sort_values([id_col, time_col], kind="stable")[time_col]
+        times = times.to_numpy()
+
+        tasks = [
+            (
+                str(ids[i]),
+                times[starts[i] : ends[i]],
+                panel[i, : ends[i] - starts[i]],
+                trend[i, : ends[i] - starts[i]],
+                seasonal[i, : ends[i] - starts[i]],
+                acf[i],
+                pacf[i],
+            )
+            for i in range(len(ids))
+        ]
+        n_jobs = n_jobs or config.FORECASTING_CONFIG["execution"]["n_jobs"]
+        if n_jobs is None or n_jobs < 1:
+            n_jobs = None
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            rendered = executor.map(_render_series, *zip(*tasks))
+            return dict(rendered)
+
+    def _report_html(self, stats, figures, id_col):
+        """Single self-contained HTML page with the summary and the figures."""
+        numeric = stats.select_dtypes("number")
+        sections = [
+            "<h1>Time series EDA</h1>",
+            f"<p>{len(stats)} series</p>",
+            "<h2>Summary statistics</h2>",
+            numeric.describe().T.to_html(float_format="%.3f"),
+            "<h2>Demand classes</h2>",
+            stats["demand_class"].value_counts().to_frame().to_html(),
+            "<h2>Series</h2>",
+        ]
+        rows = stats.set_index(stats[id_col].astype(str))
+        for series_id, image in figures.items():
+            summary = rows.loc[[series_id], numeric.columns].to_html(
+                float_format="%.3f", index=False
+            )
+            sections.append(
+                f"<h3>{html.escape(series_id)}</h3>{summary}"
+                f'<img src="data:image/png;base64,{image}"/>'
+            )
+        style = (
+            "body{font-family:sans-serif;margin:2em}"
+            "table{border-collapse:collapse;font-size:small}"
+            "td,th{border:1px solid #ccc;padding:2px 6px}"
+        )
+        return (
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<title>Time series EDA</title><style>{style}</style></head>"
+            f"<body>{''.join(sections)}</body></html>"
+        )
+
+    def series_statistics(
+        self, data, id_col=None, time_col="ds", target_col=None, chunk_size=2000
+    ):
+        """Compute the EDA statistics of every series in vectorized passes.
+
+        Extends ``series_profile`` with the ACF and PACF at the first lags and
+        the seasonal period, the trend and seasonal strength of a classical
+        decomposition at the configured season length, and the correlation of
+        the target with every other numeric column.
+
+        Args:
+            data (pd.DataFrame): Long-format frame with id, timestamp and target.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+            chunk_size (int): Series stacked and processed at a time, bounds
+                memory usage.
+
+        Returns:
+            pd.DataFrame: One row per series.
+        """
+        eda_config = config.FORECASTING_CONFIG["eda"]
+        id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        target_col = target_col or config.FORECASTING_CONFIG["target"]
+        period = get_season_length(config.FORECASTING_CONFIG["interval"])
+        n_lags = eda_config["n_lags"]
+
+        profile = self.series_profile(data, id_col, time_col, target_col)
+        ids, starts, ends, values, _ = split_series(data, id_col, time_col, target_col)
+        n_series = len(ids)
+        max_length = (ends - starts).max(initial=0)
+        max_lag = max(min(n_lags, max_length - 1), 1)
+        acf = np.full((n_series, max_lag + 1), np.nan)
+        pacf = np.full((n_series, max_lag + 1), np.nan)
+        trend_strength = np.full(n_series, np.nan)
+        seasonal_strength = np.full(n_series, np.nan)
+        for start in range(0, n_series, chunk_size):
+            rows = slice(start, min(start + chunk_size, n_series))
+            # Series are contiguous in ``values``, so a chunk is one slice of it
+            first, last = starts[rows][0], ends[rows][-1]
+            block, _ = stack_series(
+                starts[rows] - first, ends[rows] - first, values[first:last]
+            )
+            acf[rows], _ = _acf(block, ~np.isnan(block), max_lag, adjusted=False)
+            pacf[rows] = _pacf(acf[rows])
+            trend, seasonal, remainder = _decompose(block, period)
+            trend_strength[rows] = _strength(trend, remainder)
+            if period > 1:
+                seasonal_strength[rows] = _strength(seasonal, remainder)
+
+        stats = profile.assign(
+            trend_strength=trend_strength, seasonal_strength=seasonal_strength
+        )
+        shown = [lag for lag in (1, 2, period, 2 * period) if lag <= max_lag]
+        for lag in dict.fromkeys(shown):
+            stats[f"acf_{lag}"] = acf[:, lag]
+            stats[f"pacf_{lag}"] = pacf[:, lag]
+        periods = stats["seasonal_period"].to_numpy()
+        at_period = np.where(periods <= max_lag, periods, 0)
+        stats["acf_seasonal_period"] = np.where(
+            (periods > 1) & (periods <= max_lag),
+            acf[np.arange(n_series), at_period],
+            np.nan,
+        )
+
+        others = [
+            c
+            for c in data.select_dtypes("number").columns
+            if c not in (id_col, time_col, target_col)
+        ]
+        if others:
+            correlations = self._correlations(data, id_col, target_col, others)
+            stats = stats.merge(correlations, on=id_col, how="left")
+        return stats
+
+    def _correlations(self, data, id_col, target_col, columns):
+        """Pearson correlation of the target with ``columns`` within every series.
+
+        Every column is paired with the target over the rows where both are
+        present, so a gap in one column does not drop the rows of the others.
+        """
+        y = data[target_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        frame = {}
+        for column in columns:
+            x = data[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~(np.isnan(x) | np.isnan(y))
+            x, y_pair = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+            frame[f"n_{column}"] = valid.astype(np.float64)
+            frame[f"x_{column}"] = x
+            frame[f"xx_{column}"] = x * x
+            frame[f"y_{column}"] = y_pair
+            frame[f"yy_{column}"] = y_pair * y_pair
+            frame[f"xy_{column}"] = x * y_pair
+        sums = (
+            pd.DataFrame(frame, index=data.index)
+            .groupby(data[id_col], observed=True)
+            .sum()
+        )
+        correlations = {}
+        for column in columns:
+            n = sums[f"n_{column}"]
+            sum_x, sum_y = sums[f"x_{column}"], sums[f"y_{column}"]
+            var_x = sums[f"xx_{column}"] - sum_x**2 / n
+            var_y = sums[f"yy_{column}"] - sum_y**2 / n
+            cov = sums[f"xy_{column}"] - sum_x * sum_y / n
+            # Columns constant within a series have no correlation
+            var_x = var_x.where(var_x > 1e-12 * sums[f"xx_{column}"])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                correlations[f"corr_{column}"] = cov / np.sqrt(var_x * var_y)
+        return pd.DataFrame(correlations).reset_index()
 
     def monthly_seasonality(self):
         pass
@@ -21,38 +438,48 @@ class TimeSeriesEDA:
     def day_of_week_seasonality(self):
         pass
 
-    def plot_timeseries(self, data, column):
+    def plot_timeseries(self, data, column, show=True):
         """Plot the time series data.
 
         Args:
             data (pd.DataFrame): DataFrame containing the time series data.
             column (str): Column name of the time series to plot.
+            show (bool): Show the figure. Pass False in batch jobs.
+
+        Returns:
+            matplotlib.figure.Figure: The figure.
         """
-        plt.figure(figsize=(10, 6))
+        fig = plt.figure(figsize=(10, 6))
         plt.plot(data["ds"], data[column])
         plt.title(f"Time Series of {column}")
         plt.xlabel("Date")
         plt.ylabel(column)
         plt.grid(True)
-        plt.show()
+        return _finish(fig, show)
 
-    def plot_acf_pacf(self, data, column, lags=20):
+    def plot_acf_pacf(self, data, column, lags=20, show=True):
         """Plot the ACF and PACF.
 
         Args:
             data (pd.DataFrame): DataFrame containing the time series data.
             column (str): Column name of the time series.
             lags (int): Number of lags to display.
+            show (bool): Show the figure. Pass False in batch jobs.
+
+        Returns:
+            matplotlib.figure.Figure: The figure.
         """
-        plt.figure(figsize=(12, 6))
+        fig = plt.figure(figsize=(12, 6))
         plt.subplot(121)
         plot_acf(data[column], lags=lags, ax=plt.gca())
         plt.subplot(122)
         plot_pacf(data[column], lags=lags, ax=plt.gca())
         plt.tight_layout()
-        plt.show()
+        return _finish(fig, show)
 
-    def plot_seasonal_decomposition(self, data, column, model="additive", period=12):
+    def plot_seasonal_decomposition(
+        self, data, column, model="additive", period=12, show=True
+    ):
         """Plot seasonal decomposition of the time series data.
 
         Args:
@@ -60,52 +487,248 @@ class TimeSeriesEDA:
             column (str): Column name of the time series.
             model (str): Type of seasonal decomposition ('additive' or 'multiplicative').
             period (int): Number of periods in one season.
+            show (bool): Show the figure. Pass False in batch jobs.
+
+        Returns:
+            matplotlib.figure.Figure: The figure.
         """
         decomposition = seasonal_decompose(data[column], model=model, period=period)
-        decomposition.plot()
-        plt.show()
+        return _finish(decomposition.plot(), show)
 
-    def causal_analysis(self, data, target_column, feature_columns):
+    def causal_analysis(self, data, target_column, feature_columns, show=True):
         """Plot causal analysis between target and feature columns.
 
         Args:
             data (pd.DataFrame): DataFrame containing the time series data.
             target_column (str): Column name of the target variable.
             feature_columns (list): List of column names of the feature variables.
+            show (bool): Show the figures. Pass False in batch jobs.
+
+        Returns:
+            list: One figure per feature.
         """
+        figures = []
         for feature in feature_columns:
-            plt.figure(figsize=(10, 6))
+            fig = plt.figure(figsize=(10, 6))
             plt.scatter(data[feature], data[target_column])
             plt.title(f"{feature} vs {target_column}")
             plt.xlabel(feature)
             plt.ylabel(target_column)
             plt.grid(True)
-            plt.show()
+            figures.append(_finish(fig, show))
+        return figures
 
-    def grangers_test(self, data, columns):
-        pass
+    def grangers_test(
+        self, data, columns, id_col=None, time_col="ds", target_col=None, group_col=None
+    ):
+        """Granger causality of the target by every column, per group of series.
 
-    def check_intmediant(self):
+        Args:
+            data (pd.DataFrame): Long-format frame with id, timestamp, target and
+                the ``columns``.
+            columns (list): Candidate causes of the target.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+            group_col (str, optional): Column grouping the series. Defaults to
+                pooling every series together.
+
+        Returns:
+            pd.DataFrame: One F-test per group, column and lag order, see
+                ``FeatureSelector``.
         """
-        Check if given time series is intermediant.
+        selector = FeatureSelector(
+            group_col=group_col, id_col=id_col, time_col=time_col, target_col=target_col
+        )
+        return selector.fit(data, columns).granger
+
+    def series_profile(self, data, id_col=None, time_col="ds", target_col=None):
+        """Compute the demand profile of every series in one vectorized pass.
+
+        Args:
+            data (pd.DataFrame): Long-format frame with id, timestamp and target.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+
+        Returns:
+            pd.DataFrame: One row per series with its history length, zero
+                fraction, ADI, CV² of non-zero demand, Syntetos-Boylan demand
+                class, last sale date and dominant seasonal period.
         """
-        pass
+        id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        target_col = target_col or config.FORECASTING_CONFIG["target"]
 
-    def check_new_product(self):
-        pass
+        ids, starts, ends, values, _ = split_series(data, id_col, time_col, target_col)
+        panel, lengths = stack_series(starts, ends, values)
+        observed = ~np.isnan(panel)
+        demand = observed & (panel > 0)
+        n_obs = observed.sum(axis=1)
+        n_demand = demand.sum(axis=1)
 
-    def identify_seasonal_length(self):
-        pass
+        def _ratio(num, den):
+            return np.divide(num, den, out=np.full(len(ids), np.nan), where=den > 0)
+
+        mean_size = _ratio(np.where(demand, panel, 0.0).sum(axis=1), n_demand)
+        squared = np.where(demand, (panel - mean_size[:, None]) ** 2, 0.0)
+        cv2 = _ratio(_ratio(squared.sum(axis=1), n_demand), mean_size**2)
+        adi = _ratio(n_obs, n_demand)
+        zero_fraction = _ratio((observed & (panel == 0)).sum(axis=1), n_obs)
 
-    def pair_plot(self, data, columns):
+        demand_class = np.select(
+            [
+                n_demand == 0,
+                (adi < ADI_CUTOFF) & (cv2 < CV2_CUTOFF),
+                adi < ADI_CUTOFF,
+                cv2 < CV2_CUTOFF,
+            ],
+            ["no_demand", "smooth", "erratic", "intermittent"],
+            "lumpy",
+        )
+        sales = data.loc[data[target_col] > 0]
+        last_sale = sales.groupby(id_col, observed=True)[time_col].max()
+
+        return pd.DataFrame(
+            {
+                id_col: ids,
+                "history_length": n_obs,
+                "zero_fraction": zero_fraction,
+                "adi": adi,
+                "cv2": cv2,
+                "demand_class": demand_class,
+                "last_sale_date": pd.Series(ids).map(last_sale).to_numpy(),
+                "seasonal_period": self.identify_seasonal_length(panel, lengths),
+            }
+        )
+
+    def check_intmediant(self, profile, zero_threshold=None):
+        """
+        Check which series are intermittent.
+
+        Args:
+            profile (pd.DataFrame): Output of ``series_profile``.
+            zero_threshold (float, optional): Minimum share of zero observations.
+                Defaults to the configured ``zero_threshold``.
+
+        Returns:
+            pd.Series: Boolean flag per series.
+        """
+        if zero_threshold is None:
+            zero_threshold = config.FORECASTING_CONFIG["eda"]["zero_threshold"]
+        return profile["zero_fraction"] >= zero_threshold
+
+    def check_new_product(self, profile, min_history=None):
+        """
+        Check which series are too short to be modelled from their own history.
+
+        Args:
+            profile (pd.DataFrame): Output of ``series_profile``.
+            min_history (int, optional): Minimum number of observations. Defaults
+                to the configured ``min_history``.
+
+        Returns:
+            pd.Series: Boolean flag per series.
+        """
+        if min_history is None:
+            min_history = config.FORECASTING_CONFIG["eda"]["min_history"]
+        return profile["history_length"] < min_history
+
+    def identify_seasonal_length(
+        self, panel, lengths=None, max_period=None, threshold=None, chunk_size=2000
+    ):
+        """Find the dominant seasonal period of every series of a panel.
+
+        Every series is linearly detrended and its autocorrelation computed for
+        all lags at once through the FFT (Wiener-Khinchin). The usual estimator,
+        normalised by the number of observations, shrinks long lags instead of
+        inflating their noise. Candidate periods are ACF peaks that reach
+        ``threshold``, rise at least ``threshold`` above the lowest ACF at a
+        shorter lag and fit three cycles in the series. Harmonics of a period
+        are peaks too, so the period is the shortest candidate the strongest
+        peak is a multiple of, or 1 without any candidate.
+
+        Args:
+            panel (np.ndarray): Series of shape (n_series, T), NaN for missing values.
+            lengths (np.ndarray, optional): Number of valid leading values per row.
+            max_period (int, optional): Longest period searched for. Defaults to
+                the configured ``max_season_length``.
+            threshold (float, optional): Minimum autocorrelation of a period.
+                Defaults to the configured ``seasonality_threshold``.
+            chunk_size (int): Series transformed at a time, bounds memory usage.
+
+        Returns:
+            np.ndarray: Seasonal period per series.
+        """
+        eda_config = config.FORECASTING_CONFIG["eda"]
+        max_period = max_period or eda_config["max_season_length"]
+        if threshold is None:
+            threshold = eda_config["seasonality_threshold"]
+
+        panel = np.atleast_2d(np.asarray(panel, dtype=np.float64))
+        n_series, length = panel.shape
+        periods = np.ones(n_series, dtype=int)
+        max_period = min(max_period, length // 3)
+        if max_period < 2:
+            return periods
+
+        lags = np.arange(max_period + 1)
+        time = np.arange(length, dtype=np.float64)
+        for start in range(0, n_series, chunk_size):
+            block = panel[start : start + chunk_size]
+            valid = ~np.isnan(block)
+            if lengths is not None:
+                block_lengths = np.asarray(lengths)[start : start + chunk_size]
+                valid &= np.arange(length) < block_lengths[:, None]
+            count = valid.sum(axis=1)
+
+            # Remove the linear trend, which would dominate every lag
+            n = np.maximum(count, 1)
+            t = np.where(valid, time, 0.0)
+            t = np.where(valid, t - (t.sum(axis=1) / n)[:, None], 0.0)
+            y = np.where(valid, block, 0.0)
+            y = np.where(valid, y - (y.sum(axis=1) / n)[:, None], 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                slope = (t * y).sum(axis=1) / (t * t).sum(axis=1)
+            detrended = y - np.nan_to_num(slope)[:, None] * t
+            acf, _ = _acf(detrended, valid, max_period, adjusted=False)
+
+            # Local peaks that are significant, prominent and fit three cycles
+            peak = np.zeros_like(acf, dtype=bool)
+            inner = acf[:, 2:-1]
+            peak[:, 2:-1] = (inner >= acf[:, 1:-2]) & (inner >= acf[:, 3:])
+            trough = np.minimum.accumulate(np.nan_to_num(acf, nan=np.inf), axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                bound = np.maximum(threshold, 1.96 / np.sqrt(count))
+                significant = acf >= bound[:, None]
+                prominent = acf - trough >= threshold
+            peak &= significant & prominent & (3 * lags[None, :] <= count[:, None])
+            scores = np.where(peak, acf, -np.inf)
+
+            # Prefer the fundamental over the strongest peak when that peak is
+            # one of its multiples, allowing one lag of error per cycle
+            strongest = scores.argmax(axis=1)[:, None]
+            cycles = np.rint(strongest / np.maximum(lags, 1))
+            harmonic = np.abs(strongest - cycles * lags) <= cycles
+            fundamental = peak & (cycles >= 1) & harmonic
+            best = np.where(
+                fundamental.any(axis=1), fundamental.argmax(axis=1), strongest[:, 0]
+            )
+            found = peak.any(axis=1)
+            periods[start : start + chunk_size] = np.where(found, lags[best], 1)
+        return periods
+
+    def pair_plot(self, data, columns, show=True):
         """Plot pair plot for the given columns.
 
         Args:
             data (pd.DataFrame): DataFrame containing the time series data.
             columns (list): List of column names to include in the pair plot.
+            show (bool): Show the figure. Pass False in batch jobs.
+
+        Returns:
+            matplotlib.figure.Figure: The figure.
         """
-        sns.pairplot(data[columns])
-        plt.show()
+        return _finish(sns.pairplot(data[columns]).figure, show)
 
     def identify_column_types(self, df):
         """Identify column types in the DataFrame.
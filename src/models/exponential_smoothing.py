@@ -1,100 +1,328 @@
 from statsmodels.tsa.api import ExponentialSmoothing, SimpleExpSmoothing, Holt
-from hyperopt import hp, fmin, tpe, Trials, STATUS_OK
+import optuna
 import pandas as pd
 import numpy as np
 import warnings
-import config
+
+from src import config
+from src.helper.utils import get_season_length
 
 warnings.filterwarnings("ignore")
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+MODEL_TYPES = ("simple_exp", "holt", "exp_smoothing")
+
+
+def forecast_state(level, trend, season, horizon):
+    """Forecast additive Holt-Winters models from their final states.
+
+    Args:
+        level (np.ndarray): Final level of every series.
+        trend (np.ndarray): Final trend of every series, 0 without a trend.
+        season (np.ndarray): Seasonal components of the next ``season_length``
+            periods of every series, shape (n_series, season_length), 0 without
+            seasonality.
+        horizon (int): Number of periods to forecast.
+
+    Returns:
+        np.ndarray: Forecasts of shape (n_series, horizon).
+    """
+    steps = np.arange(1, horizon + 1)
+    season = np.asarray(season)
+    return (
+        np.asarray(level)[:, None]
+        + np.asarray(trend)[:, None] * steps
+        + season[:, (steps - 1) % season.shape[1]]
+    )
+
+
+def update_state(state, y_new, lengths=None):
+    """Roll additive Holt-Winters states forward over new observations.
+
+    The smoothing parameters are kept fixed, so advancing the state costs one
+    vectorized step per new period instead of a refit. A missing observation
+    advances the state along its own forecast.
+
+    Args:
+        state (dict): Columnar states as stacked from ``state``: "model_type",
+            the smoothing parameters, "level", "trend" and "season" with the
+            seasonal components of the next ``season_length`` periods.
+        y_new (np.ndarray): New observations of shape (n_series, k).
+        lengths (np.ndarray, optional): Number of leading periods of ``y_new``
+            each series advances over, the rest are padding. Defaults to all k.
+
+    Returns:
+        dict: The advanced states.
+    """
+    model_type = np.asarray(state["model_type"])
+    has_trend = model_type >= MODEL_TYPES.index("holt")
+    has_season = model_type == MODEL_TYPES.index("exp_smoothing")
+    alpha = np.asarray(state["smoothing_level"], dtype=np.float64)
+    beta = np.where(has_trend, state["smoothing_trend"], 0.0)
+    gamma = np.where(has_season, state["smoothing_seasonal"], 0.0)
+    level = np.asarray(state["level"], dtype=np.float64)
+    trend = np.asarray(state["trend"], dtype=np.float64)
+    season = np.asarray(state["season"], dtype=np.float64)
+
+    y_new = np.atleast_2d(np.asarray(y_new, dtype=np.float64))
+    if lengths is None:
+        lengths = np.full(len(y_new), y_new.shape[1])
+    for t in range(y_new.shape[1]):
+        y = y_new[:, t]
+        active = t < lengths
+        observed = ~np.isnan(y)
+        y = np.where(observed, y, level + trend + season[:, 0])
+        new_level = alpha * (y - season[:, 0]) + (1 - alpha) * (level + trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        new_season = gamma * (y - level - trend) + (1 - gamma) * season[:, 0]
+        new_trend = np.where(has_trend, new_trend, 0.0)
+        new_season = np.column_stack(
+            [season[:, 1:], np.where(has_season, new_season, 0.0)]
+        )
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+        season = np.where(active[:, None], new_season, season)
+    return {**state, "level": level, "trend": trend, "season": season}
+
+
+def params_from_state(state):
+    """Tuning parameters of every series of stacked states, e.g. for warm starts.
+
+    Args:
+        state (dict): Columnar states as stacked from ``state``.
+
+    Returns:
+        list: One ``train`` parameter dict per series.
+    """
+    model_types = np.asarray(state["model_type"])
+    params = []
+    for i, code in enumerate(model_types):
+        model_type = MODEL_TYPES[int(code)]
+        names = ["smoothing_level"]
+        if model_type != "simple_exp":
+            names.append("smoothing_trend")
+        if model_type == "exp_smoothing":
+            names.append("smoothing_seasonal")
+        params.append(
+            {
+                "model_type": model_type,
+                **{name: float(state[name][i]) for name in names},
+            }
+        )
+    return params
+
+
+class _StaleStopping:
+    """Stop a study once ``patience`` trials in a row failed to improve on the best."""
+
+    def __init__(self, patience):
+        self.patience = patience
+
+    def __call__(self, study, trial):
+        try:
+            best_number = study.best_trial.number
+        except ValueError:
+            return
+        if trial.number - best_number >= self.patience:
+            study.stop()
 
 
 class ExponentialSmoothingModels:
-    def __init__(self):
+    def __init__(self, season_length=None, n_trials=None, n_jobs=None, patience=None):
+        """
+        Args:
+            season_length (int, optional): Seasonal period. Defaults to the period of
+                the configured interval.
+            n_trials (int, optional): Maximum number of trials. Defaults to num_trails.
+            n_jobs (int, optional): Trials evaluated in parallel.
+            patience (int, optional): Trials without improvement before stopping.
+        """
+        tuning = config.FORECASTING_CONFIG["tuning"]
+        self.season_length = season_length or get_season_length(
+            config.FORECASTING_CONFIG["interval"]
+        )
+        self.n_trials = n_trials or config.FORECASTING_CONFIG["num_trails"]
+        self.n_jobs = n_jobs or tuning["n_jobs"]
+        self.patience = patience or tuning["patience"]
+        self.n_folds = tuning["n_folds"]
         self.model = None
+        self.state_ = None
         self.best_params = None
         self.best_model_type = None
+        self.study = None
+
+    def _fit(self, y, params):
+        """Fit the model described by a set of trial parameters on ``y``."""
+        model_type = params["model_type"]
+        if model_type == "simple_exp":
+            return SimpleExpSmoothing(
+                y, initialization_method="legacy-heuristic"
+            ).fit(smoothing_level=params["smoothing_level"], optimized=False)
+        if model_type == "holt":
+            return Holt(y, initialization_method="legacy-heuristic").fit(
+                smoothing_level=params["smoothing_level"],
+                smoothing_trend=params["smoothing_trend"],
+                optimized=False,
+            )
+        return ExponentialSmoothing(
+            y,
+            trend="add",
+            seasonal="add",
+            seasonal_periods=self.season_length,
+            initialization_method="legacy-heuristic",
+        ).fit(
+            smoothing_level=params["smoothing_level"],
+            smoothing_trend=params["smoothing_trend"],
+            smoothing_seasonal=params["smoothing_seasonal"],
+            optimized=False,
+        )
+
+    def _suggest(self, trial, n_obs):
+        model_types = ["simple_exp", "holt"]
+        if n_obs >= 2 * self.season_length:
+            model_types.append("exp_smoothing")
+        params = {"model_type": trial.suggest_categorical("model_type", model_types)}
+        params["smoothing_level"] = trial.suggest_float("smoothing_level", 0.01, 1.0)
+        if params["model_type"] != "simple_exp":
+            params["smoothing_trend"] = trial.suggest_float(
+                "smoothing_trend", 0.01, 1.0
+            )
+        if params["model_type"] == "exp_smoothing":
+            params["smoothing_seasonal"] = trial.suggest_float(
+                "smoothing_seasonal", 0.01, 1.0
+            )
+        return params
 
-    def train(self, train, test, metric_fn=None):
+    def train(self, train, test=None, metric_fn=None, warm_start=None):
         """
-        Train and optimize Simple Exponential Smoothing, Holt's Linear Trend, and Exponential Smoothing models.
+        Tune and fit Simple Exponential Smoothing, Holt's Linear Trend, and Exponential Smoothing models.
+
+        Trials are scored on rolling-origin holdouts at the end of the series and
+        report one intermediate value per origin, so unpromising trials are pruned
+        after the first origins. The search stops early once ``patience`` trials
+        brought no improvement, and the best configuration is refitted on the full
+        series and kept in ``model``.
 
         Parameters:
         train (pd.Series): The time series data for training.
-        test (pd.Series): The time series data for testing.
+        test (pd.Series): The time series data for testing, appended to the
+            training data and used as the horizon of each holdout.
         metric_fn (function): The metric function for evaluation.
+        warm_start (dict): Best parameters from a previous run, evaluated first.
         """
+        y = pd.Series(train, dtype=np.float64).reset_index(drop=True)
+        horizon = self.season_length
+        if test is not None and len(test):
+            horizon = len(test)
+            y = pd.concat([y, pd.Series(test, dtype=np.float64)], ignore_index=True)
 
-        def objective(params):
-            model_type = params["model_type"]
-            model_class = self.models[model_type]
-            model_params = params["model_params"]
-
-            if model_type == "exp_smoothing":
-                model = model_class(
-                    train, seasonal="add", seasonal_periods=12, **model_params
-                ).fit()
-            else:
-                model = model_class(train, **model_params).fit()
-
-            predictions = model.fittedvalues
-            metric = (
-                metric_fn(train, predictions)
-                if metric_fn
-                else np.mean((train - predictions) ** 2)
-            )
-            return {
-                "loss": metric,
-                "status": STATUS_OK,
-                "params": model_params,
-                "model_type": model_type,
-            }
+        max_folds = (len(y) - 2 * self.season_length) // horizon
+        n_folds = max(min(self.n_folds, max_folds), 0)
+        origins = [len(y) - horizon * (fold + 1) for fold in range(n_folds)][::-1]
 
-        space = hp.choice(
-            "model",
-            [
-                {
-                    "model_type": "simple_exp",
-                    "model_params": {
-                        "smoothing_level": hp.uniform(
-                            "simple_exp_smoothing_level", 0.1, 1.0
-                        )
-                    },
-                },
-                {
-                    "model_type": "holt",
-                    "model_params": {
-                        "smoothing_level": hp.uniform("holt_smoothing_level", 0.1, 1.0),
-                        "smoothing_slope": hp.uniform("holt_smoothing_slope", 0.1, 1.0),
-                    },
-                },
-                {
-                    "model_type": "exp_smoothing",
-                    "model_params": {
-                        "smoothing_level": hp.uniform("exp_smoothing_level", 0.1, 1.0),
-                        "smoothing_slope": hp.uniform("exp_smoothing_slope", 0.1, 1.0),
-                        "smoothing_seasonal": hp.uniform(
-                            "exp_smoothing_seasonal", 0.1, 1.0
-                        ),
-                    },
-                },
-            ],
-        )
+        def objective(trial):
+            params = self._suggest(trial, origins[0] if origins else len(y))
+            losses = []
+            for step, origin in enumerate(origins):
+                actual = y.iloc[origin : origin + horizon].to_numpy()
+                fitted = self._fit(y.iloc[:origin], params)
+                predictions = np.asarray(fitted.forecast(horizon))
+                losses.append(
+                    metric_fn(actual, predictions)
+                    if metric_fn
+                    else np.mean((actual - predictions) ** 2)
+                )
+                trial.report(float(np.mean(losses)), step)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+            if not losses:
+                fitted = self._fit(y, params)
+                return float(np.mean((y - fitted.fittedvalues) ** 2))
+            return float(np.mean(losses))
 
-        trials = Trials()
-        best = fmin(
-            fn=objective,
-            space=space,
-            algo=tpe.suggest,
-            max_evals=config.NUM_TRAILS,
-            trials=trials,
+        self.study = optuna.create_study(
+            direction="minimize",
+            sampler=optuna.samplers.TPESampler(seed=config.SEED),
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=5),
+        )
+        if warm_start:
+            self.study.enqueue_trial(warm_start, skip_if_exists=True)
+        self.study.optimize(
+            objective,
+            n_trials=self.n_trials,
+            n_jobs=self.n_jobs,
+            callbacks=[_StaleStopping(self.patience)],
+            catch=(ValueError, np.linalg.LinAlgError),
         )
 
-        best_trial = min(trials.results, key=lambda x: x["loss"])
-        self.best_params = best_trial["params"]
-        self.best_model_type = best_trial["model_type"]
+        self.best_params = self.study.best_params
+        self.best_model_type = self.best_params["model_type"]
+        self.model = self._fit(y, self.best_params)
+        self.state_ = self._final_state()
+        return self
+
+    def update(self, new_obs):
+        """Advance the smoothing state over newly arrived observations.
+
+        The tuned parameters are kept; re-estimating them needs ``train``.
+
+        Parameters:
+        new_obs (array-like): Observations following the training data.
+        """
+        if self.model is None:
+            raise ValueError("Model must be trained before updating. Call train().")
+        state = {
+            name: np.asarray(value)[None] for name, value in self.state_.items()
+        }
+        state = update_state(state, np.asarray(new_obs, dtype=np.float64)[None, :])
+        self.state_ = {name: value[0] for name, value in state.items()}
+        return self
 
     def forecast(self, steps):
-        return self.best_model.forecast(steps)
+        if self.model is None:
+            raise ValueError("Model must be trained before forecasting. Call train().")
+        state = self.state_
+        return forecast_state(
+            [state["level"]], [state["trend"]], [state["season"]], steps
+        )[0]
+
+    def state(self):
+        """Final smoothing state and parameters of the fitted model.
+
+        The state is all ``forecast_state`` and ``update_state`` need, so it can
+        be stored in columnar arrays instead of pickling the statsmodels results.
+
+        Returns:
+            dict: Model type code, smoothing parameters, residual variance, final
+                level and trend, and the seasonal components of the next
+                ``season_length`` periods.
+        """
+        if self.model is None:
+            raise ValueError("Model must be trained first. Call train().")
+        return dict(self.state_)
+
+    def _final_state(self):
+        params = self.model.params
+        level = float(np.asarray(self.model.level)[-1])
+        trend = 0.0
+        if self.best_model_type != "simple_exp":
+            trend = float(np.asarray(self.model.trend)[-1])
+        season = np.zeros(self.season_length)
+        if self.best_model_type == "exp_smoothing":
+            season = np.asarray(self.model.season)[-self.season_length :]
+        smoothing = {
+            name: np.nan if params.get(name) is None else float(params[name])
+            for name in ("smoothing_level", "smoothing_trend", "smoothing_seasonal")
+        }
+        return {
+            "model_type": MODEL_TYPES.index(self.best_model_type),
+            **smoothing,
+            # One-step residual variance, for the forecast intervals
+            "sigma2": float(np.nanmean(np.asarray(self.model.resid) ** 2)),
+            "level": level,
+            "trend": trend,
+            "season": season,
+        }
 
 
 if __name__ == "__main__":
@@ -1,18 +1,262 @@
+import numpy as np
 import pandas as pd
 
+from src import config
+
+DATE_FEATURES = {
+    "dayofweek": lambda ds: ds.dayofweek,
+    "day": lambda ds: ds.day,
+    "dayofyear": lambda ds: ds.dayofyear,
+    "month": lambda ds: ds.month,
+    "quarter": lambda ds: ds.quarter,
+    "year": lambda ds: ds.year,
+    "weekofyear": lambda ds: ds.isocalendar().week.to_numpy(),
+}
+
+
+def _window_sums(values, positions, window):
+    """Sum of the ``window`` values preceding every row, within each series.
+
+    Returns the sum, the sum of squares and the number of non-missing values of
+    ``values[i - window:i]``, or NaN where the row has fewer than ``window``
+    predecessors in its series.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = np.concatenate([[0.0], np.cumsum(filled)])
+    squares = np.concatenate([[0.0], np.cumsum(filled**2)])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+
+    rows = np.arange(len(values))
+    start = np.maximum(rows - window, 0)
+    enough = positions >= window
+    window_sum = np.where(enough, sums[rows] - sums[start], np.nan)
+    window_squares = np.where(enough, squares[rows] - squares[start], np.nan)
+    window_counts = np.where(enough, counts[rows] - counts[start], 0)
+    return window_sum, window_squares, window_counts
+
 
 class FeatureEngineering:
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        lags=None,
+        rolling_windows=None,
+        rolling_functions=None,
+        date_features=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """
+        Args:
+            lags (list, optional): Lags of the target. Defaults to the configured lags.
+            rolling_windows (list, optional): Rolling window sizes.
+            rolling_functions (list, optional): Rolling statistics, "mean" and/or "std".
+            date_features (list, optional): Calendar features from ``DATE_FEATURES``.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        fe_config = config.FORECASTING_CONFIG["feature_engineering"]
+        self.lags = list(fe_config["lags"] if lags is None else lags)
+        self.rolling_windows = list(
+            fe_config["rolling_windows"] if rolling_windows is None else rolling_windows
+        )
+        self.rolling_functions = list(
+            fe_config["rolling_functions"]
+            if rolling_functions is None
+            else rolling_functions
+        )
+        self.date_features = list(
+            fe_config["date_features"] if date_features is None else date_features
+        )
+        unknown = set(self.rolling_functions) - {"mean", "std"}
+        unknown |= set(self.date_features) - set(DATE_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features: {sorted(unknown)}")
+
+        self.id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or config.FORECASTING_CONFIG["target"]
+        self.state = None
+
+    @property
+    def feature_names(self):
+        """Names of the generated feature columns, in output order."""
+        names = [f"{self.target_col}_lag_{lag}" for lag in self.lags]
+        names += [
+            f"{self.target_col}_rolling_{function}_{window}"
+            for window in self.rolling_windows
+            for function in self.rolling_functions
+        ]
+        return names + self.date_features
+
+    @property
+    def history_length(self):
+        """Number of past observations per series needed to compute every feature."""
+        return max(self.lags + self.rolling_windows, default=0)
+
+    def transform(self, df):
+        """Compute all configured features for a long-format panel in one pass.
+
+        Lags and rolling statistics only use observations strictly before each
+        row, so the features never leak the row's own target.
+
+        Args:
+            df (pd.DataFrame): Long-format frame with id, timestamp and target.
+
+        Returns:
+            pd.DataFrame: Features indexed like ``df``.
+        """
+        order = np.lexsort(
+            (df[self.time_col].to_numpy(), df[self.id_col].to_numpy())
+        )
+        ids = df[self.id_col].to_numpy()[order]
+        values = df[self.target_col].to_numpy(dtype=np.float64)[order]
+        ds = pd.DatetimeIndex(df[self.time_col].to_numpy()[order])
+
+        new_series = np.ones(len(ids), dtype=bool)
+        new_series[1:] = ids[1:] != ids[:-1]
+        starts = np.flatnonzero(new_series)
+        lengths = np.diff(np.append(starts, len(ids)))
+        positions = np.arange(len(ids)) - np.repeat(starts, lengths)
+
+        features = {}
+        rows = np.arange(len(values))
+        for lag in self.lags:
+            lagged = values[np.maximum(rows - lag, 0)]
+            features[f"{self.target_col}_lag_{lag}"] = np.where(
+                positions >= lag, lagged, np.nan
+            )
+
+        # Center each series before the cumulative sums to keep the rolling
+        # variance numerically stable on long panels.
+        totals = np.add.reduceat(np.nan_to_num(values), starts) if len(starts) else []
+        offset = np.repeat(np.asarray(totals) / np.maximum(lengths, 1), lengths)
+        centered = values - offset
+        for window in self.rolling_windows:
+            window_sum, window_squares, counts = _window_sums(
+                centered, positions, window
+            )
+            complete = counts == window
+            if "mean" in self.rolling_functions:
+                features[f"{self.target_col}_rolling_mean_{window}"] = np.where(
+                    complete, window_sum / window + offset, np.nan
+                )
+            if "std" in self.rolling_functions:
+                variance = (window_squares - window_sum**2 / window) / max(
+                    window - 1, 1
+                )
+                features[f"{self.target_col}_rolling_std_{window}"] = np.where(
+                    complete, np.sqrt(np.maximum(variance, 0.0)), np.nan
+                )
+
+        for name in self.date_features:
+            features[name] = np.asarray(DATE_FEATURES[name](ds), dtype=np.int32)
+
+        result = pd.DataFrame(features)[self.feature_names]
+        result = result.iloc[np.argsort(order)]
+        result.index = df.index
+        return result
+
+    def step_features(self, history, ds, out=None):
+        """Compute the features of the next step of every series from a buffer.
+
+        Used for recursive forecasting, where the features of all series are
+        built for one step at a time. Definitions match ``transform``: lags and
+        rolling statistics use the preceding values only, and a rolling window
+        with a missing value is NaN.
+
+        Args:
+            history (np.ndarray): Panel of shape (n_series, history_length) with
+                the latest observations of every series, most recent last and
+                NaN-padded on the left.
+            ds (pd.DatetimeIndex): Timestamp of the next step of every series.
+            out (np.ndarray, optional): Array of shape (n_series, n_features)
+                the features are written into.
+
+        Returns:
+            np.ndarray: Features in ``feature_names`` order.
+        """
+        if out is None:
+            out = np.empty((len(history), len(self.feature_names)))
+        column = 0
+        for lag in self.lags:
+            out[:, column] = history[:, -lag]
+            column += 1
+        for window in self.rolling_windows:
+            values = history[:, -window:]
+            if "mean" in self.rolling_functions:
+                out[:, column] = values.mean(axis=1)
+                column += 1
+            if "std" in self.rolling_functions:
+                out[:, column] = values.std(axis=1, ddof=min(window - 1, 1))
+                column += 1
+        for name in self.date_features:
+            out[:, column] = DATE_FEATURES[name](ds)
+            column += 1
+        return out
+
+    def fit_transform(self, df):
+        """Compute the features of ``df`` and keep the rolling state for ``update``.
+
+        Args:
+            df (pd.DataFrame): Long-format frame with id, timestamp and target.
+
+        Returns:
+            pd.DataFrame: Features indexed like ``df``.
+        """
+        features = self.transform(df)
+        self.state = self._tail(df)
+        return features
+
+    def update(self, new_df):
+        """Compute features for newly arrived rows only.
+
+        The last ``history_length`` observations of every series are kept as
+        rolling state, so only the new rows are computed instead of the full
+        history. Series not seen before start from an empty state.
+
+        Args:
+            new_df (pd.DataFrame): New rows in the same layout as the fitted frame.
+
+        Returns:
+            pd.DataFrame: Features indexed like ``new_df``.
+        """
+        if self.state is None:
+            raise ValueError("No state available. Call fit_transform() first.")
+
+        columns = [self.id_col, self.time_col, self.target_col]
+        touched = self.state[self.id_col].isin(new_df[self.id_col].unique())
+        history = self.state[touched]
+        combined = pd.concat([history, new_df[columns]], ignore_index=True)
+
+        features = self.transform(combined).iloc[len(history) :]
+        features.index = new_df.index
+        self.state = self._tail(pd.concat([self.state[~touched], combined]))
+        return features
+
+    def _tail(self, df):
+        columns = [self.id_col, self.time_col, self.target_col]
+        df = df[columns].sort_values([self.id_col, self.time_col], kind="stable")
+        grouped = df.groupby(self.id_col, sort=False, observed=True)
+        return grouped.tail(self.history_length)
 
     def make_lags(self, ts, lags, lead_time=1):
-        return pd.concat(
-            {f"y_lag_{i}": ts.shift(i) for i in range(lead_time, lags + lead_time)},
-            axis=1,
+        shifts = np.arange(lead_time, lags + lead_time)
+        values = ts.to_numpy(dtype=np.float64)
+        padded = np.concatenate([np.full(shifts.max(initial=0), np.nan), values])
+        idx = np.arange(len(values))[:, None] - shifts[None, :] + shifts.max(initial=0)
+        return pd.DataFrame(
+            padded[idx], index=ts.index, columns=[f"y_lag_{i}" for i in shifts]
         )
 
     def make_multistep_target(self, ts, steps):
-        return pd.concat(
-            {f"y_step_{i + 1}": ts.shift(-i) for i in range(steps)}, axis=1
+        shifts = np.arange(steps)
+        values = ts.to_numpy(dtype=np.float64)
+        padded = np.concatenate([values, np.full(steps, np.nan)])
+        idx = np.arange(len(values))[:, None] + shifts[None, :]
+        return pd.DataFrame(
+            padded[idx], index=ts.index, columns=[f"y_step_{i + 1}" for i in shifts]
         )
@@ -0,0 +1,431 @@
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src import config
+from src.helper.utils import split_series
+
+logger = logging.getLogger(__name__)
+
+ALL = "all"
+
+
+def _standardize(values, starts, lengths):
+    """Standardize the columns of ``values`` within every series.
+
+    Args:
+        values (np.ndarray): Array of shape (n_rows, n_columns), rows sorted by
+            series, NaN for missing values.
+        starts (np.ndarray): First row of every series.
+        lengths (np.ndarray): Rows of every series.
+
+    Returns:
+        tuple: (standardized values, per-series means, per-series standard
+            deviations). Columns constant within a series are NaN there.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    sums = np.add.reduceat(filled, starts, axis=0)
+    squares = np.add.reduceat(filled**2, starts, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean**2, 0.0))
+    std = np.where(std > 1e-12 * np.maximum(np.abs(mean), 1.0), std, np.nan)
+    standardized = (values - np.repeat(mean, lengths, axis=0)) / np.repeat(
+        std, lengths, axis=0
+    )
+    return standardized, mean, std
+
+
+def _solve_rss(gram, xy, yy):
+    """Residual sum of squares of stacked least-squares problems.
+
+    Args:
+        gram (np.ndarray): Gram matrices of shape (..., k, k).
+        xy (np.ndarray): Cross-products of shape (..., k).
+        yy (np.ndarray): Sums of squared targets of shape (...).
+
+    Returns:
+        np.ndarray: RSS of shape (...), NaN where the system is singular.
+    """
+    k = gram.shape[-1]
+    ridge = 1e-10 * np.trace(gram, axis1=-2, axis2=-1)[..., None, None] * np.eye(k)
+    try:
+        beta = np.linalg.solve(gram + ridge, xy[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        beta = (np.linalg.pinv(gram) @ xy[..., None])[..., 0]
+    return np.maximum(yy - (beta * xy).sum(axis=-1), 0.0)
+
+
+class FeatureSelector:
+    """Screen candidate regressors by lagged correlation and Granger causality.
+
+    Target and features are standardized within every series, which removes
+    level differences so series can be pooled by group. For every group,
+    feature and lag the selector computes, in one pass over the panel:
+
+    - the pooled cross-correlation of the target with the feature ``lag``
+      periods earlier, for lags 0..max_lag;
+    - a Granger F-test of whether ``order`` lags of the feature improve an
+      autoregression of the target on its own ``order`` lags.
+
+    All statistics are sums of cross-products, accumulated with a few large
+    matrix products per chunk of features; the regressions of every order are
+    then solved for all groups and features at once on the small Gram
+    matrices. Features are ranked by the share of groups in which they
+    Granger-cause the target, then by their strongest correlation, and a
+    feature correlated above ``correlation_threshold`` with a better ranked
+    one is pruned as redundant.
+
+    Lags are positional, so series are expected on a regular time grid.
+    """
+
+    def __init__(
+        self,
+        max_lag=None,
+        granger_lags=None,
+        alpha=None,
+        correlation_threshold=None,
+        group_col=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+        max_chunk_elements=50_000_000,
+    ):
+        """
+        Args:
+            max_lag (int, optional): Longest lag of the cross-correlations.
+            granger_lags (list, optional): Orders of the Granger tests.
+            alpha (float, optional): Significance level of the Granger tests,
+                Bonferroni-corrected over the orders.
+            correlation_threshold (float, optional): Absolute correlation
+                above which a feature is redundant with a better ranked one.
+            group_col (str, optional): Column grouping the series, constant
+                within a series. Defaults to pooling every series together.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+            max_chunk_elements (int): Bounds the lagged feature values held
+                in memory at once.
+        """
+        run_config = config.FORECASTING_CONFIG
+        eda_config = run_config["eda"]
+        self.max_lag = eda_config["max_cross_lag"] if max_lag is None else max_lag
+        self.granger_lags = sorted(granger_lags or eda_config["granger_lags"])
+        self.alpha = alpha or eda_config["granger_alpha"]
+        self.correlation_threshold = (
+            correlation_threshold or eda_config["correlation_threshold"]
+        )
+        self.group_col = group_col
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.max_chunk_elements = max_chunk_elements
+        self.correlations = None
+        self.granger = None
+        self.ranking = None
+        self.selected = None
+
+    def _rows(self, df):
+        """Sort the panel and find the rows with a full lag window."""
+        df = df.sort_values([self.id_col, self.time_col], kind="stable")
+        _, starts, ends, y, _ = split_series(
+            df, self.id_col, self.time_col, self.target_col
+        )
+        lengths = ends - starts
+        y, _, _ = _standardize(y[:, None], starts, lengths)
+        y = y[:, 0]
+        series = np.repeat(np.arange(len(starts)), lengths)
+        position = np.arange(len(y)) - starts[series]
+
+        n_lags = max(self.granger_lags)
+        longest = max(self.max_lag, n_lags)
+        rows = np.flatnonzero(position >= longest)
+        y_lags = y[rows[:, None] - np.arange(1, n_lags + 1)[None, :]]
+        keep = ~np.isnan(y[rows]) & ~np.isnan(y_lags).any(axis=1)
+        rows, y_lags = rows[keep], y_lags[keep]
+
+        if self.group_col is None:
+            groups = pd.Index([ALL])
+            codes = np.zeros(len(starts), dtype=np.int64)
+        else:
+            codes, groups = pd.factorize(df[self.group_col].to_numpy()[starts])
+            groups = pd.Index(groups)
+        order = np.argsort(codes[series[rows]], kind="stable")
+        rows, y_lags = rows[order], y_lags[order]
+        bounds = np.searchsorted(codes[series[rows]], np.arange(len(groups) + 1))
+        return df, starts, lengths, series, y, rows, y_lags, groups, bounds
+
+    def fit(self, df, features):
+        """Compute the screening statistics and select the features.
+
+        Args:
+            df (pd.DataFrame): Long-format panel with id, timestamp, target and
+                the candidate feature columns.
+            features (list): Candidate feature columns.
+
+        Returns:
+            FeatureSelector: The fitted selector, with the ``correlations``,
+                ``granger`` and ``ranking`` tables and the ``selected`` features.
+        """
+        features = list(features)
+        columns = [self.id_col, self.time_col, self.target_col]
+        if self.group_col is not None:
+            columns.append(self.group_col)
+        df, starts, lengths, series, y, rows, y_lags, groups, bounds = self._rows(
+            df[columns + features]
+        )
+        n_groups, n_features = len(groups), len(features)
+        lags = np.arange(self.max_lag + 1)
+        n_lags = max(self.granger_lags)
+        longest = max(self.max_lag, n_lags)
+
+        sums = {
+            name: np.zeros((n_groups, n_features, *shape))
+            for name, shape in {
+                "sxy": (len(lags),),
+                "sxx": (len(lags),),
+                "syy": (len(lags),),
+                "n_pairs": (len(lags),),
+                "yy": (),
+                "n_obs": (),
+                "n_series": (),
+                "Yy": (n_lags,),
+                "Xy": (n_lags,),
+                "YY": (n_lags, n_lags),
+                "YX": (n_lags, n_lags),
+                "XX": (n_lags, n_lags),
+            }.items()
+        }
+        means = np.empty((len(starts), n_features))
+        stds = np.empty((len(starts), n_features))
+
+        chunk = max(self.max_chunk_elements // max(len(rows) * (longest + 1), 1), 1)
+        shifts = np.arange(longest + 1)
+        for first in range(0, n_features, chunk):
+            block = slice(first, first + chunk)
+            values = df[features[block]].to_numpy(dtype=np.float64)
+            values, means[:, block], stds[:, block] = _standardize(
+                values, starts, lengths
+            )
+            # Lagged feature values of shape (rows, features, lag)
+            lagged = np.ascontiguousarray(
+                values[rows[:, None] - shifts[None, :]].transpose(0, 2, 1)
+            )
+            for g in range(n_groups):
+                lo, hi = bounds[g], bounds[g + 1]
+                if lo < hi:
+                    self._accumulate(
+                        sums,
+                        (g, block),
+                        lagged[lo:hi],
+                        y[rows[lo:hi]],
+                        y_lags[lo:hi],
+                        series[rows[lo:hi]],
+                    )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = sums["sxy"] / np.sqrt(sums["sxx"] * sums["syy"])
+        self.correlations = self._table(
+            groups,
+            features,
+            lags,
+            correlation=correlation,
+            n_obs=sums["n_pairs"].astype(np.int64),
+        )
+
+        f_stats, p_values = [], []
+        for order in self.granger_lags:
+            f_stat, p_value = self._granger(order, sums)
+            f_stats.append(f_stat)
+            p_values.append(p_value)
+        self.granger = self._table(
+            groups,
+            features,
+            np.array(self.granger_lags),
+            f_stat=np.stack(f_stats, axis=-1),
+            p_value=np.stack(p_values, axis=-1),
+            n_obs=np.repeat(
+                sums["n_obs"][..., None].astype(np.int64), len(self.granger_lags), -1
+            ),
+        )
+
+        self.ranking = self._rank(features, correlation, sums["n_pairs"], p_values)
+        redundant = self._redundancy(df, features, starts, lengths, series, means, stds)
+        self.ranking["redundant_with"] = redundant
+        self.ranking["selected"] = self.ranking["redundant_with"].isna()
+        self.selected = self.ranking.loc[self.ranking["selected"], "feature"].tolist()
+        logger.info(
+            f"Selected {len(self.selected)} of {n_features} features over "
+            f"{n_groups} groups"
+        )
+        return self
+
+    @staticmethod
+    def _accumulate(sums, index, lagged, y, y_lags, series):
+        """Add the cross-products of one group and chunk of features to ``sums``."""
+        n_rows, n_chunk, _ = lagged.shape
+        n_lags = y_lags.shape[1]
+        n_corr = sums["sxy"].shape[-1]
+
+        observed = ~np.isnan(lagged)
+        filled = np.where(observed, lagged, 0.0)
+
+        # Cross-correlations, every lag on its own observed pairs
+        x = filled[:, :, :n_corr].reshape(n_rows, -1)
+        weights = observed[:, :, :n_corr].reshape(n_rows, -1).astype(np.float64)
+        shape = (n_chunk, n_corr)
+        sums["sxy"][index] += (y @ x).reshape(shape)
+        sums["sxx"][index] += np.einsum("nk,nk->k", x, x).reshape(shape)
+        sums["syy"][index] += (y**2 @ weights).reshape(shape)
+        sums["n_pairs"][index] += weights.sum(axis=0).reshape(shape)
+
+        # Granger regressions, on the rows where every lag of a feature is known
+        complete = observed[:, :, 1 : n_lags + 1].all(axis=2)
+        x = filled[:, :, 1 : n_lags + 1] * complete[:, :, None]
+        weights = complete.astype(np.float64)
+        sums["yy"][index] += y**2 @ weights
+        sums["n_obs"][index] += weights.sum(axis=0)
+        boundaries = np.flatnonzero(np.diff(series, prepend=-1))
+        per_series = np.add.reduceat(complete, boundaries, axis=0)
+        sums["n_series"][index] += (per_series > 0).sum(axis=0)
+        sums["Yy"][index] += weights.T @ (y_lags * y[:, None])
+        sums["Xy"][index] += (y @ x.reshape(n_rows, -1)).reshape(n_chunk, n_lags)
+        sums["YX"][index] += (y_lags.T @ x.reshape(n_rows, -1)).reshape(
+            n_lags, n_chunk, n_lags
+        ).transpose(1, 0, 2)
+        xt = x.transpose(1, 0, 2)
+        sums["XX"][index] += xt.transpose(0, 2, 1) @ xt
+
+        # The target lags are shared: take their Gram matrix once and remove
+        # the rows a feature is missing on
+        full = y_lags.T @ y_lags
+        missing = np.flatnonzero(~complete.all(axis=1))
+        outer = (y_lags[missing, :, None] * y_lags[missing, None, :]).reshape(
+            len(missing), n_lags * n_lags
+        )
+        removed = (1.0 - weights[missing]).T @ outer
+        sums["YY"][index] += full - removed.reshape(n_chunk, n_lags, n_lags)
+
+    @staticmethod
+    def _granger(order, sums):
+        """F statistics and p-values of the Granger tests of one order."""
+        yy, Yy, Xy = sums["yy"], sums["Yy"], sums["Xy"]
+        YY, YX, XX = sums["YY"], sums["YX"], sums["XX"]
+        p = slice(0, order)
+        restricted = _solve_rss(YY[..., p, p], Yy[..., p], yy)
+        gram = np.concatenate(
+            [
+                np.concatenate([YY[..., p, p], YX[..., p, p]], axis=-1),
+                np.concatenate(
+                    [YX[..., p, p].swapaxes(-1, -2), XX[..., p, p]], axis=-1
+                ),
+            ],
+            axis=-2,
+        )
+        unrestricted = _solve_rss(
+            gram, np.concatenate([Yy[..., p], Xy[..., p]], axis=-1), yy
+        )
+        # One mean per series was removed by the standardization
+        df_resid = sums["n_obs"] - 2 * order - sums["n_series"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f_stat = ((restricted - unrestricted) / order) / (unrestricted / df_resid)
+        f_stat = np.where(df_resid > 0, np.maximum(f_stat, 0.0), np.nan)
+        p_value = stats.f.sf(f_stat, order, np.maximum(df_resid, 1))
+        return f_stat, p_value
+
+    def _table(self, groups, features, lags, **columns):
+        """Long table of statistics of shape (groups, features, lags)."""
+        n_groups, n_features, n_lags = len(groups), len(features), len(lags)
+        group_name = self.group_col or "group"
+        return pd.DataFrame(
+            {
+                group_name: np.repeat(groups.to_numpy(), n_features * n_lags),
+                "feature": np.tile(np.repeat(features, n_lags), n_groups),
+                "lag": np.tile(lags, n_groups * n_features),
+                **{name: values.ravel() for name, values in columns.items()},
+            }
+        )
+
+    def _rank(self, features, correlation, n_pairs, p_values):
+        """One row per feature, best first."""
+        # Correlations pooled over the groups, weighted by their observations
+        weights = np.where(np.isnan(correlation), 0.0, n_pairs)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pooled = (np.nan_to_num(correlation) * weights).sum(axis=0) / weights.sum(
+                axis=0
+            )
+        best_lag = np.nanargmax(np.nan_to_num(np.abs(pooled), nan=-1.0), axis=1)
+        best_correlation = pooled[np.arange(len(features)), best_lag]
+
+        # Best order of every group and feature, Bonferroni-corrected
+        p_values = np.stack(p_values, axis=-1)
+        tested = ~np.isnan(p_values).all(axis=-1)
+        filled = np.where(np.isnan(p_values), np.inf, p_values)
+        min_p = np.where(tested, filled.min(axis=-1), np.nan)
+        best_order = np.array(self.granger_lags)[filled.argmin(axis=-1)]
+        significant = min_p < self.alpha / len(self.granger_lags)
+        n_tested = tested.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = significant.sum(axis=0) / n_tested
+        with warnings.catch_warnings():
+            # Features never tested have an all-NaN column
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median_p = np.nanmedian(min_p, axis=0)
+        orders = pd.DataFrame(np.where(significant, best_order, np.nan))
+
+        ranking = pd.DataFrame(
+            {
+                "feature": features,
+                "best_lag": best_lag,
+                "correlation": best_correlation,
+                "granger_share": share,
+                "granger_p_value": median_p,
+                # Order at which the feature is most often significant
+                "granger_lag": orders.mode(axis=0).reindex([0]).iloc[0].to_numpy(),
+                "n_groups": n_tested,
+            }
+        )
+        ranking["abs_correlation"] = ranking["correlation"].abs()
+        ranking = ranking.sort_values(
+            ["granger_share", "abs_correlation"],
+            ascending=False,
+            na_position="last",
+            kind="stable",
+        ).drop(columns="abs_correlation")
+        ranking.insert(0, "rank", np.arange(1, len(ranking) + 1))
+        return ranking.reset_index(drop=True)
+
+    def _redundancy(self, df, features, starts, lengths, series, means, stds):
+        """Better ranked feature each feature is too correlated with, or None."""
+        n_features = len(features)
+        products = np.zeros((n_features, n_features))
+        squares = np.zeros((n_features, n_features))
+        chunk = max(self.max_chunk_elements // max(n_features, 1), 1)
+        for first in range(0, len(df), chunk):
+            block = slice(first, first + chunk)
+            owner = series[block]
+            values = df[features].iloc[block].to_numpy(dtype=np.float64)
+            values = (values - means[owner]) / stds[owner]
+            observed = ~np.isnan(values)
+            values = np.where(observed, values, 0.0)
+            products += values.T @ values
+            # Sums of squares of every feature over the rows both are known on
+            squares += (values**2).T @ observed
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.abs(products / np.sqrt(squares * squares.T))
+
+        position = {feature: i for i, feature in enumerate(features)}
+        kept, redundant = [], {}
+        for feature in self.ranking["feature"]:
+            i = position[feature]
+            above = [k for k in kept if correlation[i, k] > self.correlation_threshold]
+            if above:
+                redundant[feature] = features[above[0]]
+            else:
+                kept.append(i)
+        return self.ranking["feature"].map(redundant).to_numpy(dtype=object)
@@ -0,0 +1,367 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+from src import config
+from src.models.model_run import model_run
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("bottom_up", "top_down", "ols", "wls_struct", "mint")
+TOTAL = "total"
+
+
+class Hierarchy:
+    """Aggregation structure of a panel of bottom-level series.
+
+    Every aggregated node is the sum of a set of bottom series, described by
+    the sparse summing matrix ``S`` of shape (n_nodes, n_bottom). Nodes are
+    ordered aggregated first, bottom last, so ``S`` stacks the aggregation
+    rows on an identity block. Neither aggregation nor reconciliation ever
+    builds a dense matrix over the bottom series.
+    """
+
+    def __init__(self, S, labels, levels, n_bottom):
+        """
+        Args:
+            S (sparse.csr_array): Summing matrix of shape (n_nodes, n_bottom).
+            labels (pd.Index): Node IDs, aggregated nodes first.
+            levels (np.ndarray): Level name of every node.
+            n_bottom (int): Number of bottom series, the last rows of ``S``.
+        """
+        self.S = S
+        self.labels = labels
+        self.levels = levels
+        self.n_bottom = n_bottom
+        self.n_aggregated = len(labels) - n_bottom
+
+    @property
+    def bottom(self):
+        """IDs of the bottom series, in the column order of ``S``."""
+        return self.labels[self.n_aggregated :]
+
+    @classmethod
+    def from_frame(cls, df, levels, id_col=None, total=True):
+        """Build the hierarchy of the series of a long-format panel.
+
+        Args:
+            df (pd.DataFrame): Panel with one column per attribute a level groups
+                by, e.g. category or store, constant within every series.
+            levels (list): Levels above the series, each a column name or a list
+                of column names grouped together, e.g.
+                ``["category", "store", ["category", "store"]]``.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            total (bool): Add a single node summing every series.
+
+        Returns:
+            Hierarchy: The hierarchy.
+        """
+        id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        levels = [
+            [level] if isinstance(level, str) else list(level) for level in levels
+        ]
+        columns = list(dict.fromkeys(c for level in levels for c in level))
+        attributes = df.groupby(id_col, observed=True, sort=True)[columns].first()
+        n_bottom = len(attributes)
+
+        rows, cols, labels, level_names = [], [], [], []
+        if total:
+            rows.append(np.zeros(n_bottom, dtype=np.int64))
+            cols.append(np.arange(n_bottom))
+            labels.append([TOTAL])
+            level_names.append([TOTAL])
+        for level in levels:
+            keys = attributes[level].astype(str).agg("/".join, axis=1)
+            codes, uniques = pd.factorize(keys, sort=True)
+            names = [
+                "/".join(f"{c}={v}" for c, v in zip(level, key.split("/")))
+                for key in uniques
+            ]
+            rows.append(codes + sum(len(label) for label in labels))
+            cols.append(np.arange(n_bottom))
+            labels.append(names)
+            level_names.append(["/".join(level)] * len(names))
+
+        n_aggregated = sum(len(label) for label in labels)
+        S_aggregated = sparse.csr_array(
+            (
+                np.ones(n_bottom * len(rows)),
+                (np.concatenate(rows), np.concatenate(cols)),
+            ),
+            shape=(n_aggregated, n_bottom),
+        )
+        S = sparse.vstack(
+            [S_aggregated, sparse.identity(n_bottom, format="csr")], format="csr"
+        )
+        labels = pd.Index(
+            [label for names in labels for label in names]
+            + attributes.index.astype(str).tolist()
+        )
+        level_names = np.array(
+            [name for names in level_names for name in names] + [id_col] * n_bottom
+        )
+        logger.info(f"Hierarchy of {n_aggregated} aggregated and {n_bottom} series")
+        return cls(S, labels, level_names, n_bottom)
+
+    def _bottom_matrix(self, df, id_col, time_col, value_cols):
+        """Sparse (n_bottom, n_times) matrices of ``value_cols`` and of presence."""
+        positions = self.bottom.get_indexer(df[id_col].astype(str))
+        if (positions < 0).any():
+            unknown = df.loc[positions < 0, id_col].unique()
+            raise KeyError(f"Series not in the hierarchy: {unknown[:10]}")
+        times, dates = pd.factorize(df[time_col], sort=True)
+        shape = (self.n_bottom, len(dates))
+        matrices = {
+            col: sparse.csr_array(
+                (np.nan_to_num(df[col].to_numpy(dtype=np.float64)), (positions, times)),
+                shape=shape,
+            )
+            for col in value_cols
+        }
+        present = sparse.csr_array(
+            (np.ones(len(df)), (positions, times)), shape=shape
+        )
+        return matrices, present, dates
+
+    def aggregate(self, df, id_col=None, time_col="ds", target_col=None):
+        """Sum the bottom series into every node of the hierarchy in one pass.
+
+        Args:
+            df (pd.DataFrame): Long-format panel of the bottom series.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+
+        Returns:
+            pd.DataFrame: Long-format panel of every node, with the node ID in
+                ``id_col`` and a "level" column. Missing values count as zero
+                in the sums.
+        """
+        run_config = config.FORECASTING_CONFIG
+        id_col = id_col or run_config["partition_dim"]
+        target_col = target_col or run_config["target"]
+
+        matrices, present, dates = self._bottom_matrix(
+            df, id_col, time_col, [target_col]
+        )
+        S_aggregated = self.S[: self.n_aggregated]
+        sums = (S_aggregated @ matrices[target_col]).tocsr()
+        # Sums drop exact zeros, so rows come from the presence counts
+        counts = (S_aggregated @ present).tocoo()
+        order = np.lexsort((counts.col, counts.row))
+        rows, cols = counts.row[order], counts.col[order]
+
+        aggregated = pd.DataFrame(
+            {
+                id_col: self.labels[rows],
+                time_col: dates[cols],
+                target_col: np.asarray(sums[rows, cols]).ravel(),
+                "level": self.levels[rows],
+            }
+        )
+        bottom = df[[id_col, time_col, target_col]].assign(
+            **{id_col: df[id_col].astype(str), "level": id_col}
+        )
+        return pd.concat([aggregated, bottom], ignore_index=True)
+
+    def proportions(self, history, id_col=None, target_col=None):
+        """Share of every bottom series in the total over the history.
+
+        Args:
+            history (pd.DataFrame): Long-format panel of the bottom series.
+
+        Returns:
+            np.ndarray: Proportion of every bottom series, summing to one.
+        """
+        run_config = config.FORECASTING_CONFIG
+        id_col = id_col or run_config["partition_dim"]
+        target_col = target_col or run_config["target"]
+        totals = history.groupby(history[id_col].astype(str))[target_col].sum()
+        totals = totals.reindex(self.bottom).fillna(0).to_numpy(dtype=np.float64)
+        if totals.sum() <= 0:
+            return np.full(self.n_bottom, 1 / self.n_bottom)
+        return totals / totals.sum()
+
+    def naive_variance(self, history, id_col=None, time_col="ds", target_col=None):
+        """Variance of the one-step naive errors of every node.
+
+        Stands in for the in-sample residual variance of the base forecasts,
+        which the models do not expose.
+
+        Args:
+            history (pd.DataFrame): Long-format panel of the bottom series.
+
+        Returns:
+            np.ndarray: Variance of every node, in the order of ``labels``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        id_col = id_col or run_config["partition_dim"]
+        target_col = target_col or run_config["target"]
+        nodes = self.aggregate(history, id_col, time_col, target_col)
+        nodes = nodes.sort_values([id_col, time_col], kind="stable")
+        errors = nodes.groupby(id_col, sort=False)[target_col].diff()
+        variance = errors.groupby(nodes[id_col]).var().reindex(self.labels)
+        return variance.to_numpy(dtype=np.float64)
+
+    def reconcile(
+        self,
+        forecasts,
+        method=None,
+        history=None,
+        variance=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """Make the forecasts of every node add up across the hierarchy.
+
+        "bottom_up" sums the bottom forecasts, "top_down" splits the total
+        forecast by the historical proportions of the bottom series, and
+        "ols", "wls_struct" and "mint" are minimum trace reconciliations with
+        a diagonal error covariance of ones, of the number of series below a
+        node, and of the error variance of every node. The trace minimization
+        is solved in the form
+
+            y_tilde = y_hat - W C' (C W C')^-1 C y_hat,  C = [I, -S_aggregated]
+
+        whose system has one row per aggregated node, so its size does not
+        depend on the number of bottom series and ``S`` stays sparse.
+
+        Args:
+            forecasts (pd.DataFrame): Base forecasts of every node, with the node
+                ID in ``id_col``, ``time_col`` and one column per model.
+            method (str, optional): One of ``METHODS``. Defaults to the
+                configuration.
+            history (pd.DataFrame, optional): Long-format panel of the bottom
+                series, needed by "top_down" and by "mint" without ``variance``.
+            variance (array-like, optional): Error variance of every node, in the
+                order of ``labels``, for "mint".
+            id_col (str, optional): Node column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column of ``history``. Defaults
+                to ``target``.
+
+        Returns:
+            pd.DataFrame: Coherent forecasts of every node, same layout.
+        """
+        method = method or config.FORECASTING_CONFIG["hierarchy"]["method"]
+        id_col = id_col or config.FORECASTING_CONFIG["partition_dim"]
+        if method not in METHODS:
+            raise ValueError(f"Unknown reconciliation method: {method}")
+
+        keys = (id_col, time_col, "level")
+        model_cols = [c for c in forecasts.columns if c not in keys]
+        positions = self.labels.get_indexer(forecasts[id_col].astype(str))
+        if (positions < 0).any():
+            unknown = forecasts.loc[positions < 0, id_col].unique()
+            raise KeyError(f"Nodes not in the hierarchy: {unknown[:10]}")
+        times, dates = pd.factorize(forecasts[time_col], sort=True)
+        n_times = len(dates)
+        Y = np.full((len(self.labels), n_times * len(model_cols)), np.nan)
+        for k, col in enumerate(model_cols):
+            Y[positions, k * n_times + times] = forecasts[col].to_numpy(np.float64)
+
+        if method == "bottom_up":
+            reconciled = self.S @ Y[self.n_aggregated :]
+        elif method == "top_down":
+            if TOTAL not in self.labels:
+                raise ValueError("Top-down reconciliation needs a total node")
+            if history is None:
+                raise ValueError("Top-down reconciliation needs the history")
+            shares = self.proportions(history, id_col, target_col)
+            total = Y[self.labels.get_loc(TOTAL)]
+            reconciled = self.S @ (shares[:, None] * total[None, :])
+        else:
+            weights = self._weights(
+                method, history, variance, id_col, time_col, target_col
+            )
+            reconciled = self._min_trace(Y, weights)
+
+        node, column = np.divmod(np.arange(reconciled.size), reconciled.shape[1])
+        model, time = np.divmod(column, n_times)
+        frame = pd.DataFrame(
+            {
+                id_col: self.labels[node],
+                time_col: dates[time],
+                "model": np.asarray(model_cols)[model],
+                "value": reconciled.ravel(),
+            }
+        )
+        frame = frame.pivot(index=[id_col, time_col], columns="model", values="value")
+        frame.columns.name = None
+        return frame[model_cols].reset_index()
+
+    def _weights(self, method, history, variance, id_col, time_col, target_col):
+        """Diagonal of the error covariance assumed by a minimum trace method."""
+        if method == "ols":
+            return np.ones(len(self.labels))
+        structural = np.asarray(self.S.sum(axis=1), dtype=np.float64).ravel()
+        if method == "wls_struct":
+            return structural
+        if variance is None:
+            if history is None:
+                raise ValueError("MinT reconciliation needs the variance or history")
+            variance = self.naive_variance(history, id_col, time_col, target_col)
+        variance = np.asarray(variance, dtype=np.float64).copy()
+        invalid = ~(variance > 0)
+        if invalid.all():
+            return structural
+        # Nodes without a usable variance fall back to a structural scale
+        variance[invalid] = structural[invalid] * np.median(
+            variance[~invalid] / structural[~invalid]
+        )
+        return variance
+
+    def _min_trace(self, Y, weights):
+        S_aggregated = self.S[: self.n_aggregated]
+        C = sparse.hstack(
+            [sparse.identity(self.n_aggregated, format="csr"), -S_aggregated],
+            format="csr",
+        )
+        W = sparse.diags_array(weights)
+        incoherence = C @ np.nan_to_num(Y)
+        system = (C @ W @ C.T).tocsc()
+        correction = spsolve(system, incoherence)
+        correction = correction.reshape(self.n_aggregated, -1)
+        return Y - W @ (C.T @ correction)
+
+
+def forecast_hierarchy(
+    df, levels, model_name, horizon, method=None, id_col=None, n_jobs=None
+):
+    """Forecast every level of a hierarchy and reconcile the forecasts.
+
+    The nodes of all levels are forecast together in a single ``model_run``
+    over the aggregated panel.
+
+    Args:
+        df (pd.DataFrame): Long-format panel of the bottom series with the
+            attribute columns the levels group by.
+        levels (list): Levels above the series, see ``Hierarchy.from_frame``.
+        model_name (str): Model forecasting every node.
+        horizon (int): Number of periods to forecast.
+        method (str, optional): Reconciliation method. Defaults to the
+            configuration.
+        id_col (str, optional): Series column. Defaults to ``partition_dim``.
+        n_jobs (int, optional): Worker processes, -1 for all cores, 1 runs inline.
+
+    Returns:
+        tuple: (forecasts, hierarchy) with the reconciled forecasts of every node
+            and a "level" column.
+    """
+    run_config = config.FORECASTING_CONFIG
+    id_col = id_col or run_config["partition_dim"]
+    hierarchy = Hierarchy.from_frame(
+        df, levels, id_col, run_config["hierarchy"]["total"]
+    )
+    nodes = hierarchy.aggregate(df, id_col)
+    base, report = model_run(
+        nodes.drop(columns="level"), model_name, horizon, id_col=id_col, n_jobs=n_jobs
+    )
+    reconciled = hierarchy.reconcile(base, method, history=df, id_col=id_col)
+    level = pd.Series(hierarchy.levels, index=hierarchy.labels)
+    reconciled["level"] = reconciled[id_col].map(level).to_numpy()
+    return reconciled, hierarchy
@@ -0,0 +1,409 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import (
+    config_hash,
+    future_dates,
+    get_freq,
+    split_series,
+    stack_series,
+)
+from src.models.model_run import model_run
+
+logger = logging.getLogger(__name__)
+
+# Models whose stored state can be rolled forward without their history
+UPDATABLE_MODELS = (
+    "croston",
+    "croston_sba",
+    "tsb",
+    "exponential_smoothing",
+    "arima",
+)
+
+
+class RefitPolicy:
+    """Decide when an incrementally updated model needs full re-estimation.
+
+    Between refits new observations only roll the fitted state forward with the
+    model's ``update``. A refit is due after ``refit_every`` updates, or earlier
+    when the recent forecast errors of too many series drift away from their
+    usual level. Recent errors are an exponentially weighted average of the
+    absolute one-step errors; the usual level is the mean absolute error since
+    the last refit, or a scale supplied at refit time such as the in-sample
+    error.
+    """
+
+    def __init__(
+        self,
+        refit_every=None,
+        drift_threshold=None,
+        drift_share=None,
+        error_smoothing=None,
+    ):
+        """
+        Args:
+            refit_every (int, optional): Updates between scheduled refits.
+            drift_threshold (float, optional): Ratio of recent to usual error at
+                which a series counts as drifted.
+            drift_share (float, optional): Share of drifted series that triggers
+                a refit.
+            error_smoothing (float, optional): Weight of the newest error in the
+                exponentially weighted error.
+        """
+        update_config = config.FORECASTING_CONFIG["update"]
+        self.refit_every = refit_every or update_config["refit_every"]
+        self.drift_threshold = drift_threshold or update_config["drift_threshold"]
+        self.drift_share = drift_share or update_config["drift_share"]
+        self.error_smoothing = error_smoothing or update_config["error_smoothing"]
+        self.reset()
+
+    def reset(self, scale=None):
+        """Start a new period after a refit.
+
+        Args:
+            scale (array-like, optional): Usual absolute error of every series.
+                Defaults to the mean absolute error observed after the refit.
+        """
+        self.n_updates = 0
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.error = None
+        self._abs_sum = None
+        self._abs_count = None
+
+    def state(self, n_series):
+        """Tracked errors of every series, for storage with the model state.
+
+        Args:
+            n_series (int): Series tracked, used before any error is recorded.
+
+        Returns:
+            dict: Columnar arrays prefixed "refit_", to pass to ``restore``.
+        """
+        scale = np.full(n_series, np.nan) if self.scale is None else self.scale
+        if self.error is None:
+            return {
+                "refit_error": np.full(n_series, np.nan),
+                "refit_abs_sum": np.zeros(n_series),
+                "refit_abs_count": np.zeros(n_series),
+                "refit_scale": scale,
+            }
+        return {
+            "refit_error": self.error,
+            "refit_abs_sum": self._abs_sum,
+            "refit_abs_count": self._abs_count,
+            "refit_scale": scale,
+        }
+
+    def restore(self, n_updates, arrays):
+        """Continue the period of a stored state.
+
+        Args:
+            n_updates (int): Updates since the last refit.
+            arrays (dict): Output of ``state``, without the arrays when the
+                stored state was just refitted.
+        """
+        self.reset()
+        self.n_updates = n_updates
+        if "refit_error" not in arrays:
+            return
+        self.error = np.asarray(arrays["refit_error"], dtype=np.float64)
+        self._abs_sum = np.asarray(arrays["refit_abs_sum"], dtype=np.float64)
+        self._abs_count = np.asarray(arrays["refit_abs_count"], dtype=np.float64)
+        scale = np.asarray(arrays["refit_scale"], dtype=np.float64)
+        self.scale = None if np.isnan(scale).all() else scale
+
+    def record(self, actuals, forecasts):
+        """Track the errors of the forecasts made for newly arrived observations.
+
+        Args:
+            actuals (array-like): New values, shape (n_series, k), NaN where a
+                series has no observation.
+            forecasts (array-like): Forecasts of the same periods.
+        """
+        errors = np.abs(
+            np.atleast_2d(np.asarray(actuals, dtype=np.float64))
+            - np.atleast_2d(np.asarray(forecasts, dtype=np.float64))
+        )
+        if self.error is None:
+            self.error = np.full(len(errors), np.nan)
+            self._abs_sum = np.zeros(len(errors))
+            self._abs_count = np.zeros(len(errors))
+
+        weight = self.error_smoothing
+        for step in errors.T:
+            observed = ~np.isnan(step)
+            first = observed & np.isnan(self.error)
+            self.error[first] = step[first]
+            later = observed & ~first
+            self.error[later] += weight * (step[later] - self.error[later])
+            self._abs_sum[observed] += step[observed]
+            self._abs_count[observed] += 1
+
+    def drifted(self):
+        """Series whose recent error exceeds ``drift_threshold`` times the usual."""
+        if self.error is None:
+            return np.zeros(0, dtype=bool)
+        scale = self.scale
+        if scale is None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                scale = self._abs_sum / self._abs_count
+        with np.errstate(invalid="ignore"):
+            return self.error > self.drift_threshold * scale
+
+    def due(self):
+        """Reason a refit is due, None while incremental updates suffice."""
+        if self.n_updates >= self.refit_every:
+            return "schedule"
+        drifted = self.drifted()
+        if len(drifted) and drifted.mean() >= self.drift_share:
+            return "drift"
+        return None
+
+    def step(self, model, new_obs, refit):
+        """Bring a model up to date with newly arrived observations.
+
+        Args:
+            model: Fitted model with an ``update(new_obs)`` method.
+            new_obs: New observations, in the form ``model.update`` expects.
+            refit (callable): Re-estimates the model on the full history,
+                including ``new_obs``. Its result is returned instead of the
+                updated model.
+
+        Returns:
+            tuple: (model, reason) where reason is "schedule" or "drift" when
+                the model was re-estimated and None when it was updated.
+        """
+        reason = self.due()
+        if reason is None:
+            self.n_updates += 1
+            return model.update(new_obs), None
+        logger.info(f"Re-estimating after {self.n_updates} updates ({reason})")
+        model = refit()
+        self.reset()
+        return model, reason
+
+
+class _StatePanel:
+    """Stacked columnar states with the ``update`` and ``forecast`` of a model."""
+
+    def __init__(self, state, update_state, forecast_state):
+        self.state_ = state
+        self._update_state = update_state
+        self._forecast_state = forecast_state
+
+    def update(self, new_obs):
+        # Trailing NaN pad the rows of series with fewer new observations
+        observed = ~np.isnan(new_obs)
+        lengths = np.where(
+            observed.any(axis=1), new_obs.shape[1] - observed[:, ::-1].argmax(axis=1), 0
+        )
+        self.state_ = self._update_state(self.state_, new_obs, lengths)
+        return self
+
+    def forecast(self, horizon):
+        return self._forecast_state(self.state_, horizon)
+
+    def state(self):
+        return self.state_
+
+
+def _load_model(model_name, arrays):
+    """Rebuild an updatable model from its stored columnar state."""
+    if model_name == "exponential_smoothing":
+        from src.models import exponential_smoothing as ets
+
+        return _StatePanel(
+            arrays,
+            ets.update_state,
+            lambda s, h: ets.forecast_state(s["level"], s["trend"], s["season"], h),
+        )
+    if model_name == "arima":
+        from src.models import arima
+
+        return _StatePanel(
+            arrays, arima.update_state, lambda s, h: arima.forecast_state(s, h)[0]
+        )
+    from src.models.intermittent import IntermittentForecaster
+
+    return IntermittentForecaster.from_state(model_name, arrays)
+
+
+def model_update(
+    df,
+    model_name,
+    horizon,
+    registry,
+    policy=None,
+    id_col=None,
+    time_col="ds",
+    target_col=None,
+    n_jobs=None,
+    chunk_size=None,
+    run_id=None,
+):
+    """Roll the stored state of a model forward over newly arrived observations.
+
+    The latest run of ``model_name`` fitted with the current configuration is
+    advanced over the rows of ``df`` after each series' last stored timestamp,
+    without re-estimating any parameter, and saved as a new run. ``policy``
+    decides when ``model_run`` re-estimates every series instead, from its
+    schedule and the errors the stored state made on the new observations. The
+    series without a stored state, e.g. new ones, are fitted from scratch and
+    join the stored state at the next refit. Models outside
+    ``UPDATABLE_MODELS`` are always refitted, which for the baselines amounts
+    to appending the new observations.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with id, timestamp and target columns,
+            holding the full history of every series.
+        model_name (str): One of ``MODELS``.
+        horizon (int): Number of periods to forecast.
+        registry (ModelRegistry): Registry the state is read from and saved to.
+        policy (RefitPolicy, optional): Decides when a refit is due. Its counters
+            are restored from the stored state.
+        id_col (str, optional): Series column. Defaults to ``partition_dim``.
+        time_col (str, optional): Timestamp column. Defaults to "ds".
+        target_col (str, optional): Target column. Defaults to ``target``.
+        n_jobs (int, optional): Worker processes of a refit.
+        chunk_size (int, optional): Number of series per task of a refit.
+        run_id (str, optional): Run ID of the saved state. Defaults to a new ID.
+
+    Returns:
+        tuple: (forecasts, report) as returned by ``model_run``. The reason of a
+            refit is in ``report.attrs["refit"]``: "schedule", "drift",
+            "no_state" when there was no state to update, or None when the
+            stored state was rolled forward.
+    """
+    run_config = config.FORECASTING_CONFIG
+    id_col = id_col or run_config["partition_dim"]
+    target_col = target_col or run_config["target"]
+    policy = policy or RefitPolicy()
+
+    def refit():
+        return model_run(
+            df,
+            model_name,
+            horizon,
+            id_col,
+            time_col,
+            target_col,
+            n_jobs=n_jobs,
+            chunk_size=chunk_size,
+            registry=registry,
+            run_id=run_id,
+        )
+
+    artifact = None
+    if model_name in UPDATABLE_MODELS:
+        try:
+            artifact = registry.open(model_name, config_hash=config_hash())
+        except FileNotFoundError:
+            pass
+    if artifact is None:
+        forecasts, report = refit()
+        report.attrs["refit"] = "no_state"
+        return forecasts, report
+
+    start = time.perf_counter()
+    arrays = artifact.arrays()
+    last_ds = pd.Series(arrays.pop("last_ds"), index=artifact.ids)
+    policy.restore(artifact.manifest["metadata"].get("n_updates", 0), arrays)
+    arrays = {k: v for k, v in arrays.items() if not k.startswith("refit_")}
+    model = _load_model(model_name, arrays)
+
+    keys = df[id_col].astype(str)
+    known = keys.isin(artifact.ids).to_numpy()
+    new_rows = df[df[time_col].to_numpy() > keys.map(last_ds).to_numpy()]
+    if len(new_rows):
+        ids, starts, ends, values, new_last = split_series(
+            new_rows, id_col, time_col, target_col
+        )
+        panel, _ = stack_series(starts, ends, values)
+        positions = artifact.positions(ids)
+        new_obs = np.full((len(artifact.ids), panel.shape[1]), np.nan)
+        new_obs[positions] = panel
+        policy.record(new_obs, model.forecast(new_obs.shape[1]))
+        model, reason = policy.step(model, new_obs, refit)
+        if reason is not None:
+            forecasts, report = model
+            report.attrs["refit"] = reason
+            return forecasts, report
+        last_ds.iloc[positions] = new_last
+        saved_id = registry.save(
+            model_name,
+            artifact.ids,
+            {
+                **model.state(),
+                **policy.state(len(artifact.ids)),
+                "last_ds": last_ds.to_numpy(),
+            },
+            run_id=run_id,
+            metadata={
+                "n_updates": policy.n_updates,
+                "updated_from": artifact.manifest["run_id"],
+            },
+        )
+    else:
+        saved_id = artifact.manifest["run_id"]
+
+    series = df.loc[known, id_col].unique()
+    positions = artifact.positions(series)
+    predictions = model.forecast(horizon)[positions]
+    dates = future_dates(
+        last_ds.to_numpy()[positions], horizon, get_freq(run_config["interval"])
+    )
+    forecasts = pd.DataFrame(
+        {
+            id_col: np.repeat(np.asarray(series), horizon),
+            time_col: dates.ravel(),
+            model_name: predictions.ravel(),
+        }
+    )
+    failed = np.isnan(predictions).any(axis=1)
+    failures = [(series_id, "no forecast") for series_id in series[failed]]
+    forecasts = forecasts[~np.repeat(failed, horizon)]
+    wall_time = time.perf_counter() - start
+    logger.info(
+        f"{model_name}: rolled {len(series)} series forward in {wall_time:.2f}s "
+        f"({policy.n_updates} updates since the last refit)"
+    )
+    rows = [
+        {
+            "chunk_id": 0,
+            "n_series": len(series),
+            "n_failed": len(failures),
+            "wall_time": wall_time,
+        }
+    ]
+
+    if not known.all():
+        fresh, fresh_report = model_run(
+            df[~known],
+            model_name,
+            horizon,
+            id_col,
+            time_col,
+            target_col,
+            n_jobs=n_jobs,
+            chunk_size=chunk_size,
+        )
+        forecasts = pd.concat([forecasts, fresh], ignore_index=True)
+        failures.extend(fresh_report.attrs["failures"])
+        rows.extend(
+            fresh_report.assign(chunk_id=fresh_report["chunk_id"] + 1).to_dict(
+                "records"
+            )
+        )
+    for series_id, error in failures:
+        logger.warning(f"{model_name} failed for series {series_id}: {error}")
+
+    report = pd.DataFrame(rows)
+    report.attrs["failures"] = failures
+    report.attrs["run_id"] = saved_id
+    report.attrs["refit"] = None
+    return forecasts.reset_index(drop=True), report
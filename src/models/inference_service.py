@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.models.model_inference import ModelInference
+from src.models.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of request latencies."""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.latencies.append(seconds)
+
+    def percentiles(self):
+        """p50 and p99 latency of the window in milliseconds, None when empty."""
+        if not self.latencies:
+            return {"p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.fromiter(self.latencies, float), [50, 99]) * 1e3
+        return {"p50_ms": float(p50), "p99_ms": float(p99)}
+
+
+class _MicroBatcher:
+    """Coalesce concurrent requests for one model into a single predict call.
+
+    The first queued request opens a batch that collects further requests for
+    up to ``max_wait`` seconds or ``max_batch_size`` requests. The batch is
+    forecast once for the union of its series at the longest horizon and the
+    rows are split back to every request.
+    """
+
+    def __init__(self, inference, max_batch_size, max_wait):
+        self.inference = inference
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.n_batches = 0
+        self.n_requests = 0
+
+    async def submit(self, series, horizon):
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((list(series), horizon, future))
+        return await future
+
+    def close(self):
+        """Stop the worker once every request queued so far has been answered.
+
+        Requests already waiting for a batch are still forecast by this
+        batcher, new requests go to the batcher that replaces it.
+        """
+        if self.worker is not None and not self.worker.done():
+            self.queue.put_nowait(None)
+
+    async def _collect(self):
+        """Next batch of requests and whether the batcher was closed after it."""
+        loop = asyncio.get_running_loop()
+        request = await self.queue.get()
+        if request is None:
+            return [], True
+        batch = [request]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, closed = await self._collect()
+            if batch:
+                await self._answer(batch)
+            if closed and self.queue.empty():
+                return
+
+    async def _answer(self, batch):
+        self.n_batches += 1
+        self.n_requests += len(batch)
+        series = list(dict.fromkeys(s for request in batch for s in request[0]))
+        horizon = max(request[1] for request in batch)
+        try:
+            forecasts = await asyncio.to_thread(
+                self.inference.predict, series, horizon
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        values = forecasts[self.inference.model_name].to_numpy()
+        dates = forecasts["ds"].to_numpy()
+        rows = {series_id: i for i, series_id in enumerate(series)}
+        for request_series, request_horizon, future in batch:
+            if future.done():
+                continue
+            positions = np.array([rows[s] for s in request_series], dtype=int)
+            flat = (positions[:, None] * horizon + np.arange(request_horizon)).ravel()
+            future.set_result(
+                _frame(
+                    self.inference.model_name,
+                    np.repeat(request_series, request_horizon),
+                    dates[flat],
+                    values[flat],
+                )
+            )
+
+
+def _frame(model_name, ids, dates, values):
+    return pd.DataFrame(
+        {
+            config.FORECASTING_CONFIG["partition_dim"]: ids,
+            "ds": dates,
+            model_name: values,
+        }
+    )
+
+
+class InferenceService:
+    """Serve forecasts from the model registry with low latency.
+
+    Loaded models stay warm in an LRU cache, concurrent requests for the same
+    model are coalesced into micro-batches, and forecasts precomputed for a
+    run are served straight from an in-memory index as long as the run has
+    not changed. The HTTP layer lives in ``src.api``; this class has no
+    dependency on it and can be used and tested directly.
+    """
+
+    def __init__(
+        self, registry=None, max_models=None, max_batch_size=None, max_wait_ms=None
+    ):
+        """
+        Args:
+            registry (ModelRegistry, optional): Registry the models are read from.
+            max_models (int, optional): Models kept warm in the LRU cache.
+            max_batch_size (int, optional): Requests coalesced into one batch.
+            max_wait_ms (float, optional): Longest a request waits for its batch.
+        """
+        serving = config.FORECASTING_CONFIG["serving"]
+        self.registry = registry or ModelRegistry()
+        self.max_models = max_models or serving["max_models"]
+        self.max_batch_size = max_batch_size or serving["max_batch_size"]
+        self.max_wait = (max_wait_ms or serving["max_wait_ms"]) / 1e3
+        self.latency = LatencyTracker(serving["latency_window"])
+        self.models = OrderedDict()
+        self.batchers = {}
+        self.index = {}
+        self.counters = {
+            "model_hits": 0,
+            "model_misses": 0,
+            "index_hits": 0,
+            "index_misses": 0,
+        }
+
+    def load(self, model_name, run_id=None):
+        """Return a warm model, loading it and evicting the least recently used.
+
+        Args:
+            model_name (str): Name of the stored model.
+            run_id (str, optional): Run to serve. Defaults to the latest run.
+
+        Returns:
+            ModelInference: The loaded model.
+        """
+        key = (model_name, run_id)
+        if key in self.models:
+            self.counters["model_hits"] += 1
+            self.models.move_to_end(key)
+            return self.models[key]
+
+        self.counters["model_misses"] += 1
+        self.models[key] = ModelInference(model_name, run_id, self.registry)
+        if len(self.models) > self.max_models:
+            evicted, _ = self.models.popitem(last=False)
+            self._drop_batcher(evicted)
+            logger.info(f"Evicted {evicted} from the model cache")
+        return self.models[key]
+
+    def refresh(self, model_name):
+        """Drop the cached latest run of a model so the next request reloads it."""
+        self.models.pop((model_name, None), None)
+        self._drop_batcher((model_name, None))
+
+    def _drop_batcher(self, key):
+        batcher = self.batchers.pop(key, None)
+        if batcher is not None:
+            batcher.close()
+
+    def precompute(self, model_name, horizon, run_id=None):
+        """Forecast every series of a run once and index the result.
+
+        Args:
+            model_name (str): Name of the stored model.
+            horizon (int): Longest horizon served from the index.
+            run_id (str, optional): Run to forecast. Defaults to the latest run.
+        """
+        inference = self.load(model_name, run_id)
+        forecasts = inference.predict(None, horizon)
+        ids = forecasts[config.FORECASTING_CONFIG["partition_dim"]].to_numpy()
+        self.index[model_name] = {
+            "run_id": inference.artifact.manifest["run_id"],
+            "horizon": horizon,
+            "rows": pd.Index(ids[::horizon]),
+            "dates": forecasts["ds"].to_numpy().reshape(-1, horizon),
+            "values": forecasts[model_name].to_numpy().reshape(-1, horizon),
+        }
+        logger.info(f"Indexed {len(ids) // horizon} {model_name} forecasts")
+
+    def _from_index(self, model_name, series, horizon, run_id):
+        """Serve a request from the index, None unless it is fully covered."""
+        entry = self.index.get(model_name)
+        if entry is None or entry["run_id"] != run_id or horizon > entry["horizon"]:
+            return None
+        rows = entry["rows"].get_indexer(pd.Index(series).astype(str))
+        if (rows < 0).any():
+            return None
+        return _frame(
+            model_name,
+            np.repeat(np.asarray(series), horizon),
+            entry["dates"][rows, :horizon].ravel(),
+            entry["values"][rows, :horizon].ravel(),
+        )
+
+    async def predict(self, model_name, series, horizon, run_id=None):
+        """Forecast series of a stored model.
+
+        Args:
+            model_name (str): Name of the stored model.
+            series (list): Series IDs.
+            horizon (int): Number of periods to forecast.
+            run_id (str, optional): Run to serve. Defaults to the latest run.
+
+        Returns:
+            pd.DataFrame: Columns ``[partition_dim, "ds", model_name]``.
+
+        Raises:
+            KeyError: If a series is not part of the run.
+        """
+        start = time.perf_counter()
+        try:
+            inference = self.load(model_name, run_id)
+            served_run = inference.artifact.manifest["run_id"]
+            forecasts = self._from_index(model_name, series, horizon, served_run)
+            if forecasts is not None:
+                self.counters["index_hits"] += 1
+                return forecasts
+            self.counters["index_misses"] += 1
+
+            # Validate here so an unknown series only fails its own request
+            inference.artifact.positions(series)
+            key = (model_name, run_id)
+            if key not in self.batchers:
+                self.batchers[key] = _MicroBatcher(
+                    inference, self.max_batch_size, self.max_wait
+                )
+            return await self.batchers[key].submit(series, horizon)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    def stats(self):
+        """Latency percentiles, cache hit rates and batching statistics."""
+
+        def _rate(hits, misses):
+            total = self.counters[hits] + self.counters[misses]
+            return self.counters[hits] / total if total else None
+
+        n_batches = sum(batcher.n_batches for batcher in self.batchers.values())
+        n_batched = sum(batcher.n_requests for batcher in self.batchers.values())
+        return {
+            **self.latency.percentiles(),
+            "model_hit_rate": _rate("model_hits", "model_misses"),
+            "index_hit_rate": _rate("index_hits", "index_misses"),
+            "mean_batch_size": n_batched / n_batches if n_batches else None,
+            "loaded_models": [list(key) for key in self.models],
+            **self.counters,
+        }
@@ -0,0 +1,275 @@
+import numpy as np
+
+from src import config
+from src.helper.utils import append_panel
+
+
+def _ses(y, mask, alpha):
+    """Simple exponential smoothing of every row, skipping missing values.
+
+    Args:
+        y (np.ndarray): Panel of shape (n_series, T).
+        mask (np.ndarray): Boolean panel marking the observed values.
+        alpha (float): Smoothing parameter.
+
+    Returns:
+        np.ndarray: Final level of every series, NaN if it has no observation.
+    """
+    level = np.full(len(y), np.nan)
+    for t in range(y.shape[1]):
+        observed = mask[:, t]
+        start = observed & np.isnan(level)
+        level = np.where(start, y[:, t], level)
+        update = observed & ~start
+        level = np.where(update, level + alpha * (y[:, t] - level), level)
+    return level
+
+
+class IntermittentForecaster:
+    """
+    Forecasting methods for intermittent demand, computed for a whole panel at once.
+
+    The smoothing recursions step through time once and update every series in
+    the same vectorized operation, so there is no per-series Python loop.
+    """
+
+    METHODS = ("croston", "croston_sba", "tsb", "adida")
+
+    def __init__(self, method="croston", alpha=None, beta=None, aggregation_level=None):
+        """
+        Initialize the intermittent forecaster
+        Args:
+            method (str): Forecasting method ('croston', 'croston_sba', 'tsb', 'adida')
+            alpha (float, optional): Smoothing parameter of the demand size
+            beta (float, optional): Smoothing parameter of the demand probability (TSB)
+            aggregation_level (int, optional): ADIDA bucket size. Defaults to each
+                series' average inter-demand interval.
+        """
+        params = config.FORECASTING_CONFIG["models"]["intermittent"]["params"]
+        self.method = method
+        self.alpha = params["alpha"] if alpha is None else alpha
+        self.beta = params["beta"] if beta is None else beta
+        self.aggregation_level = aggregation_level
+        self.y_train = None
+
+    def fit(self, y_train, lengths=None):
+        """
+        Fit the intermittent model
+        Args:
+            y_train (array-like): Training data, a 1-D series or a (n_series, T) panel.
+                NaN values are treated as missing.
+            lengths (array-like, optional): Number of valid leading values of each
+                row of a ragged panel.
+        """
+        if self.method not in self.METHODS:
+            raise ValueError(f"Unknown method: {self.method}")
+
+        y_train = np.asarray(y_train, dtype=np.float64)
+        self._single = y_train.ndim == 1
+        self.y_train = np.atleast_2d(y_train)
+        mask = ~np.isnan(self.y_train)
+        if lengths is not None:
+            positions = np.arange(self.y_train.shape[1])
+            mask &= positions < np.asarray(lengths)[:, None]
+            self._lengths = np.asarray(lengths)
+        else:
+            # New observations follow the last observed value of every row
+            last_idx = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+            self._lengths = np.where(mask.any(axis=1), last_idx + 1, 0)
+        self._mask = mask
+
+        if self.method == "adida":
+            self._fit_adida()
+            return self
+
+        n_series = len(self.y_train)
+        self.size_ = np.full(n_series, np.nan)
+        self.interval_ = np.full(n_series, np.nan)
+        self.periods_ = np.zeros(n_series)
+        self.probability_ = np.full(n_series, np.nan)
+        self._smooth(self.y_train, mask)
+        return self
+
+    def update(self, new_obs):
+        """
+        Continue the smoothing recursions over newly arrived observations
+        without re-estimating anything. ADIDA's buckets shift with every new
+        observation, so it is recomputed on the extended history instead.
+        Args:
+            new_obs (array-like): New values, shape (k,) for a single series or
+                (n_series, k) for a panel, NaN where a series has no observation.
+        """
+        if self.y_train is None:
+            raise ValueError("Model must be fitted before updating. Call fit().")
+
+        new_obs = np.atleast_2d(np.asarray(new_obs, dtype=np.float64))
+        single = self._single
+        panel, lengths = append_panel(self.y_train, self._lengths, new_obs)
+        if self.method == "adida":
+            self.fit(panel, lengths=lengths)
+            self._single = single
+            return self
+
+        self.y_train = panel
+        self._lengths = lengths
+        self._mask = ~np.isnan(panel) & (
+            np.arange(panel.shape[1])[None, :] < lengths[:, None]
+        )
+        self._smooth(new_obs, ~np.isnan(new_obs))
+        return self
+
+    def forecast(self, horizon):
+        """
+        Generate forecasts
+        Args:
+            horizon (int): Number of periods to forecast
+        Returns:
+            array: Forecast values, shape (horizon,) for a single series or
+                (n_series, horizon) for a panel.
+        """
+        if self.y_train is None:
+            raise ValueError("Model must be fitted before prediction. Call fit().")
+
+        forecast = np.repeat(self.level_[:, None], horizon, axis=1)
+        return forecast[0] if self._single else forecast
+
+    def state(self):
+        """Fitted state of every series, for storage in columnar arrays.
+
+        Returns:
+            dict: The forecast level of every series, plus the smoothed size,
+                interval, periods since the last demand and demand probability
+                the Croston and TSB recursions continue from.
+        """
+        if self.y_train is None:
+            raise ValueError("Model must be fitted first. Call fit().")
+        if self.method == "adida":
+            return {"level": self.level_}
+        return {
+            "level": self.level_,
+            "size": self.size_,
+            "interval": self.interval_,
+            "periods": self.periods_,
+            "probability": self.probability_,
+        }
+
+    @classmethod
+    def from_state(cls, method, state, alpha=None, beta=None):
+        """
+        Rebuild a Croston or TSB forecaster from a stored state, so it can be
+        updated with new observations without its history.
+        Args:
+            method (str): Forecasting method the state was fitted with
+            state (dict): Output of ``state``
+            alpha (float, optional): Smoothing parameter of the demand size
+            beta (float, optional): Smoothing parameter of the demand probability
+        Returns:
+            IntermittentForecaster: Forecaster with an empty history.
+        """
+        if method == "adida":
+            raise ValueError("ADIDA needs its history and cannot resume from a state")
+        model = cls(method=method, alpha=alpha, beta=beta)
+        model.level_ = np.asarray(state["level"], dtype=np.float64)
+        model.size_ = np.asarray(state["size"], dtype=np.float64)
+        model.interval_ = np.asarray(state["interval"], dtype=np.float64)
+        model.periods_ = np.asarray(state["periods"], dtype=np.float64)
+        model.probability_ = np.asarray(state["probability"], dtype=np.float64)
+        model._single = False
+        model.y_train = np.empty((len(model.level_), 0))
+        model._lengths = np.zeros(len(model.level_), dtype=int)
+        model._mask = np.zeros(model.y_train.shape, dtype=bool)
+        return model
+
+    def _smooth(self, y, mask):
+        """Advance the recursions over the columns of ``y`` and set the level."""
+        if self.method in ("croston", "croston_sba"):
+            self._croston_steps(y, mask)
+        else:
+            self._tsb_steps(y, mask)
+
+    def _croston_steps(self, y, mask):
+        """Croston: smooth non-zero demand sizes and the intervals between them."""
+        alpha = self.alpha
+        size, interval, periods = self.size_, self.interval_, self.periods_
+        for t in range(y.shape[1]):
+            periods = periods + mask[:, t]
+            demand = mask[:, t] & (y[:, t] > 0)
+            first = demand & np.isnan(size)
+            update = demand & ~first
+            size = np.where(first, y[:, t], size)
+            interval = np.where(first, periods, interval)
+            size = np.where(update, size + alpha * (y[:, t] - size), size)
+            interval = np.where(
+                update, interval + alpha * (periods - interval), interval
+            )
+            periods = np.where(demand, 0, periods)
+
+        n_series = len(size)
+        level = np.divide(
+            size, interval, out=np.zeros(n_series), where=interval > 0
+        )
+        if self.method == "croston_sba":
+            level *= 1 - alpha / 2
+        self.size_, self.interval_, self.periods_ = size, interval, periods
+        seen = periods > 0
+        seen |= ~np.isnan(size)
+        self.level_ = np.where(seen, level, np.nan)
+
+    def _tsb_steps(self, y, mask):
+        """TSB: smooth the demand probability every period and sizes on demand."""
+        alpha, beta = self.alpha, self.beta
+        size, probability = self.size_, self.probability_
+        for t in range(y.shape[1]):
+            observed = mask[:, t]
+            occurred = (y[:, t] > 0).astype(np.float64)
+            first = observed & np.isnan(probability)
+            probability = np.where(first, occurred, probability)
+            update = observed & ~first
+            probability = np.where(
+                update, probability + beta * (occurred - probability), probability
+            )
+            demand = observed & (occurred > 0)
+            start = demand & np.isnan(size)
+            size = np.where(start, y[:, t], size)
+            size = np.where(demand & ~start, size + alpha * (y[:, t] - size), size)
+
+        self.size_, self.probability_ = size, probability
+        self.level_ = np.where(np.isnan(size), 0.0, probability * size)
+        self.level_[np.isnan(probability)] = np.nan
+
+    def _fit_adida(self):
+        """ADIDA: smooth non-overlapping temporal aggregates, then disaggregate."""
+        y, mask = self.y_train, self._mask
+        n_series, length = y.shape
+        n_valid = mask.sum(axis=1)
+        n_demand = (mask & (y > 0)).sum(axis=1)
+
+        if self.aggregation_level is not None:
+            levels = np.full(n_series, self.aggregation_level)
+        else:
+            adi = np.divide(
+                n_valid, n_demand, out=np.ones(n_series), where=n_demand > 0
+            )
+            levels = np.maximum(np.rint(adi), 1).astype(int)
+
+        # Right-align every row on its last observation so buckets end together
+        last_idx = length - 1 - mask[:, ::-1].argmax(axis=1)
+        idx = last_idx[:, None] - (length - 1) + np.arange(length)[None, :]
+        observed = np.where(mask, y, np.nan)
+        aligned = np.take_along_axis(observed, np.maximum(idx, 0), axis=1)
+        aligned[idx < 0] = np.nan
+
+        self.aggregation_levels_ = levels
+        self.level_ = np.full(n_series, np.nan)
+        for level in np.unique(levels):
+            rows = np.flatnonzero(levels == level)
+            n_buckets = length // level
+            if n_buckets == 0:
+                continue
+            window = aligned[rows, length - n_buckets * level :]
+            buckets = window.reshape(len(rows), n_buckets, level)
+            complete = ~np.isnan(buckets).any(axis=2)
+            totals = np.where(complete, buckets.sum(axis=2), np.nan)
+            self.level_[rows] = _ses(totals, complete, self.alpha) / level
+        self.level_[n_demand == 0] = 0.0
+        self.level_[n_valid == 0] = np.nan
@@ -1,14 +1,164 @@
-import matplotlib.pyplot as plt
+import logging
+
 import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import future_dates, get_freq, split_series
+from src.models.feature_engineering import FeatureEngineering
 
 
 class LightGBM:
+    """One global LightGBM model trained on every series of a long-format panel.
+
+    The series ID is a categorical feature next to the configured lag, rolling
+    and date features. Forecasts are recursive: each step is predicted for all
+    series with a single ``predict`` call and written back into the history
+    buffer the next step's features are computed from.
+    """
+
+    alias = "lightgbm"
+
+    def __init__(
+        self,
+        params=None,
+        num_boost_round=None,
+        n_jobs=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """
+        Args:
+            params (dict, optional): LightGBM parameters. Defaults to the configured
+                parameters.
+            num_boost_round (int, optional): Number of boosting rounds.
+            n_jobs (int, optional): Threads used by LightGBM.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        lgb_config = run_config["lightgbm"]
+        self.logger = logging.getLogger(__name__)
+        self.params = dict(lgb_config["params"] if params is None else params)
+        self.params.setdefault("seed", config.SEED)
+        if n_jobs is not None and n_jobs > 0:
+            self.params["num_threads"] = n_jobs
+        self.num_boost_round = num_boost_round or lgb_config["num_boost_round"]
+        self.freq = get_freq(run_config["interval"])
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.features = FeatureEngineering(
+            id_col=self.id_col, time_col=self.time_col, target_col=self.target_col
+        )
+        self.model = None
+        self.categories = None
+
+    def _design(self, df, features=None):
+        """Features of every row of ``df`` with the series code as last column."""
+        X = self.features.transform(df) if features is None else features.copy()
+        X[self.id_col] = pd.Categorical(
+            df[self.id_col], categories=self.categories
+        ).codes
+        return X
+
+    def train(self, train, test=None, eda=None, features=None):
+        """Fit the global model on every series of the panel.
+
+        Args:
+            train (pd.DataFrame): Long-format frame with id, timestamp and target.
+            test (pd.DataFrame, optional): Rows following ``train``, used for early
+                stopping when given.
+            eda (dict, optional): Unused, kept for interface compatibility.
+            features (pd.DataFrame, optional): Precomputed ``FeatureEngineering``
+                features of the ``train`` rows, e.g. sliced from the features of a
+                longer history. Computed from ``train`` when not given.
+
+        Returns:
+            LightGBM: The fitted model.
+        """
+        columns = [self.id_col, self.time_col, self.target_col]
+        train = train[columns]
+        self.categories = pd.Index(pd.unique(train[self.id_col])).sort_values()
+
+        X = self._design(train, features)
+        y = train[self.target_col].to_numpy(dtype=np.float64)
+        observed = ~np.isnan(y)
+        dataset = lgb.Dataset(
+            X[observed], y[observed], categorical_feature=[self.id_col]
+        )
+
+        valid_sets, callbacks = [], []
+        if test is not None and len(test):
+            # Test features need the tail of the training history.
+            combined = pd.concat([train, test[columns]], ignore_index=True)
+            X_test = self._design(combined).iloc[len(train) :]
+            y_test = combined[self.target_col].to_numpy(dtype=np.float64)[len(train) :]
+            valid_sets = [dataset.create_valid(X_test, y_test)]
+            callbacks = [lgb.early_stopping(50, verbose=False)]
+
+        self.model = lgb.train(
+            self.params,
+            dataset,
+            num_boost_round=self.num_boost_round,
+            valid_sets=valid_sets,
+            callbacks=callbacks,
+        )
+        self._keep_history(train)
+        self.logger.info(
+            f"Fitted LightGBM on {observed.sum()} rows of {len(self.categories)} series"
+        )
+        return self
+
+    def _keep_history(self, train):
+        """Store the last ``history_length`` values of every series, right-aligned."""
+        ids, starts, ends, values, last_ds = split_series(
+            train, self.id_col, self.time_col, self.target_col
+        )
+        window = max(self.features.history_length, 1)
+        idx = ends[:, None] - window + np.arange(window)[None, :]
+        history = values[np.maximum(idx, 0)]
+        history[idx < starts[:, None]] = np.nan
+        self.ids = ids
+        self.codes = self.categories.get_indexer(ids)
+        self.history = history
+        self.last_ds = last_ds
+
+    def forecast(self, horizon):
+        """Forecast every series recursively, one batched prediction per step.
+
+        Args:
+            horizon (int): Number of periods to forecast.
+
+        Returns:
+            pd.DataFrame: Columns ``[id_col, time_col, "lightgbm"]``.
+        """
+        if self.model is None:
+            raise ValueError("Model must be trained before forecasting. Call train().")
 
-    def __init__(self):
-        pass
+        n_series, window = self.history.shape
+        buffer = np.empty((n_series, window + horizon))
+        buffer[:, :window] = self.history
+        dates = future_dates(self.last_ds, horizon, self.freq)
 
-    def train(self):
-        pass
+        n_features = len(self.features.feature_names)
+        X = np.empty((n_series, n_features + 1))
+        X[:, -1] = self.codes
+        for step in range(horizon):
+            self.features.step_features(
+                buffer[:, step : window + step],
+                pd.DatetimeIndex(dates[:, step]),
+                out=X[:, :n_features],
+            )
+            buffer[:, window + step] = self.model.predict(X)
 
-    def forecast(self):
-        pass
+        return pd.DataFrame(
+            {
+                self.id_col: np.repeat(self.ids, horizon),
+                self.time_col: dates.ravel(),
+                self.alias: buffer[:, window:].ravel(),
+            }
+        )
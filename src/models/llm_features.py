@@ -1,33 +1,153 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Optional
+import asyncio
+import hashlib
+import json
 import logging
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 
-from datetime import datetime
+from src import config
+from src.data.schema import NewsFeatures
 
 logger = logging.getLogger(__name__)
 
+# Features used when there is no news or the extraction failed
+DEFAULT_FEATURES = {
+    "news_sentiment": 0.0,
+    "supply_chain_risk": 0.0,
+    "demand_indicator": 0.5,
+    "price_pressure": 0.0,
+    "market_volatility": 0.5,
+    "event_count": 0,
+}
 
+# Rough size of the system prompt and format instructions, in tokens
+PROMPT_TOKENS = 400
+
+
+def _run(coroutine):
+    """Run a coroutine to completion, also from inside a running event loop.
+
+    ``asyncio.run`` refuses to start a loop in a thread that runs one, so the
+    coroutine then gets its own loop in a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def _estimate_tokens(text: str) -> int:
+    """Estimate the tokens of a request, about four characters per token."""
+    return PROMPT_TOKENS + len(text) // 4
+
+
+class NewsFeatureCache:
+    """On-disk cache of extracted features keyed by a content hash."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite file holding the cache, created if missing
+        """
+        self.path = str(path)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS features (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, float]]:
+        """Return the cached features of the given keys that are present."""
+        found = {}
+        with sqlite3.connect(self.path) as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM features WHERE key IN ({placeholders})",
+                    batch,
+                )
+                found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def set_many(self, items: Dict[str, Dict[str, float]]):
+        """Store extracted features, replacing existing entries."""
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO features (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in items.items()],
+            )
+
+
+class _RateLimiter:
+    """Sliding one-minute window over request and token counts."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = []
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._events = [(t, n) for t, n in self._events if now - t < 60]
+                used_tokens = sum(n for _, n in self._events)
+                requests_ok = (
+                    self.requests_per_minute is None
+                    or len(self._events) < self.requests_per_minute
+                )
+                tokens_ok = (
+                    self.tokens_per_minute is None
+                    or not self._events
+                    or used_tokens + tokens <= self.tokens_per_minute
+                )
+                if requests_ok and tokens_ok:
+                    self._events.append((now, tokens))
+                    return
+                await asyncio.sleep(60 - (now - self._events[0][0]))
 
 
 class LLMFeatureExtractor:
     """Extract features from time series data using LLM-generated insights."""
     
-    def __init__(self, model_name: str = "gpt-3.5-turbo", domain: str = "general"):
+    def __init__(self, model_name: str = "gpt-3.5-turbo", domain: str = "general",
+                 llm=None, cache_path=None):
         """
         Initialize the LLM feature extractor.
         
         Args:
             model_name: Name of the LLM model to use
             domain: Domain context (e.g., 'raw_materials', 'retail', 'energy')
+            llm: Chat model to use instead of ChatOpenAI, e.g. a local stub
+            cache_path: SQLite file caching extracted features. Defaults to
+                ``OUTPUT_DIR / "llm_features.sqlite"``.
         """
+        llm_config = config.FORECASTING_CONFIG["llm_features"]
         self.model_name = model_name
         self.domain = domain
-        self.llm = ChatOpenAI(model=model_name, temperature=0)
+        self.llm = llm if llm is not None else ChatOpenAI(model=model_name, temperature=0)
         self.parser = PydanticOutputParser(pydantic_object=NewsFeatures)
+        self.chain = self._build_agent()
+        self.max_concurrency = llm_config["max_concurrency"]
+        self.max_retries = llm_config["max_retries"]
+        self.requests_per_minute = llm_config["requests_per_minute"]
+        self.tokens_per_minute = llm_config["tokens_per_minute"]
+        self.token_budget = llm_config["token_budget"]
+        if cache_path is None:
+            config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            cache_path = config.OUTPUT_DIR / "llm_features.sqlite"
+        self.cache = NewsFeatureCache(cache_path)
         
     def _get_domain_context(self) -> str:
         """Get domain-specific context for the LLM."""
@@ -62,16 +182,32 @@ class LLMFeatureExtractor:
             Analyze the provided news and extract structured features for forecasting.
             {domain_context}
             
-            {self.parser.get_format_instructions()}"""),
+            {{format_instructions}}"""),
             ("user", """Date: {date}
             News Summary:
             {news_text}
             
             Extract relevant features that could impact future trends.""")
-        ])
+        ]).partial(format_instructions=self.parser.get_format_instructions())
         
         return prompt | self.llm | self.parser
     
+    def _cache_key(self, news_text: str, date: str) -> str:
+        """Content hash of a request: news text, date, domain and model."""
+        payload = json.dumps([news_text, date, self.domain, self.model_name])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _to_features(result: NewsFeatures) -> Dict[str, float]:
+        return {
+            "news_sentiment": result.sentiment_score,
+            "supply_chain_risk": result.supply_chain_risk,
+            "demand_indicator": result.demand_indicator,
+            "price_pressure": result.price_pressure,
+            "market_volatility": result.market_volatility,
+            "event_count": len(result.key_events)
+        }
+
     def extract_news_features(self, news_text: str, date: str) -> Dict[str, float]:
         """
         Extract features from news text using LLM.
@@ -83,48 +219,133 @@ class LLMFeatureExtractor:
         Returns:
             Dictionary of extracted features
         """
-        domain_context = self._get_domain_context()
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""You are an expert analyst in the {self.domain} sector.
-            Analyze the provided news and extract structured features for forecasting.
-            {domain_context}
-            
-            {self.parser.get_format_instructions()}"""),
-            ("user", """Date: {date}
-            News Summary:
-            {news_text}
-            
-            Extract relevant features that could impact future trends.""")
-        ])
-        
         try:
-            chain = prompt | self.llm | self.parser
-            result = chain.invoke({"date": date, "news_text": news_text})
-            
-            return {
-                "news_sentiment": result.sentiment_score,
-                "supply_chain_risk": result.supply_chain_risk,
-                "demand_indicator": result.demand_indicator,
-                "price_pressure": result.price_pressure,
-                "market_volatility": result.market_volatility,
-                "event_count": len(result.key_events)
-            }
+            result = self.chain.invoke({"date": date, "news_text": news_text})
+            return self._to_features(result)
         except Exception as e:
             logger.error(f"Error extracting news features: {e}")
-            return {
-                "news_sentiment": 0.0,
-                "supply_chain_risk": 0.0,
-                "demand_indicator": 0.5,
-                "price_pressure": 0.0,
-                "market_volatility": 0.5,
-                "event_count": 0
-            }
-    
+            return dict(DEFAULT_FEATURES)
+
+    async def _aextract(self, news_text: str, date: str, semaphore, limiter):
+        """Extract features for one request with retries and exponential backoff.
+
+        Returns None when every attempt failed so the result is not cached.
+        """
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(_estimate_tokens(news_text))
+                try:
+                    result = await self.chain.ainvoke(
+                        {"date": date, "news_text": news_text}
+                    )
+                    return self._to_features(result)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Error extracting news features: {e}")
+                        return None
+                    delay = 2 ** attempt + random.random()
+                    logger.warning(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def aextract_many(
+        self, requests: Dict[str, tuple]
+    ) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        Extract features for many requests concurrently.
+
+        Concurrency is bounded by ``max_concurrency`` and calls are throttled to
+        the configured requests and tokens per minute. Requests beyond the
+        optional ``token_budget`` are not sent.
+
+        Args:
+            requests: (news_text, date) tuples keyed by cache key
+
+        Returns:
+            Extracted features keyed by cache key, None for failed requests
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = _RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+
+        keys, tasks, spent = [], [], 0
+        for key, (news_text, date) in requests.items():
+            spent += _estimate_tokens(news_text)
+            if self.token_budget is not None and spent > self.token_budget:
+                skipped = len(requests) - len(keys)
+                logger.warning(f"Token budget exhausted, skipping {skipped} requests")
+                break
+            keys.append(key)
+            tasks.append(self._aextract(news_text, date, semaphore, limiter))
+        results = await asyncio.gather(*tasks)
+        return dict(zip(keys, results))
+
+    def _plan(self, df: pd.DataFrame, date_col: str, news_col: str):
+        """Cache key of every row, the cached features and the requests to send."""
+        news = df[news_col].fillna("").astype(str).to_numpy()
+        dates = df[date_col].astype(str).to_numpy()
+        has_news = news != ""
+        keys = np.full(len(df), None, dtype=object)
+        keys[has_news] = [
+            self._cache_key(text, date)
+            for text, date in zip(news[has_news], dates[has_news])
+        ]
+
+        requests = {}
+        for key, text, date in zip(keys[has_news], news[has_news], dates[has_news]):
+            requests.setdefault(key, (text, date))
+        features = self.cache.get_many(list(requests))
+        missing = {
+            key: request for key, request in requests.items() if key not in features
+        }
+        logger.info(
+            f"{len(requests)} unique news items, {len(features)} cached, "
+            f"{len(missing)} to extract"
+        )
+        return keys, features, missing
+
+    def _assemble(self, df: pd.DataFrame, keys, features, extracted) -> pd.DataFrame:
+        """Cache the new extractions and join the features of every row to df."""
+        extracted = {key: value for key, value in extracted.items() if value}
+        self.cache.set_many(extracted)
+        features.update(extracted)
+
+        news_df = pd.DataFrame(
+            [features.get(key, DEFAULT_FEATURES) if key else DEFAULT_FEATURES
+             for key in keys],
+            index=df.index,
+        )
+        return pd.concat([df, news_df], axis=1)
+
+    async def aadd_news_features(self, df: pd.DataFrame, date_col: str,
+                                 news_col: str) -> pd.DataFrame:
+        """
+        Add LLM-extracted news features to dataframe from a running event loop.
+
+        The awaitable form of ``add_news_features``, for callers that already
+        run in an event loop such as notebooks or FastAPI handlers.
+
+        Args:
+            df: Input dataframe
+            date_col: Name of the datetime column
+            news_col: Name of the column containing news text
+
+        Returns:
+            DataFrame with news features added
+        """
+        logger.info(f"Extracting news features for {self.domain} domain...")
+        keys, features, missing = self._plan(df, date_col, news_col)
+        extracted = await self.aextract_many(missing) if missing else {}
+        return self._assemble(df.copy(), keys, features, extracted)
+
     def add_news_features(self, df: pd.DataFrame, date_col: str, 
                          news_col: str) -> pd.DataFrame:
         """
         Add LLM-extracted news features to dataframe.
+
+        Identical (news text, date) pairs are extracted once, cached results are
+        reused across runs and the remaining requests are sent concurrently.
+        Called from a thread that already runs an event loop, the requests are
+        sent from a worker thread with its own loop; ``aadd_news_features``
+        awaits them on the running loop instead.
         
         Args:
             df: Input dataframe
@@ -134,30 +355,7 @@ class LLMFeatureExtractor:
         Returns:
             DataFrame with news features added
         """
-        df = df.copy()
-        
         logger.info(f"Extracting news features for {self.domain} domain...")
-        
-        news_features_list = []
-        for idx, row in df.iterrows():
-            news_text = row.get(news_col, "")
-            date = str(row[date_col])
-            
-            if pd.isna(news_text) or news_text == "":
-                features = {
-                    "news_sentiment": 0.0,
-                    "supply_chain_risk": 0.0,
-                    "demand_indicator": 0.5,
-                    "price_pressure": 0.0,
-                    "market_volatility": 0.5,
-                    "event_count": 0
-                }
-            else:
-                features = self.extract_news_features(news_text, date)
-            
-            news_features_list.append(features)
-        
-        news_df = pd.DataFrame(news_features_list)
-        df = pd.concat([df, news_df], axis=1)
-        
-        return df
+        keys, features, missing = self._plan(df, date_col, news_col)
+        extracted = _run(self.aextract_many(missing)) if missing else {}
+        return self._assemble(df.copy(), keys, features, extracted)
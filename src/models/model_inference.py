@@ -1,17 +1,75 @@
-from src.helper.metrics import rmsle, wape, rmsse
+import numpy as np
+import pandas as pd
 
+from src import config
+from src.helper.metrics import rmsle, wape, rmsse
+from src.helper.utils import future_dates, get_freq
+from src.models.registry import ModelRegistry
 
 
 class ModelInference:
-    def __init__(self, model):
-        self.model = model
-
-    def predict(self, input_data):
-        # Perform inference using the model
-        predictions = self.model(input_data)
-        return predictions
-    
-    def _model_baseline(self, actuals, forecasts):
+    """Forecast series from the fitted state stored in the model registry.
+
+    Only the state of the requested series is read, so scoring a subset does
+    not load the whole fleet.
+    """
+
+    def __init__(self, model_name, run_id=None, registry=None):
+        """
+        Args:
+            model_name (str): Name of the stored model.
+            run_id (str, optional): Run to serve. Defaults to the latest run.
+            registry (ModelRegistry, optional): Registry to read from.
+        """
+        self.model_name = model_name
+        self.registry = registry or ModelRegistry()
+        self.artifact = self.registry.open(model_name, run_id)
+        self.freq = get_freq(config.FORECASTING_CONFIG["interval"])
+
+    def predict(self, series=None, horizon=1):
+        """Forecast the selected series from their stored state.
+
+        Args:
+            series (list, optional): Series IDs. Defaults to every stored series.
+            horizon (int): Number of periods to forecast.
+
+        Returns:
+            pd.DataFrame: Columns ``[partition_dim, "ds", model_name]``.
+        """
+        from src.models.exponential_smoothing import forecast_state
+        from src.models.model_run import INTERMITTENT_MODELS
+
+        ids = self.artifact.ids[self.artifact.positions(series)]
+        arrays = self.artifact.arrays(series)
+        if self.model_name == "exponential_smoothing":
+            predictions = forecast_state(
+                arrays["level"], arrays["trend"], arrays["season"], horizon
+            )
+        elif self.model_name in INTERMITTENT_MODELS:
+            predictions = np.repeat(arrays["level"][:, None], horizon, axis=1)
+        elif self.model_name == "arima":
+            from src.models import arima
+
+            predictions, _ = arima.forecast_state(arrays, horizon)
+        else:
+            raise ValueError(f"Cannot forecast {self.model_name} from stored state")
+
+        dates = future_dates(arrays["last_ds"], horizon, self.freq)
+        return pd.DataFrame(
+            {
+                config.FORECASTING_CONFIG["partition_dim"]: np.repeat(ids, horizon),
+                "ds": dates.ravel(),
+                self.model_name: predictions.ravel(),
+            }
+        )
+
+    def _model_baseline(self, actuals, forecasts, y_train=None, seasonality=1):
         # Calculate baseline metrics for model evaluation
-        metrics = 
-        return metrics
\ No newline at end of file
+        metrics = {
+            "rmsle": rmsle(actuals, forecasts),
+            "wape": wape(actuals, forecasts),
+        }
+        # Scaling by the actuals themselves would flatter the forecast
+        if y_train is not None:
+            metrics["rmsse"] = rmsse(actuals, forecasts, y_train, seasonality)
+        return metrics
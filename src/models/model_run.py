@@ -1,12 +1,556 @@
+import logging
+import os
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.models import probabilistic
+from src.helper.utils import (
+    config_hash,
+    future_dates,
+    get_freq,
+    get_season_length,
+    split_series,
+    stack_series,
+)
 
 warnings.filterwarnings("ignore")
 
+logger = logging.getLogger(__name__)
+
+BASELINE_MODELS = ("naive", "seasonal_naive", "mean", "drift")
+INTERMITTENT_MODELS = ("croston", "croston_sba", "tsb", "adida")
+# Models fitted on the whole panel at once by a native vectorized or batched path
+PANEL_MODELS = BASELINE_MODELS + INTERMITTENT_MODELS + (
+    "arima",
+    "lightgbm",
+    "neural",
+    "cold_start",
+)
+# Models fitted one series at a time across the process pool
+SERIES_MODELS = ("exponential_smoothing",)
+MODELS = PANEL_MODELS + SERIES_MODELS
+# Configuration sections a model's forecasts depend on, besides the columns and
+# interval every model reads
+MODEL_SECTIONS = {
+    "exponential_smoothing": ("num_trails", "tuning"),
+    "lightgbm": ("lightgbm", "feature_engineering"),
+    "neural": ("neural",),
+    "cold_start": ("cold_start",),
+    **{model_name: ("models",) for model_name in INTERMITTENT_MODELS},
+}
+COMMON_SECTIONS = ("interval", "partition_dim", "target")
+
+
+def identify_timeseries(df, id_col=None, time_col="ds", target_col=None):
+    """Profile every series and route it to a model bucket of the configuration.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with id, timestamp and target columns.
+        id_col (str, optional): Series column. Defaults to ``partition_dim``.
+        time_col (str, optional): Timestamp column. Defaults to "ds".
+        target_col (str, optional): Target column. Defaults to ``target``.
+
+    Returns:
+        pd.DataFrame: Routing table with the series profile, its "bucket"
+            ("new_product", "intermittent" or "general") and the bucket's models.
+    """
+    from src.models.eda import TimeSeriesEDA
+
+    eda = TimeSeriesEDA()
+    routing = eda.series_profile(df, id_col, time_col, target_col)
+    routing["bucket"] = np.select(
+        [eda.check_new_product(routing), eda.check_intmediant(routing)],
+        ["new_product", "intermittent"],
+        "general",
+    )
+    bucket_models = {
+        bucket: list(models["models"])
+        for bucket, models in config.FORECASTING_CONFIG["models"].items()
+    }
+    routing["models"] = routing["bucket"].map(bucket_models)
+    logger.info(f"Series per bucket: {routing['bucket'].value_counts().to_dict()}")
+    return routing
+
+
+def _fit_forecast(
+    model_name, y, horizon, season_length, keep_state=False, warm_start=None
+):
+    """Fit a single-series model and return its point forecast and fitted state."""
+    if model_name == "exponential_smoothing":
+        from src.models.exponential_smoothing import ExponentialSmoothingModels
+
+        model = ExponentialSmoothingModels(season_length=season_length)
+        model.train(pd.Series(y), None, warm_start=warm_start)
+        state = model.state() if keep_state else None
+        return np.asarray(model.forecast(horizon)), state
+    raise ValueError(f"Unknown model: {model_name}")
+
+
+def _run_chunk(chunk_id, model_name, series, horizon, season_length, keep_state=False):
+    """Fit and forecast every series of a chunk, isolating per-series failures.
+
+    Args:
+        chunk_id (int): Position of the chunk in the schedule.
+        model_name (str): Name of the model to run.
+        series (list): List of ``(series_id, values, warm_start)`` tuples, the
+            last being the parameters of a previous run or None.
+        horizon (int): Number of periods to forecast.
+        season_length (int): Seasonal period passed to the model.
+        keep_state (bool): Also return the fitted state of every series.
+
+    Returns:
+        dict: Forecasts and states keyed by position in ``series``, failures and
+            wall time.
+    """
+    start = time.perf_counter()
+    forecasts = {}
+    states = {}
+    failures = []
+    for position, (series_id, y, warm_start) in enumerate(series):
+        try:
+            forecast, state = _fit_forecast(
+                model_name, y, horizon, season_length, keep_state, warm_start
+            )
+            forecast = np.asarray(forecast)
+            if forecast.shape != (horizon,):
+                raise ValueError(f"Expected {horizon} forecasts, got {forecast.shape}")
+            forecasts[position] = forecast.astype(np.float64)
+            if keep_state:
+                states[position] = state
+        except Exception as e:
+            failures.append((series_id, repr(e)))
+    return {
+        "chunk_id": chunk_id,
+        "forecasts": forecasts,
+        "states": states,
+        "failures": failures,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+def _run_panel_model(
+    df,
+    model_name,
+    horizon,
+    id_col,
+    time_col,
+    target_col,
+    n_jobs,
+    reference=None,
+    quantiles=None,
+    features=None,
+    registry=None,
+    run_id=None,
+):
+    """Forecast every series of the panel with a model's native batched path.
+
+    Baselines get analytic Gaussian quantiles, intermittent methods bootstrap
+    quantiles and ARIMA its own prediction intervals when ``quantiles`` is given.
+    The cold-start index is kept in ``registry``, see ``_cold_start_index``.
+
+    Returns:
+        tuple: (forecasts, state) where ``forecasts`` has columns
+            ``[id_col, time_col, model_name]`` plus the quantile columns of the
+            models with native quantiles, and ``state`` is the
+            ``(ids, arrays, objects)`` fitted state, None if the model has none.
+    """
+    run_config = config.FORECASTING_CONFIG
+    season_length = get_season_length(run_config["interval"])
+
+    if model_name in BASELINE_MODELS + INTERMITTENT_MODELS:
+        from src.models.baseline import BaselineForecaster
+        from src.models.intermittent import IntermittentForecaster
+
+        ids, starts, ends, values, last_ds = split_series(
+            df, id_col, time_col, target_col
+        )
+        panel, lengths = stack_series(starts, ends, values)
+        if model_name in BASELINE_MODELS:
+            model = BaselineForecaster(method=model_name, seasonality=season_length)
+        else:
+            model = IntermittentForecaster(method=model_name)
+        predictions = model.fit(panel, lengths=lengths).forecast(horizon)
+        dates = future_dates(last_ds, horizon, get_freq(run_config["interval"]))
+        forecasts = pd.DataFrame(
+            {
+                id_col: np.repeat(ids, horizon),
+                time_col: dates.ravel(),
+                model_name: predictions.ravel(),
+            }
+        )
+        if quantiles:
+            if model_name in BASELINE_MODELS:
+                std = probabilistic.baseline_std(
+                    model_name, panel, lengths, horizon, season_length
+                )
+                values = probabilistic.normal_quantiles(predictions, std, quantiles)
+            else:
+                values = probabilistic.bootstrap_quantiles(
+                    panel,
+                    lengths,
+                    probabilistic.demand_probability(model),
+                    horizon,
+                    quantiles,
+                )
+            forecasts = probabilistic.add_quantiles(
+                forecasts, model_name, values, quantiles
+            )
+        state = None
+        if model_name in INTERMITTENT_MODELS:
+            state = (ids, model.state(), None)
+        return forecasts, state
+    if model_name == "arima":
+        from src.models.arima import ARIMA
+
+        model = ARIMA(
+            season_length=season_length,
+            n_jobs=n_jobs,
+            id_col=id_col,
+            time_col=time_col,
+            target_col=target_col,
+        )
+        model.train(df)
+        return model.forecast(horizon, quantiles), model.state()
+    if model_name == "lightgbm":
+        from src.models.lightgbm import LightGBM
+
+        model = LightGBM(
+            n_jobs=n_jobs, id_col=id_col, time_col=time_col, target_col=target_col
+        )
+        return model.train(df, features=features).forecast(horizon), None
+    if model_name == "neural":
+        from src.models.neuralforecast import NeuralTimeSeries
+
+        model = NeuralTimeSeries(
+            n_jobs=n_jobs, id_col=id_col, time_col=time_col, target_col=target_col
+        )
+        return model.train(df).forecast(horizon), None
+    if model_name == "cold_start":
+        if reference is None:
+            raise ValueError("cold_start needs the reference panel of mature series")
+        model = _cold_start_index(
+            reference, registry, run_id, id_col, time_col, target_col
+        )
+        return model.forecast(df, horizon), None
+    raise ValueError(f"Unknown model: {model_name}")
+
+
+def _cold_start_index(reference, registry, run_id, id_col, time_col, target_col):
+    """Cold-start model indexing the launch curves of a reference panel.
+
+    Without a registry the index is fitted on ``reference``. With one, the
+    index of the latest run under the current configuration is loaded and
+    extended by the series of ``reference`` launched and matured since, and
+    saved as a new run when it grew; the index is only fitted when no run
+    exists yet.
+
+    Returns:
+        ColdStartForecaster: The fitted model.
+    """
+    from src.models.cold_start import ColdStartForecaster
+
+    kwargs = {"id_col": id_col, "time_col": time_col, "target_col": target_col}
+    if registry is None:
+        return ColdStartForecaster(**kwargs).fit(reference)
+    try:
+        artifact = registry.open("cold_start", config_hash=config_hash())
+    except FileNotFoundError:
+        model = ColdStartForecaster(**kwargs).fit(reference)
+        n_added = len(model.ids)
+    else:
+        model = ColdStartForecaster.from_state(
+            artifact.ids, artifact.arrays(), artifact.manifest["metadata"], **kwargs
+        )
+        n_indexed = len(model.ids)
+        model.add(reference, launched_after=reference[time_col].min())
+        n_added = len(model.ids) - n_indexed
+    if n_added:
+        ids, arrays, metadata = model.state()
+        registry.save("cold_start", ids, arrays, run_id=run_id, metadata=metadata)
+    return model
+
+
+def _save_state(registry, model_name, df, id_col, time_col, state, run_id=None):
+    """Save the fitted state of a model run with the last timestamp of each series.
+
+    Returns:
+        str: The run ID, None if the model exposes no state.
+    """
+    if state is None:
+        logger.warning(f"{model_name} has no state to save")
+        return None
+    ids, arrays, objects = state
+    last_ds = df.groupby(id_col, observed=True)[time_col].max()
+    arrays = {**arrays, "last_ds": last_ds.reindex(ids).to_numpy()}
+    return registry.save(model_name, ids, arrays, objects, run_id=run_id)
+
+
+def _warm_starts(registry, model_name, ids):
+    """Parameters of every series in the latest stored run, None where missing."""
+    if model_name != "exponential_smoothing":
+        return [None] * len(ids)
+    from src.models.exponential_smoothing import params_from_state
+
+    try:
+        artifact = registry.open(model_name)
+    except FileNotFoundError:
+        return [None] * len(ids)
+    positions = artifact.ids.get_indexer(pd.Index(ids).astype(str))
+    found = positions >= 0
+    params = params_from_state(artifact.arrays(artifact.ids[positions[found]]))
+    warm_starts = [None] * len(ids)
+    for i, value in zip(np.flatnonzero(found), params):
+        warm_starts[i] = value
+    logger.info(
+        f"Warm-starting {found.sum()} {model_name} series from run "
+        f"{artifact.manifest['run_id']}"
+    )
+    return warm_starts
+
+
+def _resolve_n_jobs(n_jobs):
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def model_run(
+    df,
+    model_name,
+    horizon,
+    id_col=None,
+    time_col="ds",
+    target_col=None,
+    n_jobs=None,
+    chunk_size=None,
+    registry=None,
+    run_id=None,
+    reference=None,
+    quantiles=None,
+    features=None,
+):
+    """Fit and forecast one model for every series of a long-format panel.
+
+    The panel is split by ``partition_dim`` and the series are scheduled in chunks
+    across a process pool. A failing series is recorded and skipped instead of
+    aborting the batch. Models in ``PANEL_MODELS`` skip the pool and forecast
+    the whole panel through their own vectorized or batched path.
+
+    Args:
+        df (pd.DataFrame): Long-format frame with id, timestamp and target columns.
+        model_name (str): One of ``MODELS``.
+        horizon (int): Number of periods to forecast.
+        id_col (str, optional): Series column. Defaults to ``partition_dim``.
+        time_col (str, optional): Timestamp column. Defaults to "ds".
+        target_col (str, optional): Target column. Defaults to ``target``.
+        n_jobs (int, optional): Worker processes, -1 for all cores, 1 runs inline.
+        chunk_size (int, optional): Number of series per task.
+        registry (ModelRegistry, optional): Registry the fitted state of every
+            series is saved to, for models that expose one. The tuning of
+            "exponential_smoothing" starts from the parameters of its latest
+            stored run.
+        run_id (str, optional): Run ID of the saved state. Defaults to a new ID.
+        reference (pd.DataFrame, optional): Panel of established series that
+            cold-start models borrow launch curves from.
+        quantiles (list, optional): Quantile levels to forecast besides the
+            point forecast. Models without analytic or bootstrap quantiles are
+            calibrated by ``conformal_quantiles``.
+        features (pd.DataFrame, optional): Precomputed ``FeatureEngineering``
+            features of the ``df`` rows, used by "lightgbm".
+
+    Returns:
+        tuple: (forecasts, report) where ``forecasts`` has columns
+            ``[id_col, time_col, model_name]``, plus one column per quantile
+            named by ``quantile_column``, and ``report`` has one row per chunk
+            with its size, number of failures and wall time in seconds. Failed
+            series are listed in ``report.attrs["failures"]`` and the ID of the
+            saved run in ``report.attrs["run_id"]``.
+    """
+    run_config = config.FORECASTING_CONFIG
+    id_col = id_col or run_config["partition_dim"]
+    target_col = target_col or run_config["target"]
+    n_jobs = _resolve_n_jobs(
+        run_config["execution"]["n_jobs"] if n_jobs is None else n_jobs
+    )
+    chunk_size = chunk_size or run_config["execution"]["chunk_size"]
+    season_length = get_season_length(run_config["interval"])
+    quantiles = list(quantiles or [])
+
+    if model_name not in MODELS:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    if model_name in PANEL_MODELS:
+        start = time.perf_counter()
+        forecasts, state = _run_panel_model(
+            df,
+            model_name,
+            horizon,
+            id_col,
+            time_col,
+            target_col,
+            n_jobs,
+            reference,
+            quantiles,
+            features,
+            registry,
+            run_id,
+        )
+        columns = [probabilistic.quantile_column(model_name, q) for q in quantiles]
+        if quantiles and not set(columns) <= set(forecasts):
+            forecasts = forecasts.sort_values(
+                [id_col, time_col], kind="stable", ignore_index=True
+            )
+            values = probabilistic.conformal_quantiles(
+                df,
+                forecasts,
+                model_name,
+                horizon,
+                quantiles,
+                id_col,
+                time_col,
+                target_col,
+                n_jobs=n_jobs,
+                reference=reference,
+            )
+            forecasts = probabilistic.add_quantiles(
+                forecasts, model_name, values, quantiles
+            )
+        wall_time = time.perf_counter() - start
+        missing = (
+            forecasts[model_name]
+            .isna()
+            .groupby(forecasts[id_col], observed=True)
+            .any()
+        )
+        failures = [(series_id, "no forecast") for series_id in missing.index[missing]]
+        for series_id, error in failures:
+            logger.warning(f"{model_name} failed for series {series_id}: {error}")
+        logger.info(f"{model_name}: {len(missing)} series in {wall_time:.2f}s")
+        report = pd.DataFrame(
+            [
+                {
+                    "chunk_id": 0,
+                    "n_series": len(missing),
+                    "n_failed": len(failures),
+                    "wall_time": wall_time,
+                }
+            ]
+        )
+        report.attrs["failures"] = failures
+        report.attrs["run_id"] = None
+        # The cold-start index is saved by _cold_start_index as it grows
+        if registry is not None and model_name != "cold_start":
+            report.attrs["run_id"] = _save_state(
+                registry, model_name, df, id_col, time_col, state, run_id
+            )
+        forecasts = forecasts[~forecasts[id_col].isin(missing.index[missing])]
+        return forecasts.reset_index(drop=True), report
+
+    ids, starts, ends, values, last_ds = split_series(df, id_col, time_col, target_col)
+    warm_starts = [None] * len(ids)
+    if registry is not None:
+        warm_starts = _warm_starts(registry, model_name, ids)
+    series = [
+        (ids[i], values[starts[i] : ends[i]], warm_starts[i]) for i in range(len(ids))
+    ]
+    chunks = [
+        (chunk_id, offset, series[offset : offset + chunk_size])
+        for chunk_id, offset in enumerate(range(0, len(series), chunk_size))
+    ]
+
+    # Quantiles of the series models come from their fitted states
+    keep_state = registry is not None or bool(quantiles)
+    predictions = np.full((len(ids), horizon), np.nan)
+    succeeded = np.zeros(len(ids), dtype=bool)
+    states = {}
+    rows = []
+    failures = []
+
+    def _collect(result, offset, n_series):
+        for position, forecast in result["forecasts"].items():
+            predictions[offset + position] = forecast
+            succeeded[offset + position] = True
+        for position, state in result["states"].items():
+            states[offset + position] = state
+        failures.extend(result["failures"])
+        rows.append(
+            {
+                "chunk_id": result["chunk_id"],
+                "n_series": n_series,
+                "n_failed": len(result["failures"]),
+                "wall_time": result["wall_time"],
+            }
+        )
+        logger.info(
+            f"{model_name} chunk {result['chunk_id']}: {n_series} series in "
+            f"{result['wall_time']:.2f}s ({len(result['failures'])} failed)"
+        )
 
-def identify_timeseries():
-    pass
+    if n_jobs == 1 or len(chunks) == 1:
+        for chunk_id, offset, chunk in chunks:
+            result = _run_chunk(
+                chunk_id, model_name, chunk, horizon, season_length, keep_state
+            )
+            _collect(result, offset, len(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as executor:
+            futures = {
+                executor.submit(
+                    _run_chunk,
+                    chunk_id,
+                    model_name,
+                    chunk,
+                    horizon,
+                    season_length,
+                    keep_state,
+                ): (offset, len(chunk))
+                for chunk_id, offset, chunk in chunks
+            }
+            for future in as_completed(futures):
+                offset, n_series = futures[future]
+                _collect(future.result(), offset, n_series)
 
+    for series_id, error in failures:
+        logger.warning(f"{model_name} failed for series {series_id}: {error}")
 
-def model_run():
-    pass
+    dates = future_dates(last_ds[succeeded], horizon, get_freq(run_config["interval"]))
+    forecasts = pd.DataFrame(
+        {
+            id_col: np.repeat(ids[succeeded], horizon),
+            time_col: dates.ravel(),
+            model_name: predictions[succeeded].ravel(),
+        }
+    )
+    state = None
+    if states:
+        positions = sorted(states)
+        arrays = {
+            name: np.stack([states[i][name] for i in positions])
+            for name in states[positions[0]]
+        }
+        state = (ids[positions], arrays, None)
+    if quantiles:
+        std = np.full((succeeded.sum(), horizon), np.nan)
+        if state is not None:
+            std = probabilistic.ets_std(state[1], horizon, season_length)
+        values = probabilistic.normal_quantiles(
+            predictions[succeeded], std, quantiles
+        )
+        forecasts = probabilistic.add_quantiles(
+            forecasts, model_name, values, quantiles
+        )
+    report = pd.DataFrame(
+        rows, columns=["chunk_id", "n_series", "n_failed", "wall_time"]
+    ).sort_values("chunk_id", ignore_index=True)
+    report.attrs["failures"] = failures
+    report.attrs["run_id"] = None
+    if registry is not None:
+        report.attrs["run_id"] = _save_state(
+            registry, model_name, df, id_col, time_col, state, run_id
+        )
+    return forecasts, report
@@ -0,0 +1,252 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import quantile_column, series_hashes
+from src.models.model_run import COMMON_SECTIONS, MODEL_SECTIONS
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("select", "ensemble")
+
+
+class ModelTournament:
+    """Pick or weight the best candidate models of every series on a holdout.
+
+    Every candidate is backtested on the last periods of each series and scored
+    with one metric. The "select" strategy keeps the best model of a series and
+    "ensemble" weights its ``top_k`` best models by their inverse error.
+
+    Given a ``StageCache``, the scores are stored with the content hash of
+    every series under a key of the settings that affect them: the candidates,
+    metric, horizon, the configuration of the candidate models and the code
+    version. A series whose data and settings are unchanged since the cached
+    run reuses its weights and is left out of the tournament.
+    """
+
+    def __init__(
+        self,
+        models,
+        horizon,
+        metric=None,
+        strategy=None,
+        top_k=None,
+        n_folds=None,
+        n_jobs=None,
+        cache=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+    ):
+        """
+        Args:
+            models (list): Candidate models, in order of preference for series
+                that cannot be scored.
+            horizon (int): Periods of every holdout, usually the forecast
+                horizon.
+            metric (str, optional): Metric of ``src.helper.metrics`` ranking the
+                candidates, lower is better.
+            strategy (str, optional): "select" or "ensemble".
+            top_k (int, optional): Models blended per series by "ensemble".
+            n_folds (int, optional): Holdouts every candidate is scored on.
+            n_jobs (int, optional): Worker processes of the backtest.
+            cache (StageCache, optional): Store of the scores of earlier runs.
+                Every series is scored when not given.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+        """
+        run_config = config.FORECASTING_CONFIG
+        selection = run_config["selection"]
+        self.models = list(models)
+        self.metric = metric or selection["metric"]
+        self.horizon = horizon
+        self.strategy = strategy or selection["strategy"]
+        self.top_k = 1 if self.strategy == "select" else top_k or selection["top_k"]
+        self.n_folds = n_folds or selection["n_folds"]
+        self.n_jobs = n_jobs
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {self.strategy}")
+        self.cache = cache
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.weights = None
+
+    def _cache_key(self):
+        """Key of the scores of these settings in the stage cache."""
+        sections = ["backtest", *COMMON_SECTIONS]
+        for model_name in self.models:
+            sections.extend(MODEL_SECTIONS.get(model_name, ()))
+        return self.cache.key(
+            "tournament",
+            sections=sections,
+            params={
+                "models": self.models,
+                "metric": self.metric,
+                "horizon": self.horizon,
+                "strategy": self.strategy,
+                "top_k": self.top_k,
+                "n_folds": self.n_folds,
+            },
+        )
+
+    def _score(self, df):
+        """Mean holdout error of every candidate, one row per series."""
+        from src.models.backtest import backtest
+
+        scores = backtest(
+            df[[self.id_col, self.time_col, self.target_col]],
+            self.horizon,
+            models=self.models,
+            n_folds=self.n_folds,
+            metrics=[self.metric],
+            n_jobs=self.n_jobs,
+        )
+        ids = np.sort(df[self.id_col].unique())
+        if scores.empty:
+            return pd.DataFrame(np.nan, index=ids, columns=self.models)
+        # Signed metrics such as bias rank by their distance from zero
+        table = (
+            scores.assign(error=scores[self.metric].abs())
+            .groupby([self.id_col, "model"], observed=True)["error"]
+            .mean()
+            .unstack("model")
+        )
+        return table.reindex(index=ids, columns=self.models)
+
+    def _weigh(self, errors):
+        """Inverse-error weights of the ``top_k`` best models of every row."""
+        values = errors.to_numpy(dtype=np.float64)
+        scored = ~np.isnan(values)
+        ranks = errors.rank(axis=1, method="first").to_numpy()
+        keep = scored & (ranks <= self.top_k)
+        with np.errstate(divide="ignore"):
+            inverse = np.where(keep, 1.0 / values, 0.0)
+        # A perfect model takes all the weight, shared with other perfect ones
+        perfect = keep & (values == 0)
+        inverse = np.where(perfect.any(axis=1)[:, None], perfect, inverse)
+        # Series no model could be scored on fall back to the first candidate
+        unscored = ~keep.any(axis=1)
+        inverse[unscored, 0] = 1.0
+        weights = inverse / inverse.sum(axis=1, keepdims=True)
+        if unscored.any():
+            logger.warning(
+                f"{unscored.sum()} series too short to score, "
+                f"using {self.models[0]}"
+            )
+        return weights
+
+    def fit(self, df):
+        """Score the candidates on every series whose scores are not cached.
+
+        Args:
+            df (pd.DataFrame): Long-format training frame.
+
+        Returns:
+            pd.DataFrame: Columns ``[id_col, "model", "score", "weight"]`` with
+                one row per series and candidate, also kept as ``weights``.
+        """
+        hashes = series_hashes(df, self.id_col, self.time_col, self.target_col)
+        stored = cached = None
+        if self.cache is not None:
+            key = self._cache_key()
+            stored = self.cache.load(key)
+        if stored is not None:
+            current = hashes.rename("current").reset_index()
+            cached = stored.merge(current, on=self.id_col, how="inner")
+            cached = cached[cached["data_hash"] == cached["current"]]
+        n_cached = 0 if cached is None else cached[self.id_col].nunique()
+        stale_ids = hashes.index
+        if n_cached:
+            stale_ids = stale_ids[~stale_ids.isin(cached[self.id_col])]
+        logger.info(
+            f"Tournament of {len(self.models)} models: {len(stale_ids)} series "
+            f"to score, {n_cached} cached"
+        )
+
+        frames = [] if cached is None else [cached]
+        if len(stale_ids):
+            errors = self._score(df[df[self.id_col].isin(stale_ids)])
+            weights = self._weigh(errors)
+            n_series, n_models = weights.shape
+            scored = pd.DataFrame(
+                {
+                    self.id_col: np.repeat(errors.index.to_numpy(), n_models),
+                    "model": np.tile(self.models, n_series),
+                    "score": errors.to_numpy(dtype=np.float64).ravel(),
+                    "weight": weights.ravel(),
+                    "data_hash": np.repeat(
+                        hashes.loc[errors.index].to_numpy(), n_models
+                    ),
+                }
+            )
+            frames.append(scored)
+            if self.cache is not None:
+                # Keep the scores of series outside this panel, e.g. other buckets
+                if stored is not None:
+                    kept = stored[~stored[self.id_col].isin(scored[self.id_col])]
+                    scored = pd.concat([kept, scored], ignore_index=True)
+                self.cache.save(key, scored.reset_index(drop=True))
+
+        self.weights = pd.concat(frames, ignore_index=True)[
+            [self.id_col, "model", "score", "weight"]
+        ]
+        return self.weights
+
+    def combine(self, forecasts, weights=None, output_col="forecast"):
+        """Blend the candidates' forecasts with the per-series weights.
+
+        Weights of a model without a forecast are spread over the other models
+        of the series, and series without weights take the plain average.
+        Quantile columns are blended alike when every candidate has them.
+
+        Args:
+            forecasts (pd.DataFrame): One column per candidate, as returned by
+                ``model_run`` and merged on ``[id_col, time_col]``.
+            weights (pd.DataFrame, optional): Output of ``fit``. Defaults to
+                the weights of the last fit.
+            output_col (str): Column of the blended forecast.
+
+        Returns:
+            pd.DataFrame: ``forecasts`` with the blended column, plus one per
+                quantile shared by all candidates.
+        """
+        weights = self.weights if weights is None else weights
+        models = [m for m in self.models if m in forecasts]
+        if not models:
+            raise ValueError(f"No forecasts of {self.models} to combine")
+        row_weights = np.zeros((len(forecasts), len(models)))
+        if weights is not None:
+            table = weights.pivot_table(
+                index=self.id_col, columns="model", values="weight", observed=True
+            ).reindex(columns=models)
+            row_weights = np.nan_to_num(
+                table.reindex(forecasts[self.id_col].to_numpy()).to_numpy()
+            )
+
+        suffixes = {"": output_col}
+        quantile_cols = {c for c in forecasts if c.startswith(f"{models[0]}_q")}
+        for column in sorted(quantile_cols):
+            q = float(column[len(f"{models[0]}_q") :])
+            if all(quantile_column(m, q) in forecasts for m in models):
+                suffixes[column[len(models[0]) :]] = quantile_column(output_col, q)
+
+        blended = {}
+        for suffix, name in suffixes.items():
+            values = forecasts[[m + suffix for m in models]].to_numpy(np.float64)
+            available = ~np.isnan(values)
+            w = np.where(available, row_weights, 0.0)
+            total = w.sum(axis=1)
+            # No usable weight: average whatever forecasts exist
+            w = np.where((total > 0)[:, None], w, available)
+            total = w.sum(axis=1)
+            blended[name] = np.divide(
+                (w * np.nan_to_num(values)).sum(axis=1),
+                total,
+                out=np.full(len(total), np.nan),
+                where=total > 0,
+            )
+        return forecasts.assign(**blended)
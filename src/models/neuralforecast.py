@@ -1,14 +1,305 @@
-from neuralforecast.models import NBEATSx, NHITS, LSTM, Transformer
-from neuralforecast import NeuralForecast
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+from torch import nn
+
+from src import config
+from src.helper.utils import future_dates, get_freq, split_series
+
+
+class _Block(nn.Module):
+    """N-BEATS block: an MLP emitting a backcast of its input and a forecast."""
+
+    def __init__(self, input_size, horizon, hidden_size, n_layers):
+        super().__init__()
+        layers = []
+        size = input_size
+        for _ in range(n_layers):
+            layers += [nn.Linear(size, hidden_size), nn.ReLU()]
+            size = hidden_size
+        self.mlp = nn.Sequential(*layers)
+        self.backcast = nn.Linear(hidden_size, input_size)
+        self.forecast = nn.Linear(hidden_size, horizon)
+
+    def forward(self, x):
+        hidden = self.mlp(x)
+        return self.backcast(hidden), self.forecast(hidden)
+
+
+class _NBeats(nn.Module):
+    """Stack of generic N-BEATS blocks with residual backcasts."""
+
+    def __init__(self, input_size, horizon, hidden_size, n_blocks, n_layers):
+        super().__init__()
+        self.blocks = nn.ModuleList(
+            _Block(input_size, horizon, hidden_size, n_layers) for _ in range(n_blocks)
+        )
+
+    def forward(self, x):
+        forecast = 0
+        for block in self.blocks:
+            backcast, block_forecast = block(x)
+            x = x - backcast
+            forecast = forecast + block_forecast
+        return forecast
+
+
+def _scale(inputs):
+    """Fill missing inputs with the window mean and scale by their mean magnitude.
+
+    Returns:
+        tuple: (scaled inputs, scale of every window)
+    """
+    with np.errstate(invalid="ignore"):
+        fill = np.nanmean(inputs, axis=1, keepdims=True)
+    inputs = np.where(np.isnan(inputs), np.nan_to_num(fill), inputs)
+    scale = np.maximum(np.abs(inputs).mean(axis=1, keepdims=True), 1e-3)
+    return inputs / scale, scale
+
+
+def _windows(values, ends, input_size, horizon):
+    """Gather the windows of ``values`` whose input ends right before ``ends``.
+
+    Returns:
+        tuple: Scaled inputs and targets, and the mask of observed targets.
+    """
+    positions = ends[:, None] + np.arange(-input_size, horizon)[None, :]
+    window = values[positions]
+    inputs, scale = _scale(window[:, :input_size])
+    targets = window[:, input_size:]
+    observed = ~np.isnan(targets)
+    return (
+        torch.from_numpy(inputs.astype(np.float32)),
+        torch.from_numpy(
+            (np.where(observed, targets, 0.0) / scale).astype(np.float32)
+        ),
+        torch.from_numpy(observed.astype(np.float32)),
+    )
 
 
 class NeuralTimeSeries:
+    """One global N-BEATS model trained on every series of a long-format panel.
+
+    All series live in a single contiguous float32 buffer; training batches are
+    windows gathered from it by offset, so no per-series frame is ever built.
+    Windows are scaled by the mean absolute value of their input, which lets
+    one network serve series of very different volumes. Inference forecasts
+    all series in a few large batches, recursively when the horizon is longer
+    than the network's output.
+    """
+
+    alias = "neural"
+
+    def __init__(
+        self,
+        input_size=None,
+        horizon=None,
+        n_jobs=None,
+        id_col=None,
+        time_col="ds",
+        target_col=None,
+        **params,
+    ):
+        """
+        Args:
+            input_size (int, optional): Periods the network looks back.
+            horizon (int, optional): Periods the network forecasts at once.
+            n_jobs (int, optional): Intra-op threads used by torch.
+            id_col (str, optional): Series column. Defaults to ``partition_dim``.
+            time_col (str, optional): Timestamp column. Defaults to "ds".
+            target_col (str, optional): Target column. Defaults to ``target``.
+            **params: Overrides of the configured ``neural`` settings.
+        """
+        run_config = config.FORECASTING_CONFIG
+        self.params = {**run_config["neural"], **params}
+        self.logger = logging.getLogger(__name__)
+        self.input_size = input_size or self.params["input_size"]
+        self.horizon = horizon or self.params["horizon"]
+        self.freq = get_freq(run_config["interval"])
+        self.id_col = id_col or run_config["partition_dim"]
+        self.time_col = time_col
+        self.target_col = target_col or run_config["target"]
+        self.model = None
+        self.throughput = {}
+        self._set_threads(n_jobs)
+
+    def _set_threads(self, n_jobs):
+        intra = n_jobs if n_jobs and n_jobs > 0 else self.params["intra_op_threads"]
+        if intra:
+            torch.set_num_threads(intra)
+        inter = self.params["inter_op_threads"]
+        if inter:
+            try:
+                torch.set_num_interop_threads(inter)
+            except RuntimeError:
+                # Only settable before torch runs its first parallel work
+                pass
+
+    def _buffer(self, df):
+        """Concatenate every series into one buffer, padded by the input size."""
+        ids, starts, ends, values, last_ds = split_series(
+            df, self.id_col, self.time_col, self.target_col
+        )
+        # Series are separated by NaN padding, so windows reaching past either
+        # end of a series read missing values rather than a neighbouring series
+        pad = max(self.input_size, self.horizon)
+        lengths = ends - starts
+        offsets = pad * np.arange(1, len(ids) + 1) + starts
+        buffer = np.full(len(values) + pad * len(ids) + self.horizon, np.nan)
+        positions = np.repeat(offsets - starts, lengths) + np.arange(len(values))
+        buffer[positions] = values
+        return ids, offsets, offsets + lengths, buffer.astype(np.float32), last_ds
+
+    def train(self, train, test=None, eda=None):
+        """Fit the global network on windows sampled from every series.
+
+        Args:
+            train (pd.DataFrame): Long-format frame with id, timestamp and target.
+            test (pd.DataFrame, optional): Rows following ``train``, used for
+                early stopping. Defaults to the last ``horizon`` periods of every
+                series, which are then excluded from the training windows.
+            eda (dict, optional): Unused, kept for interface compatibility.
+
+        Returns:
+            NeuralTimeSeries: The fitted model.
+        """
+        params = self.params
+        torch.manual_seed(config.SEED)
+        rng = np.random.default_rng(config.SEED)
+        columns = [self.id_col, self.time_col, self.target_col]
+        ids, starts, ends, buffer, last_ds = self._buffer(train[columns])
+        self.ids, self.starts, self.ends = ids, starts, ends
+        self.buffer, self.last_ds = buffer, last_ds
+
+        if test is not None and len(test):
+            full = pd.concat([train[columns], test[columns]], ignore_index=True)
+            full_ids, full_starts, _, valid_buffer, _ = self._buffer(full)
+            rows = pd.Index(full_ids).get_indexer(ids)
+            valid_ends = full_starts[rows] + (ends - starts)
+            train_ends = ends
+        else:
+            valid_buffer = buffer
+            valid_ends = (ends - self.horizon)[ends - starts > self.horizon]
+            train_ends = np.maximum(ends - self.horizon, starts)
+
+        # Every training window has at least one input and all of its targets
+        # inside the training part of its series
+        counts = np.maximum(train_ends - starts - self.horizon, 0)
+        candidates = np.repeat(starts + 1, counts) + (
+            np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        )
+        if not len(candidates):
+            raise ValueError(f"No series is longer than the horizon {self.horizon}")
+        valid = _windows(valid_buffer, valid_ends, self.input_size, self.horizon)
+
+        self.model = _NBeats(
+            self.input_size,
+            self.horizon,
+            params["hidden_size"],
+            params["n_blocks"],
+            params["n_layers"],
+        )
+        optimizer = torch.optim.Adam(
+            self.model.parameters(), lr=params["learning_rate"]
+        )
+        best_loss, best_state, stale = np.inf, None, 0
+        samples, start = 0, time.perf_counter()
+        for step in range(1, params["max_steps"] + 1):
+            batch = rng.choice(candidates, params["batch_size"])
+            x, y, mask = _windows(buffer, batch, self.input_size, self.horizon)
+            self.model.train()
+            optimizer.zero_grad()
+            error = torch.abs(self.model(x) - y) * mask
+            loss = error.sum() / mask.sum().clamp(min=1)
+            loss.backward()
+            optimizer.step()
+            samples += len(batch)
+
+            if step % params["val_check_steps"] == 0:
+                valid_loss = self._loss(*valid)
+                if valid_loss < best_loss - 1e-6:
+                    best_loss, stale = valid_loss, 0
+                    best_state = {
+                        name: value.detach().clone()
+                        for name, value in self.model.state_dict().items()
+                    }
+                else:
+                    stale += 1
+                    if stale >= params["patience"]:
+                        self.logger.info(f"Early stopping after {step} steps")
+                        break
+        elapsed = time.perf_counter() - start
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+
+        self.throughput["train_samples_per_sec"] = samples / elapsed
+        self.throughput["train_steps"] = step
+        self.throughput["valid_loss"] = float(best_loss)
+        self.logger.info(
+            f"Trained on {samples} windows of {len(ids)} series at "
+            f"{self.throughput['train_samples_per_sec']:.0f} samples/s"
+        )
+        return self
+
+    @torch.no_grad()
+    def _loss(self, x, y, mask):
+        self.model.eval()
+        return float(
+            (torch.abs(self.model(x) - y) * mask).sum() / mask.sum().clamp(min=1)
+        )
+
+    @torch.no_grad()
+    def predict_windows(self, inputs):
+        """Forecast ``horizon`` periods after every row of raw input windows.
+
+        Args:
+            inputs (np.ndarray): Last ``input_size`` values of every series.
+
+        Returns:
+            np.ndarray: Array of shape (n_series, horizon).
+        """
+        self.model.eval()
+        batch_size = self.params["inference_batch_size"]
+        out = np.empty((len(inputs), self.horizon))
+        for first in range(0, len(inputs), batch_size):
+            x, scale = _scale(inputs[first : first + batch_size])
+            prediction = self.model(torch.from_numpy(x.astype(np.float32)))
+            out[first : first + batch_size] = prediction.numpy() * scale
+        return out
+
+    def forecast(self, horizon):
+        """Forecast every series in batches, recursively beyond ``horizon``.
+
+        Args:
+            horizon (int): Number of periods to forecast.
 
-    def __init__(self):
-        pass
+        Returns:
+            pd.DataFrame: Columns ``[id_col, time_col, "neural"]``.
+        """
+        if self.model is None:
+            raise ValueError("Model must be trained before forecasting. Call train().")
 
-    def train(self):
-        pass
+        start = time.perf_counter()
+        positions = self.ends[:, None] + np.arange(-self.input_size, 0)[None, :]
+        history = self.buffer[positions].astype(np.float64)
+        predictions = np.empty((len(self.ids), 0))
+        while predictions.shape[1] < horizon:
+            step = self.predict_windows(history[:, -self.input_size :])
+            predictions = np.hstack([predictions, step])
+            history = np.hstack([history, step])
+        predictions = predictions[:, :horizon]
+        self.throughput["forecast_series_per_sec"] = len(self.ids) / (
+            time.perf_counter() - start
+        )
 
-    def forecast(self):
-        pass
+        dates = future_dates(self.last_ds, horizon, self.freq)
+        return pd.DataFrame(
+            {
+                self.id_col: np.repeat(self.ids, horizon),
+                self.time_col: dates.ravel(),
+                self.alias: predictions.ravel(),
+            }
+        )
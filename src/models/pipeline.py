@@ -1,13 +1,213 @@
 from src.models.feature_engineering import FeatureEngineering
-from src.models.eda import TimeSeriesEDA
-from src.models.model_run import model_run
-from src.models.arima import ARIMA
-from src.models.lightgbm import LightGBM
+from src.models.incremental import UPDATABLE_MODELS, model_update
+from src.models.model_run import (
+    COMMON_SECTIONS,
+    MODEL_SECTIONS,
+    MODELS,
+    identify_timeseries,
+    model_run,
+)
+from src.models.model_selection import ModelTournament
 
 from src import config
+from src.helper.cache import StageCache, fingerprint
+
+import logging
 
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+def _stage(cache, stage, fn, *args, inputs=(), sections=(), params=None, **kwargs):
+    """Run a pipeline stage through ``cache``, or directly when caching is off."""
+    if cache is None:
+        return fn(*args, **kwargs)
+    return cache.run(
+        stage, fn, *args, inputs=inputs, sections=sections, params=params, **kwargs
+    )
+
+
+def forecast_run(
+    data,
+    horizon,
+    models=None,
+    n_jobs=None,
+    chunk_size=None,
+    quantiles=None,
+    select=None,
+    cache=None,
+    registry=None,
+    update=False,
+):
+    """Forecast every series of a long-format panel with the configured models.
+
+    Series are first routed to the "general", "intermittent" or "new_product"
+    bucket and forecast with that bucket's models. Passing ``models`` skips the
+    routing and runs those models on every series. With ``select``, a
+    ``ModelTournament`` scores each bucket's models on a holdout of every series
+    and blends them into a "forecast" column.
+
+    The routing, the LightGBM features and every model's forecasts are stages
+    of a ``StageCache``: a rerun only recomputes the stages whose data,
+    configuration sections or code changed, and resumes a crashed run after its
+    last completed stage.
+
+    Args:
+        data (pd.DataFrame): Long-format frame with ``partition_dim``, "ds" and
+            ``target`` columns.
+        horizon (int): Number of periods to forecast.
+        models (list, optional): Models to run on every series.
+        n_jobs (int, optional): Worker processes for the per-series models.
+        chunk_size (int, optional): Number of series per task.
+        quantiles (list, optional): Quantile levels forecast with ``models``.
+            Routed buckets forecast the configured quantiles when their
+            "inference" includes "quantile".
+        select (bool, optional): Blend the models of every bucket by their
+            holdout scores. Defaults to the ``selection`` configuration.
+        cache (StageCache or bool, optional): Cache of the stage outputs, False
+            to recompute everything. Defaults to a ``StageCache`` under
+            ``OUTPUT_DIR`` when the ``cache`` configuration is enabled.
+        registry (ModelRegistry, optional): Registry the fitted states are saved
+            to, and warm starts read from. The cold-start index is kept there
+            too and only extended by the series matured since its last run.
+            Models are then always refitted, as saving is a side effect a
+            cached stage would skip.
+        update (bool): Roll the stored states of the ``UPDATABLE_MODELS`` forward
+            over the observations that arrived since their last run instead of
+            refitting them, until their ``RefitPolicy`` asks for a refit. Needs
+            ``registry``, and buckets forecasting quantiles are always refitted.
+
+    Returns:
+        tuple: (forecasts, reports, routing) where ``forecasts`` holds one column
+            per model, ``reports`` maps each (bucket, model) to its per-chunk
+            timing report, plus its tournament weights under
+            ``(bucket, "tournament")``, and ``routing`` is the table from
+            ``identify_timeseries`` (None when ``models`` is given).
+    """
+    id_col = config.FORECASTING_CONFIG["partition_dim"]
+    selection = config.FORECASTING_CONFIG["selection"]
+    if select is None:
+        select = selection["enabled"]
+    if cache is None:
+        cache = config.FORECASTING_CONFIG["cache"]["enabled"]
+    if cache is True:
+        cache = StageCache()
+    cache = cache or None
+    if update and registry is None:
+        raise ValueError("Incremental updates need the registry of the stored states")
+
+    if models is not None:
+        routing = None
+        buckets = {"all": (data, models, quantiles, selection["metric"])}
+    else:
+        routing = _stage(
+            cache,
+            "routing",
+            identify_timeseries,
+            data,
+            inputs=[data],
+            sections=("eda", "models", *COMMON_SECTIONS),
+        )
+        buckets = {}
+        for bucket, bucket_config in config.FORECASTING_CONFIG["models"].items():
+            ids = routing.loc[routing["bucket"] == bucket, id_col]
+            if ids.empty:
+                continue
+            if not bucket_config["models"]:
+                logger.warning(f"No models configured for {len(ids)} {bucket} series")
+                continue
+            bucket_quantiles = None
+            if "quantile" in bucket_config.get("inference", ["point"]):
+                bucket_quantiles = config.FORECASTING_CONFIG["probabilistic"][
+                    "quantiles"
+                ]
+            buckets[bucket] = (
+                data[data[id_col].isin(ids)],
+                bucket_config["models"],
+                bucket_quantiles,
+                bucket_config.get("metric", [selection["metric"]])[0],
+            )
+
+    bucket_forecasts = []
+    reports = {}
+    for bucket, (bucket_data, bucket_models, bucket_quantiles, metric) in (
+        buckets.items()
+    ):
+        # Cold-start models borrow launch curves from the other series
+        reference = data[~data[id_col].isin(bucket_data[id_col].unique())]
+        data_hash = None if cache is None else fingerprint(bucket_data)
+
+        def _run_model(model_name):
+            features = None
+            if model_name == "lightgbm" and cache is not None:
+                # Shared by every LightGBM configuration of the same data
+                features = cache.run(
+                    "features",
+                    FeatureEngineering().transform,
+                    bucket_data,
+                    inputs=[data_hash],
+                    sections=("feature_engineering", *COMMON_SECTIONS),
+                )
+            if update and model_name in UPDATABLE_MODELS and not bucket_quantiles:
+                return model_update(
+                    bucket_data,
+                    model_name,
+                    horizon,
+                    registry,
+                    n_jobs=n_jobs,
+                    chunk_size=chunk_size,
+                )
+            return model_run(
+                bucket_data,
+                model_name,
+                horizon,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                reference=reference if model_name == "cold_start" else None,
+                quantiles=bucket_quantiles,
+                features=features,
+                registry=registry,
+            )
+
+        forecasts = None
+        ran = []
+        for model_name in bucket_models:
+            if model_name not in MODELS:
+                logger.warning(f"Skipping {model_name}: no implementation")
+                continue
+            ran.append(model_name)
+            inputs = [data_hash]
+            if model_name == "cold_start":
+                inputs.append(reference)
+            sections = [*COMMON_SECTIONS, *MODEL_SECTIONS.get(model_name, ())]
+            if bucket_quantiles:
+                sections.append("probabilistic")
+            model_forecasts, reports[(bucket, model_name)] = _stage(
+                cache if registry is None else None,
+                model_name,
+                _run_model,
+                model_name,
+                inputs=inputs,
+                sections=sections,
+                params={"horizon": horizon, "quantiles": bucket_quantiles},
+            )
+            forecasts = (
+                model_forecasts
+                if forecasts is None
+                else forecasts.merge(model_forecasts, on=[id_col, "ds"], how="outer")
+            )
+        if forecasts is None:
+            continue
+        if select:
+            tournament = ModelTournament(
+                ran, horizon, metric=metric, n_jobs=n_jobs, cache=cache
+            )
+            # A single candidate needs no tournament, its forecast is used as is
+            if len(ran) > 1:
+                reports[(bucket, "tournament")] = tournament.fit(bucket_data)
+            forecasts = tournament.combine(forecasts)
+        bucket_forecasts.append(forecasts)
 
-def forecast_run():
-    pass
+    if not bucket_forecasts:
+        return None, reports, routing
+    return pd.concat(bucket_forecasts, ignore_index=True), reports, routing
@@ -0,0 +1,299 @@
+import logging
+
+import numpy as np
+from scipy import stats
+
+from src import config
+from src.helper.utils import quantile_column, split_series, stack_series
+
+logger = logging.getLogger(__name__)
+
+
+def add_quantiles(forecasts, model_name, values, quantiles):
+    """Attach quantile forecasts to a frame of point forecasts.
+
+    Args:
+        forecasts (pd.DataFrame): Point forecasts, ``horizon`` rows per series in
+            the order of ``values``.
+        model_name (str): Model the quantiles belong to.
+        values (np.ndarray): Quantiles of shape (n_series, horizon, n_quantiles).
+        quantiles (list): Quantile levels of the last axis of ``values``.
+
+    Returns:
+        pd.DataFrame: ``forecasts`` with one column per quantile.
+    """
+    values = values.reshape(-1, len(quantiles))
+    columns = {
+        quantile_column(model_name, q): values[:, i] for i, q in enumerate(quantiles)
+    }
+    return forecasts.assign(**columns)
+
+
+def normal_quantiles(point, std, quantiles):
+    """Quantiles of Gaussian forecast distributions.
+
+    Args:
+        point (np.ndarray): Mean forecasts of shape (n_series, horizon).
+        std (np.ndarray): Standard deviations broadcastable to ``point``.
+        quantiles (list): Quantile levels.
+
+    Returns:
+        np.ndarray: Array of shape (n_series, horizon, n_quantiles).
+    """
+    z = stats.norm.ppf(np.asarray(quantiles, dtype=np.float64))
+    return point[..., None] + np.asarray(std)[..., None] * z
+
+
+def _residual_std(residuals, n_params=0):
+    """Root mean squared residual of every row, ignoring NaN."""
+    valid = ~np.isnan(residuals)
+    n = valid.sum(axis=1) - n_params
+    sum_sq = np.where(valid, residuals, 0.0) ** 2
+    return np.sqrt(
+        np.divide(sum_sq.sum(axis=1), n, out=np.full(len(n), np.nan), where=n > 0)
+    )
+
+
+def baseline_std(method, panel, lengths, horizon, seasonality=1):
+    """Forecast standard deviations of the baseline methods.
+
+    The residual standard deviation of the one-step in-sample forecasts is
+    widened with the horizon by the usual closed forms: sqrt(h) for the naive
+    method, sqrt(k + 1) with k the completed seasons for the seasonal naive,
+    sqrt(1 + 1/T) for the mean and sqrt(h (1 + h/T)) for the drift.
+
+    Args:
+        method (str): One of ``BaselineForecaster.METHODS``.
+        panel (np.ndarray): Histories of shape (n_series, T), NaN padded.
+        lengths (np.ndarray): Valid leading values of every row.
+        horizon (int): Number of periods forecast.
+        seasonality (int): Seasonal period of the seasonal naive method.
+
+    Returns:
+        np.ndarray: Standard deviations of shape (n_series, horizon).
+    """
+    panel = np.where(
+        np.arange(panel.shape[1])[None, :] < np.asarray(lengths)[:, None], panel, np.nan
+    )
+    n_obs = (~np.isnan(panel)).sum(axis=1)
+    h = np.arange(1, horizon + 1)[None, :]
+    if method == "naive":
+        sigma = _residual_std(np.diff(panel, axis=1))
+        return sigma[:, None] * np.sqrt(h)
+    if method == "seasonal_naive":
+        sigma = _residual_std(panel[:, seasonality:] - panel[:, :-seasonality])
+        return sigma[:, None] * np.sqrt((h - 1) // seasonality + 1)
+    if method == "mean":
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(panel, axis=1, keepdims=True)
+        sigma = _residual_std(panel - mean, n_params=1)
+        return np.repeat(
+            (sigma * np.sqrt(1 + 1 / np.maximum(n_obs, 1)))[:, None], horizon, axis=1
+        )
+    if method == "drift":
+        diff = np.diff(panel, axis=1)
+        with np.errstate(invalid="ignore"):
+            drift = np.nanmean(diff, axis=1, keepdims=True)
+        sigma = _residual_std(diff - drift, n_params=1)
+        T = np.maximum(n_obs, 1)[:, None]
+        return sigma[:, None] * np.sqrt(h * (1 + h / T))
+    raise ValueError(f"Unknown method: {method}")
+
+
+def ets_std(states, horizon, season_length):
+    """Forecast standard deviations of additive Holt-Winters models.
+
+    Uses the closed form of the additive error models, where the variance of
+    step h is sigma2 * (1 + sum over j < h of c_j^2) with
+    c_j = alpha * (1 + j * beta) + gamma when j is a multiple of the season.
+
+    Args:
+        states (dict): Columnar states stacked from
+            ``ExponentialSmoothingModels.state``, with "sigma2".
+        horizon (int): Number of periods forecast.
+        season_length (int): Seasonal period.
+
+    Returns:
+        np.ndarray: Standard deviations of shape (n_series, horizon).
+    """
+    from src.models.exponential_smoothing import MODEL_TYPES
+
+    model_type = np.asarray(states["model_type"])
+    alpha = np.asarray(states["smoothing_level"], dtype=np.float64)[:, None]
+    beta = np.where(
+        model_type >= MODEL_TYPES.index("holt"), states["smoothing_trend"], 0.0
+    )[:, None]
+    gamma = np.where(
+        model_type == MODEL_TYPES.index("exp_smoothing"),
+        states["smoothing_seasonal"],
+        0.0,
+    )[:, None]
+    j = np.arange(1, horizon)[None, :]
+    c = alpha * (1 + j * beta) + gamma * (j % season_length == 0)
+    variance = np.concatenate(
+        [np.ones((len(alpha), 1)), 1 + np.cumsum(c**2, axis=1)], axis=1
+    )
+    return np.sqrt(np.asarray(states["sigma2"], dtype=np.float64)[:, None] * variance)
+
+
+def sample_paths(
+    panel, lengths, probability, horizon, n_paths=None, max_elements=None, seed=None
+):
+    """Bootstrap demand paths of intermittent series, chunk by chunk.
+
+    Every period of a path has a demand with the series' forecast probability,
+    and demand sizes are drawn from the series' own non-zero history. Series
+    are sampled in chunks of at most ``max_elements`` path values, so memory
+    stays bounded however large the panel is.
+
+    Args:
+        panel (np.ndarray): Histories of shape (n_series, T), NaN padded.
+        lengths (np.ndarray): Valid leading values of every row.
+        probability (np.ndarray): Demand probability per period of every series.
+        horizon (int): Number of periods forecast.
+        n_paths (int, optional): Paths per series.
+        max_elements (int, optional): Path values held in memory at once.
+        seed (int, optional): Random seed. Defaults to ``SEED``.
+
+    Yields:
+        tuple: (rows, paths) with the slice of series and their paths of shape
+            (n_rows, n_paths, horizon).
+    """
+    prob_config = config.FORECASTING_CONFIG["probabilistic"]
+    n_paths = n_paths or prob_config["n_paths"]
+    max_elements = max_elements or prob_config["max_path_elements"]
+    rng = np.random.default_rng(config.SEED if seed is None else seed)
+
+    valid = np.arange(panel.shape[1])[None, :] < np.asarray(lengths)[:, None]
+    demand = valid & (np.nan_to_num(panel) > 0)
+    # Non-zero sizes of every series, contiguous in one flat array
+    sizes = panel[demand] if demand.any() else np.zeros(1)
+    counts = demand.sum(axis=1)
+    offsets = np.cumsum(counts) - counts
+    probability = np.where(counts > 0, np.nan_to_num(probability), 0.0)
+
+    chunk = max(max_elements // (n_paths * horizon), 1)
+    for first in range(0, len(panel), chunk):
+        rows = slice(first, first + chunk)
+        shape = (len(counts[rows]), n_paths, horizon)
+        occurs = rng.random(shape) < probability[rows, None, None]
+        draws = offsets[rows, None, None] + (
+            rng.random(shape) * counts[rows, None, None]
+        ).astype(np.int64)
+        paths = np.where(occurs, sizes[np.minimum(draws, len(sizes) - 1)], 0.0)
+        yield rows, paths
+
+
+def bootstrap_quantiles(panel, lengths, probability, horizon, quantiles, **kwargs):
+    """Quantiles of bootstrapped intermittent demand paths.
+
+    Args:
+        panel (np.ndarray): Histories of shape (n_series, T), NaN padded.
+        lengths (np.ndarray): Valid leading values of every row.
+        probability (np.ndarray): Demand probability per period of every series.
+        horizon (int): Number of periods forecast.
+        quantiles (list): Quantile levels.
+        **kwargs: Passed to ``sample_paths``.
+
+    Returns:
+        np.ndarray: Array of shape (n_series, horizon, n_quantiles).
+    """
+    out = np.empty((len(panel), horizon, len(quantiles)))
+    for rows, paths in sample_paths(panel, lengths, probability, horizon, **kwargs):
+        out[rows] = np.moveaxis(np.quantile(paths, quantiles, axis=1), 0, -1)
+    return out
+
+
+def demand_probability(model):
+    """Per-period demand probability of a fitted ``IntermittentForecaster``."""
+    if model.method == "tsb":
+        return model.probability_
+    if model.method == "adida":
+        valid = model._mask
+        n_demand = (valid & (np.nan_to_num(model.y_train) > 0)).sum(axis=1)
+        return n_demand / np.maximum(valid.sum(axis=1), 1)
+    return np.divide(
+        1.0,
+        model.interval_,
+        out=np.zeros(len(model.interval_)),
+        where=model.interval_ > 0,
+    )
+
+
+def conformal_quantiles(
+    df,
+    forecasts,
+    model_name,
+    horizon,
+    quantiles,
+    id_col,
+    time_col,
+    target_col,
+    **run_kwargs,
+):
+    """Split-conformal quantiles from the errors of a holdout forecast.
+
+    The model is refitted without the last ``horizon`` periods of every series
+    and forecasts them. The holdout errors, divided by each series' mean
+    absolute value so series of any volume can be pooled, give empirical
+    quantiles per horizon step. They are scaled back per series and added to
+    the point forecasts, which works for any model at the cost of one refit.
+
+    Args:
+        df (pd.DataFrame): Training panel the point forecasts were fitted on.
+        forecasts (pd.DataFrame): Point forecasts with columns
+            ``[id_col, time_col, model_name]``.
+        model_name (str): Model to calibrate.
+        horizon (int): Number of periods forecast.
+        quantiles (list): Quantile levels.
+        id_col (str): Series column.
+        time_col (str): Timestamp column.
+        target_col (str): Target column.
+        **run_kwargs: Passed to ``model_run`` for the holdout refit.
+
+    Returns:
+        np.ndarray: Array of shape (n_series, horizon, n_quantiles), in the
+            order of the series of ``forecasts``.
+    """
+    from src.models.model_run import model_run
+
+    position = df.groupby(id_col, observed=True).cumcount(ascending=False)
+    holdout = df[position < horizon]
+    calibration, _ = model_run(
+        df[position >= horizon],
+        model_name,
+        horizon,
+        id_col=id_col,
+        time_col=time_col,
+        target_col=target_col,
+        **run_kwargs,
+    )
+    scored = holdout[[id_col, time_col, target_col]].merge(
+        calibration, on=[id_col, time_col], how="inner"
+    )
+    scale = df.groupby(id_col, observed=True)[target_col].apply(
+        lambda y: np.nanmean(np.abs(y))
+    )
+    scale = scale.where(scale > 0, 1.0)
+
+    scored["step"] = scored.groupby(id_col, observed=True).cumcount()
+    errors = (scored[target_col] - scored[model_name]) / scored[id_col].map(
+        scale
+    ).to_numpy(dtype=np.float64)
+    table = np.full((horizon, len(quantiles)), np.nan)
+    if len(scored):
+        by_step = errors.groupby(scored["step"]).quantile(quantiles).unstack()
+        table[by_step.index.to_numpy()] = by_step.to_numpy()
+    # Steps without calibration errors borrow the widest step calibrated
+    observed = ~np.isnan(table).all(axis=1)
+    if not observed.any():
+        logger.warning(f"No holdout to calibrate {model_name}, quantiles are points")
+        table[:] = 0.0
+    else:
+        table[~observed] = table[np.flatnonzero(observed)[-1]]
+    logger.info(f"Calibrated {model_name} quantiles on {len(scored)} holdout points")
+
+    ids, starts, ends, values, _ = split_series(forecasts, id_col, time_col, model_name)
+    point = stack_series(starts, ends, values)[0][:, :horizon]
+    series_scale = scale.reindex(ids).fillna(1.0).to_numpy(dtype=np.float64)
+    return point[..., None] + series_scale[:, None, None] * table[None, :, :]
@@ -0,0 +1,213 @@
+import json
+import logging
+import pickle
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.helper.utils import config_hash
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+class Artifact:
+    """Fitted state of one model run, read lazily from the registry.
+
+    Arrays are memory-mapped and objects are unpickled one series at a time,
+    so selecting a few series never reads the state of the whole fleet.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (Path): Directory of the run.
+        """
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        self._ids = None
+        self._mapped = {}
+
+    def _map(self, name):
+        """Memory-map a stored array once and reuse the mapping."""
+        if name not in self._mapped:
+            self._mapped[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._mapped[name]
+
+    @property
+    def ids(self):
+        """Series IDs of the run, in storage order."""
+        if self._ids is None:
+            self._ids = pd.Index(np.load(self.path / "ids.npy", allow_pickle=False))
+        return self._ids
+
+    def positions(self, series=None):
+        """Storage positions of ``series``, all series when None.
+
+        Raises:
+            KeyError: If a series is not part of the run.
+        """
+        if series is None:
+            return np.arange(len(self.ids))
+        positions = self.ids.get_indexer(pd.Index(series).astype(str))
+        if (positions < 0).any():
+            missing = np.asarray(series)[positions < 0]
+            raise KeyError(f"Series not in run {self.manifest['run_id']}: {missing}")
+        return positions
+
+    def arrays(self, series=None):
+        """Columnar state of the selected series.
+
+        Args:
+            series (list, optional): Series IDs. Defaults to every series.
+
+        Returns:
+            dict: Array of each state field, first axis aligned with ``series``.
+        """
+        positions = self.positions(series)
+        return {
+            name: np.asarray(self._map(name)[positions])
+            for name in self.manifest["arrays"]
+        }
+
+    def objects(self, series=None):
+        """Per-series objects of the selected series, unpickled on demand.
+
+        Args:
+            series (list, optional): Series IDs. Defaults to every series.
+
+        Returns:
+            list: One object per series, in the order of ``series``.
+        """
+        if not self.manifest["objects"]:
+            return None
+        offsets = self._map("offsets")
+        if "objects" not in self._mapped:
+            self._mapped["objects"] = np.memmap(
+                self.path / "objects.bin", dtype=np.uint8, mode="r"
+            )
+        blob = self._mapped["objects"]
+        return [
+            pickle.loads(blob[offsets[i] : offsets[i + 1]].tobytes())
+            for i in self.positions(series)
+        ]
+
+
+class ModelRegistry:
+    """Versioned store of fitted model state under ``MODEL_DIR``.
+
+    Every run is a directory ``<model_name>/<run_id>`` holding one ``.npy`` file
+    per state field with one row per series, an optional blob of pickled
+    per-series objects indexed by byte offsets, and a manifest with the run ID
+    and the hash of the configuration the run was fitted with.
+    """
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root (str or Path, optional): Registry directory. Defaults to MODEL_DIR.
+        """
+        self.root = Path(root or config.MODEL_DIR)
+
+    def save(
+        self, model_name, ids, arrays=None, objects=None, run_id=None, metadata=None
+    ):
+        """Store the fitted state of a model for a set of series.
+
+        Args:
+            model_name (str): Name of the model.
+            ids (array-like): Series IDs, one per row of the state.
+            arrays (dict, optional): Numeric state fields, each an array whose
+                first axis is aligned with ``ids``.
+            objects (list, optional): Per-series picklable objects for state that
+                is not columnar.
+            run_id (str, optional): Run identifier. Defaults to a new timestamped ID.
+            metadata (dict, optional): Extra JSON-serializable information.
+
+        Returns:
+            str: The run ID.
+        """
+        ids = np.asarray(ids).astype(str)
+        arrays = arrays or {}
+        for name, values in arrays.items():
+            if len(values) != len(ids):
+                raise ValueError(f"{name} has {len(values)} rows for {len(ids)} series")
+        if objects is not None and len(objects) != len(ids):
+            raise ValueError(f"Got {len(objects)} objects for {len(ids)} series")
+
+        run_id = run_id or (
+            f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        )
+        path = self.root / model_name / run_id
+        staging = path.with_name(f".{run_id}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        np.save(staging / "ids.npy", ids, allow_pickle=False)
+        for name, values in arrays.items():
+            np.save(staging / f"{name}.npy", np.asarray(values), allow_pickle=False)
+        if objects is not None:
+            offsets = np.zeros(len(objects) + 1, dtype=np.int64)
+            with open(staging / "objects.bin", "wb") as blob:
+                for i, obj in enumerate(objects):
+                    offsets[i + 1] = offsets[i] + blob.write(
+                        pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+                    )
+            np.save(staging / "offsets.npy", offsets)
+
+        manifest = {
+            "run_id": run_id,
+            "model": model_name,
+            "config_hash": config_hash(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "n_series": len(ids),
+            "arrays": sorted(arrays),
+            "objects": objects is not None,
+            "metadata": metadata or {},
+        }
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2, default=str))
+        shutil.rmtree(path, ignore_errors=True)
+        staging.rename(path)
+        logger.info(f"Saved {model_name} run {run_id} for {len(ids)} series")
+        return run_id
+
+    def runs(self, model_name):
+        """Manifests of the stored runs of a model, oldest first.
+
+        Returns:
+            pd.DataFrame: One row per run.
+        """
+        manifests = [
+            json.loads(path.read_text())
+            for path in (self.root / model_name).glob(f"*/{MANIFEST}")
+        ]
+        columns = ["run_id", "model", "config_hash", "created", "n_series"]
+        runs = pd.DataFrame(manifests, columns=columns)
+        return runs.sort_values("created", ignore_index=True)
+
+    def open(self, model_name, run_id=None, config_hash=None):
+        """Open a run without loading any of its state.
+
+        Args:
+            model_name (str): Name of the model.
+            run_id (str, optional): Run to open. Defaults to the latest run.
+            config_hash (str, optional): Only consider runs fitted with this
+                configuration.
+
+        Returns:
+            Artifact: Lazy view of the run.
+        """
+        if run_id is None:
+            runs = self.runs(model_name)
+            if config_hash is not None:
+                runs = runs[runs["config_hash"] == config_hash]
+            if runs.empty:
+                raise FileNotFoundError(f"No stored runs of {model_name}")
+            run_id = runs["run_id"].iloc[-1]
+        return Artifact(self.root / model_name / run_id)
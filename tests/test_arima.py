@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from statsforecast import StatsForecast
+from statsforecast.arima import forecast_arima, forward_arima
+from statsforecast.models import AutoARIMA, Naive
+
+from src.models.arima import ARIMA
+from src.models.model_inference import ModelInference
+from src.models.registry import ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def panel():
+    rng = np.random.default_rng(0)
+    t = np.arange(150)
+    noise = rng.normal(0, 1, len(t) + 2)
+    series = {
+        "seasonal": 10 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, len(t)),
+        "trend": 0.3 * t + np.cumsum(rng.normal(0, 1, len(t))),
+        "ar": 5 + noise[2:] + 0.6 * noise[1:-1] + 0.3 * noise[:-2],
+        "constant": np.full(len(t), 3.0),
+        "short": np.r_[1.0, 2.0, np.full(len(t) - 2, np.nan)],
+    }
+    ds = pd.date_range("2023-01-01", periods=len(t))
+    frames = [
+        pd.DataFrame({"unique_id": name, "ds": ds, "y": y}).dropna()
+        for name, y in series.items()
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _reference(train):
+    model = AutoARIMA(start_p=0, start_q=0, max_p=3, max_q=3, season_length=7)
+    sf = StatsForecast(models=[model], freq="D", n_jobs=1, fallback_model=Naive())
+    return sf.fit(train)
+
+
+def test_columnar_forecast_matches_statsforecast(panel):
+    train = panel[panel["ds"] < "2023-05-21"]
+    model = ARIMA(season_length=7, n_jobs=1).train(train)
+    forecasts = model.forecast(5, quantiles=[0.1, 0.5, 0.9])
+    expected = _reference(train).predict(h=5, level=[80])
+    merged = forecasts.merge(expected, on=["unique_id", "ds"])
+    assert len(merged) == len(forecasts) == 5 * panel["unique_id"].nunique()
+    np.testing.assert_allclose(merged["arima"], merged["AutoARIMA"])
+    np.testing.assert_allclose(merged["arima_q0.5"], merged["AutoARIMA"])
+    np.testing.assert_allclose(merged["arima_q0.1"], merged["AutoARIMA-lo-80"])
+    np.testing.assert_allclose(merged["arima_q0.9"], merged["AutoARIMA-hi-80"])
+
+    # Only arrays are stored, no fitted statsforecast objects
+    ids, arrays, objects = model.state()
+    assert objects is None
+    assert all(isinstance(value, np.ndarray) for value in arrays.values())
+
+
+def test_update_matches_refiltering(panel):
+    train = panel[panel["ds"] < "2023-05-21"]
+    model = ARIMA(season_length=7, n_jobs=1).train(train)
+    model.update(panel[panel["ds"] >= "2023-05-21"])
+    forecasts = model.forecast(3).set_index("unique_id")["arima"]
+
+    reference = _reference(train)
+    for i, series_id in enumerate(reference.uids):
+        fitted = reference.fitted_[i, 0].model_
+        y = panel.loc[panel["unique_id"] == series_id, "y"].to_numpy()
+        if "arma" in fitted:
+            expected = forecast_arima(forward_arima(fitted, y), h=3)["mean"]
+        else:
+            expected = np.repeat(y[-1], 3)
+        np.testing.assert_allclose(forecasts.loc[series_id], expected)
+
+
+def test_registry_round_trip(panel, tmp_path):
+    model = ARIMA(season_length=7, n_jobs=1).train(panel)
+    ids, arrays, _ = model.state()
+    registry = ModelRegistry(tmp_path)
+    arrays = {**arrays, "last_ds": model.last_ds}
+    registry.save("arima", ids, arrays)
+
+    served = ModelInference("arima", registry=registry).predict(
+        ["trend", "seasonal"], horizon=4
+    )
+    expected = model.forecast(4)
+    merged = served.merge(expected, on=["unique_id", "ds"])
+    assert len(merged) == 8
+    np.testing.assert_allclose(merged["arima_x"], merged["arima_y"])
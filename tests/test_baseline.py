@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.models.baseline import BaselineForecaster
+
+nan = np.nan
+# Ragged panel padded with NaN, including a series without any observation
+HISTORY = np.array(
+    [
+        [1.0, 2.0, 4.0, 3.0, 5.0, 6.0],
+        [1.0, 2.0, nan, nan, nan, nan],
+        [nan, 3.0, 1.0, 2.0, nan, nan],
+        [nan, nan, nan, nan, nan, nan],
+    ]
+)
+NEW = np.array([[7.0, 8.0], [3.0, nan], [4.0, 5.0], [2.0, 1.0]])
+REFIT = np.array(
+    [
+        [1.0, 2.0, 4.0, 3.0, 5.0, 6.0, 7.0, 8.0],
+        [1.0, 2.0, 3.0, nan, nan, nan, nan, nan],
+        [nan, 3.0, 1.0, 2.0, 4.0, 5.0, nan, nan],
+        [2.0, 1.0, nan, nan, nan, nan, nan, nan],
+    ]
+)
+
+
+def test_drift_update_appends_after_the_last_observation():
+    model = BaselineForecaster("drift").fit([[1.0, 2.0, nan, nan]])
+    np.testing.assert_allclose(model.update([[3.0]]).forecast(2), [[4.0, 5.0]])
+
+
+@pytest.mark.parametrize("method", BaselineForecaster.METHODS)
+def test_update_matches_refit_on_ragged_panel(method):
+    updated = BaselineForecaster(method, seasonality=2).fit(HISTORY)
+    updated.update(NEW[:, :1]).update(NEW[:, 1:])
+    refit = BaselineForecaster(method, seasonality=2).fit(REFIT)
+    np.testing.assert_allclose(updated.forecast(3), refit.forecast(3))
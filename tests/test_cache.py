@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.helper.cache import StageCache, fingerprint
+from src.models import pipeline
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2024-01-01", periods=40)
+    return pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b"], len(ds)),
+            "ds": np.tile(ds, 2),
+            "y": np.concatenate(
+                [rng.normal(10, 1, len(ds)), rng.poisson(0.5, len(ds)).astype(float)]
+            ),
+        }
+    )
+
+
+def test_rerun_hits_and_round_trips_the_output(tmp_path):
+    cache = StageCache(tmp_path)
+    frame = pd.DataFrame({"x": [1.0, 2.0], "tags": [["a"], ["b", "c"]]})
+    calls = []
+
+    def stage():
+        calls.append(1)
+        return frame, np.arange(3), None
+
+    first = cache.run("stage", stage, inputs=["abc"], params={"k": 1})
+    second = cache.run("stage", stage, inputs=["abc"], params={"k": 1})
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    pd.testing.assert_frame_equal(second[0], first[0])
+    np.testing.assert_array_equal(second[1], np.arange(3))
+    assert second[2] is None
+
+
+def test_key_changes_with_inputs_sections_and_params(panel, monkeypatch):
+    cache = StageCache("unused")
+    key = cache.key("stage", [panel], ["tuning"], {"horizon": 7})
+    assert key == cache.key("stage", [fingerprint(panel)], ["tuning"], {"horizon": 7})
+    assert key != cache.key("stage", [panel.head(10)], ["tuning"], {"horizon": 7})
+    assert key != cache.key("stage", [panel], ["tuning"], {"horizon": 14})
+    # Only the sections a stage reads are part of its key
+    monkeypatch.setitem(config.FORECASTING_CONFIG, "neural", {"changed": True})
+    assert key == cache.key("stage", [panel], ["tuning"], {"horizon": 7})
+    monkeypatch.setitem(config.FORECASTING_CONFIG, "tuning", {"changed": True})
+    assert key != cache.key("stage", [panel], ["tuning"], {"horizon": 7})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StageCache(tmp_path, max_bytes=10**9)
+    for i, key in enumerate(["old", "used", "recent"]):
+        cache.save(key, np.zeros(1000))
+        os.utime(tmp_path / key / "manifest.json", (1000 + i, 1000 + i))
+    cache.load("used")
+    size = cache.entries().set_index("key")["bytes"]
+
+    cache.max_bytes = size["used"] + size["recent"]
+    assert cache.evict() == ["old"]
+    assert sorted(cache.entries()["key"]) == ["recent", "used"]
+
+    # The entry just stored is kept even when it alone exceeds the budget
+    cache.max_bytes = 1
+    cache.save("new", np.zeros(10))
+    assert cache.entries()["key"].tolist() == ["new"]
+
+
+def test_config_change_only_invalidates_the_models_reading_it(
+    panel, tmp_path, monkeypatch
+):
+    cache = StageCache(tmp_path)
+    models = ["naive", "croston"]
+
+    def run():
+        return pipeline.forecast_run(
+            panel, 7, models=models, n_jobs=1, select=False, cache=cache
+        )
+
+    first, _, _ = run()
+    assert (cache.hits, cache.misses) == (0, 2)
+    second, _, _ = run()
+    assert (cache.hits, cache.misses) == (2, 2)
+    pd.testing.assert_frame_equal(second, first)
+
+    monkeypatch.setitem(
+        config.FORECASTING_CONFIG,
+        "models",
+        {**config.FORECASTING_CONFIG["models"], "changed": {"models": []}},
+    )
+    run()
+    assert (cache.hits, cache.misses) == (3, 3)
+    assert len(cache.entries()) == 3
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.models.cold_start import ColdStartForecaster
+from src.models.model_run import model_run
+from src.models.registry import ModelRegistry
+
+START = pd.Timestamp("2024-01-01")
+
+
+def _series(series_id, launch, n, category, rng):
+    ds = pd.date_range(launch, periods=n, freq="D")
+    ramp = np.minimum(np.arange(1, n + 1) / 10, 1.0)
+    y = (20 if category == "a" else 5) * ramp + rng.normal(0, 0.1, n)
+    return pd.DataFrame(
+        {"unique_id": series_id, "ds": ds, "y": y, "category": category}
+    )
+
+
+@pytest.fixture
+def reference():
+    rng = np.random.default_rng(0)
+    frames = [
+        _series(f"old_{i}", START, 60, "ab"[i % 2], rng) for i in range(6)
+    ] + [
+        _series(f"new_{i}", START + pd.DateOffset(days=5 + i), 40, "ab"[i % 2], rng)
+        for i in range(8)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _model(**kwargs):
+    settings = {"attributes": ["category"], "curve_length": 30, "k": 3}
+    return ColdStartForecaster(
+        **{**settings, **kwargs}, id_col="unique_id", target_col="y"
+    )
+
+
+def test_only_series_launched_within_the_panel_are_indexed(reference):
+    model = _model().fit(reference)
+    assert sorted(model.ids) == [f"new_{i}" for i in range(8)]
+    # Every curve starts at the launch ramp, not mid-life
+    assert np.all(model.curves[:, 0] < 0.2)
+
+
+def test_add_keeps_the_launch_criterion_of_fit(reference):
+    model = _model().fit(reference[reference["unique_id"] != "new_7"])
+    assert "new_7" not in model.ids
+    model.add(reference[reference["unique_id"].isin(["new_7", "old_0"])])
+    assert sorted(model.ids) == [f"new_{i}" for i in range(8)]
+    assert len(model.index.vectors) == 8
+
+
+def test_state_round_trip_forecasts_alike(reference, tmp_path):
+    model = _model().fit(reference)
+    ids, arrays, metadata = model.state()
+    registry = ModelRegistry(tmp_path)
+    registry.save("cold_start", ids, arrays, metadata=metadata)
+    artifact = registry.open("cold_start")
+    restored = ColdStartForecaster.from_state(
+        artifact.ids,
+        artifact.arrays(),
+        artifact.manifest["metadata"],
+        attributes=["category"],
+        curve_length=30,
+        k=3,
+        id_col="unique_id",
+        target_col="y",
+    )
+    new = pd.DataFrame(
+        {
+            "unique_id": ["x", "x", "z"],
+            "ds": pd.to_datetime(["2024-03-01", "2024-03-02", "2024-03-02"]),
+            "y": [2.0, 4.0, 0.5],
+            "category": ["a", "a", "b"],
+        }
+    )
+    pd.testing.assert_frame_equal(
+        restored.forecast(new, 7), model.forecast(new, 7)
+    )
+
+
+def test_model_run_extends_the_stored_index(reference, tmp_path, monkeypatch):
+    settings = config.FORECASTING_CONFIG["cold_start"]
+    monkeypatch.setitem(settings, "attributes", ["category"])
+    monkeypatch.setitem(settings, "curve_length", 30)
+    monkeypatch.setitem(settings, "k", 3)
+    registry = ModelRegistry(tmp_path)
+    new = reference[reference["unique_id"] == "new_0"].head(3)
+    new = new.assign(unique_id="launch")
+
+    def run(panel):
+        forecasts, _ = model_run(
+            new,
+            "cold_start",
+            7,
+            id_col="unique_id",
+            target_col="y",
+            n_jobs=1,
+            registry=registry,
+            reference=panel,
+        )
+        return forecasts
+
+    run(reference[reference["unique_id"] != "new_7"])
+    first = registry.open("cold_start")
+    run(reference[reference["unique_id"] != "new_7"])
+    assert len(registry.runs("cold_start")) == 1
+
+    run(reference)
+    runs = registry.runs("cold_start")
+    assert len(runs) == 2
+    second = registry.open("cold_start")
+    assert "new_7" in second.ids
+    # The matured series joined the stored lists instead of a refitted index
+    assert (
+        second.manifest["metadata"]["centroids"]
+        == first.manifest["metadata"]["centroids"]
+    )
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.eda import TimeSeriesEDA
+
+
+def test_seasonal_length_of_weekly_series():
+    rng = np.random.default_rng(0)
+    t = np.arange(200)
+    panel = 10 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, (200, len(t)))
+    periods = TimeSeriesEDA().identify_seasonal_length(panel)
+    # Harmonics such as 14 or 98 peak as well but are not the period
+    assert (periods == 7).mean() >= 0.99
+
+
+def test_seasonal_length_of_white_noise():
+    rng = np.random.default_rng(0)
+    panel = rng.poisson(0.3, (200, 200)).astype(float)
+    periods = TimeSeriesEDA().identify_seasonal_length(panel)
+    assert (periods == 1).mean() >= 0.99
+
+
+def test_seasonal_length_of_ragged_panel_with_trend():
+    rng = np.random.default_rng(1)
+    t = np.arange(120)
+    panel = np.stack(
+        [
+            0.5 * t + 5 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 1, len(t)),
+            20 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, len(t)),
+        ]
+    )
+    lengths = np.array([120, 60])
+    panel[1, 60:] = np.nan
+    periods = TimeSeriesEDA().identify_seasonal_length(panel, lengths)
+    np.testing.assert_array_equal(periods, [12, 7])
+
+
+def _ragged_panel():
+    rng = np.random.default_rng(2)
+    frames = []
+    for i, n in enumerate([50, 30, 80, 20, 65]):
+        y = 10 + 3 * np.sin(2 * np.pi * np.arange(n) / 7) + rng.normal(0, 1, n)
+        price = rng.normal(5, 1, n)
+        promo = y + rng.normal(0, 1, n)
+        price[rng.random(n) < 0.2] = np.nan
+        promo[: n // 2] = np.nan
+        frames.append(
+            pd.DataFrame(
+                {
+                    "unique_id": f"s{i}",
+                    "ds": pd.date_range("2024-01-01", periods=n),
+                    "y": y,
+                    "price": price,
+                    "promo": promo,
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_series_statistics_do_not_depend_on_the_chunk_size():
+    data = _ragged_panel()
+    eda = TimeSeriesEDA()
+    whole = eda.series_statistics(data, "unique_id", target_col="y")
+    chunked = eda.series_statistics(data, "unique_id", target_col="y", chunk_size=2)
+    pd.testing.assert_frame_equal(chunked, whole)
+
+
+def test_correlations_drop_missing_values_per_column():
+    data = _ragged_panel()
+    stats = TimeSeriesEDA().series_statistics(data, "unique_id", target_col="y")
+    stats = stats.set_index("unique_id")
+    for series_id, rows in data.groupby("unique_id"):
+        for column in ("price", "promo"):
+            pair = rows[["y", column]].dropna()
+            expected = np.corrcoef(pair["y"], pair[column])[0, 1]
+            assert stats.loc[series_id, f"corr_{column}"] == pytest.approx(expected)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from src.data.etl import load_data, save_data
+from src.helper.utils import split_series
+
+
+def test_load_data_sorts_categories_and_keeps_float_precision(tmp_path):
+    df = pd.DataFrame(
+        {
+            "unique_id": ["z", "z", "a", "a", "m"],
+            "ds": pd.date_range("2023-01-01", periods=5),
+            "y": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "price": [9.99, 1.1, 2.5, np.nan, 3.0],
+            "discount": [0.5, 0.25, np.nan, 2.0, 1.0],
+        }
+    )
+    save_data(df, tmp_path)
+    loaded = load_data(tmp_path)
+
+    assert loaded["unique_id"].cat.categories.tolist() == ["a", "m", "z"]
+    ids, starts, ends, values, _ = split_series(loaded, "unique_id", "ds", "y")
+    assert ids.tolist() == ["a", "m", "z"]
+    assert values[starts[-1] : ends[-1]].tolist() == [1.0, 2.0]
+    # Prices are not exact in float32, halves are
+    assert loaded["price"].dtype == np.float64
+    assert loaded["discount"].dtype == np.float32
+    np.testing.assert_array_equal(
+        loaded.sort_values("ds")["price"].to_numpy(), df["price"].to_numpy()
+    )
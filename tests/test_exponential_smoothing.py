@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from src.models.exponential_smoothing import (
+    ExponentialSmoothingModels,
+    params_from_state,
+    update_state,
+)
+
+
+def test_stored_state_warm_starts_the_same_parameters():
+    rng = np.random.default_rng(0)
+    t = np.arange(84)
+    y = pd.Series(20 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 0.5, len(t)))
+    model = ExponentialSmoothingModels(season_length=7, n_trials=20, n_jobs=1)
+    model.train(y)
+
+    state = {name: np.asarray(value)[None] for name, value in model.state().items()}
+    (params,) = params_from_state(state)
+    assert params.keys() == model.best_params.keys()
+    for name, value in model.best_params.items():
+        assert params[name] == (value if name == "model_type" else float(value))
+
+    # The warm start is the first trial evaluated
+    warm = ExponentialSmoothingModels(season_length=7, n_trials=1, n_jobs=1)
+    warm.train(y, warm_start=params)
+    assert warm.best_params == model.best_params
+
+
+def _fitted(y, params):
+    model = ExponentialSmoothingModels(season_length=7)
+    model.best_params = params
+    model.best_model_type = params["model_type"]
+    model.model = model._fit(pd.Series(y), params)
+    model.state_ = model._final_state()
+    return model
+
+
+def test_update_matches_refit():
+    rng = np.random.default_rng(1)
+    t = np.arange(70)
+    y = 20 + 0.1 * t + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 0.5, len(t))
+    for params in (
+        {"model_type": "simple_exp", "smoothing_level": 0.3},
+        {"model_type": "holt", "smoothing_level": 0.3, "smoothing_trend": 0.1},
+        {
+            "model_type": "exp_smoothing",
+            "smoothing_level": 0.3,
+            "smoothing_trend": 0.1,
+            "smoothing_seasonal": 0.2,
+        },
+    ):
+        updated = _fitted(y[:60], params).update(y[60:])
+        np.testing.assert_allclose(
+            updated.forecast(10), _fitted(y, params).forecast(10)
+        )
+
+
+def test_update_state_leaves_padded_periods_out():
+    rng = np.random.default_rng(2)
+    y = 10 + rng.normal(0, 1, 40)
+    params = {"model_type": "holt", "smoothing_level": 0.3, "smoothing_trend": 0.1}
+    state = _fitted(y[:30], params).state()
+    stacked = {name: np.stack([value, value]) for name, value in state.items()}
+    new = np.stack([y[30:], np.r_[y[30:33], np.full(7, np.nan)]])
+    advanced = update_state(stacked, new, lengths=np.array([10, 3]))
+    for row, end in enumerate((40, 33)):
+        refit = _fitted(y[:end], params).state()
+        np.testing.assert_allclose(advanced["level"][row], refit["level"])
+        np.testing.assert_allclose(advanced["trend"][row], refit["trend"])
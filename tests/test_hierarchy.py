@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.hierarchy import METHODS, Hierarchy
+
+
+def _panel(id_col="unique_id", time_col="ds", target_col="y"):
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2024-01-01", periods=30, freq="D")
+    frames = [
+        pd.DataFrame(
+            {
+                id_col: f"s{i}",
+                time_col: ds,
+                target_col: rng.poisson(5 + i, len(ds)).astype(float),
+                "category": "ab"[i % 2],
+                "store": "xyz"[i % 3],
+            }
+        )
+        for i in range(6)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _base_forecasts(hierarchy, id_col="unique_id", time_col="ds"):
+    rng = np.random.default_rng(1)
+    ds = pd.date_range("2024-01-31", periods=3, freq="D")
+    labels = np.repeat(hierarchy.labels, len(ds))
+    return pd.DataFrame(
+        {
+            id_col: labels,
+            time_col: np.tile(ds, len(hierarchy.labels)),
+            "naive": rng.uniform(0, 50, len(labels)),
+            "mean": rng.uniform(0, 50, len(labels)),
+        }
+    )
+
+
+def _assert_coherent(hierarchy, reconciled, id_col, time_col):
+    for model in ("naive", "mean"):
+        Y = reconciled.pivot(index=id_col, columns=time_col, values=model)
+        Y = Y.reindex(hierarchy.labels).to_numpy()
+        np.testing.assert_allclose(hierarchy.S @ Y[hierarchy.n_aggregated :], Y)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_every_method_returns_coherent_forecasts(method):
+    panel = _panel()
+    hierarchy = Hierarchy.from_frame(panel, ["category", "store"], "unique_id")
+    forecasts = _base_forecasts(hierarchy)
+    reconciled = hierarchy.reconcile(
+        forecasts, method, history=panel, id_col="unique_id", target_col="y"
+    )
+    assert len(reconciled) == len(forecasts)
+    _assert_coherent(hierarchy, reconciled, "unique_id", "ds")
+
+
+def test_bottom_up_keeps_the_bottom_forecasts():
+    panel = _panel()
+    hierarchy = Hierarchy.from_frame(panel, ["category"], "unique_id")
+    forecasts = _base_forecasts(hierarchy)
+    reconciled = hierarchy.reconcile(forecasts, "bottom_up", id_col="unique_id")
+    bottom = forecasts[forecasts["unique_id"].isin(hierarchy.bottom)]
+    merged = bottom.merge(reconciled, on=["unique_id", "ds"])
+    np.testing.assert_allclose(merged["naive_x"], merged["naive_y"])
+
+
+@pytest.mark.parametrize("method", ["top_down", "mint"])
+def test_history_with_non_default_columns(method):
+    panel = _panel(id_col="sku", time_col="date", target_col="sales")
+    hierarchy = Hierarchy.from_frame(panel, ["category", "store"], "sku")
+    forecasts = _base_forecasts(hierarchy, id_col="sku", time_col="date")
+    reconciled = hierarchy.reconcile(
+        forecasts,
+        method,
+        history=panel,
+        id_col="sku",
+        time_col="date",
+        target_col="sales",
+    )
+    _assert_coherent(hierarchy, reconciled, "sku", "date")
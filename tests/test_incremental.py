@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from src.models.incremental import RefitPolicy, model_update
+from src.models.model_run import model_run
+from src.models.registry import ModelRegistry
+
+
+class _Model:
+    def __init__(self):
+        self.updates = 0
+
+    def update(self, new_obs):
+        self.updates += 1
+        return self
+
+
+def _policy(**kwargs):
+    settings = {
+        "refit_every": 3,
+        "drift_threshold": 2.0,
+        "drift_share": 0.5,
+        "error_smoothing": 0.5,
+    }
+    return RefitPolicy(**{**settings, **kwargs})
+
+
+def test_refit_is_due_on_schedule():
+    policy = _policy()
+    model = _Model()
+    reasons = []
+    for _ in range(4):
+        model, reason = policy.step(model, [[1.0]], refit=_Model)
+        reasons.append(reason)
+    assert reasons == [None, None, None, "schedule"]
+    assert policy.n_updates == 0
+    assert model.updates == 0
+
+
+def test_drifted_series_trigger_a_refit():
+    policy = _policy(refit_every=100)
+    policy.reset(scale=[1.0, 1.0, 1.0])
+    policy.record([[1.0], [2.0], [np.nan]], np.zeros((3, 1)))
+    np.testing.assert_array_equal(policy.drifted(), [False, False, False])
+    assert policy.due() is None
+
+    # Smoothed errors of 4.5 and 9 against a usual error of 1
+    policy.record([[1.0], [7.0], [9.0]], np.zeros((3, 1)))
+    np.testing.assert_array_equal(policy.drifted(), [False, True, True])
+    assert policy.due() == "drift"
+
+
+def test_drift_scale_defaults_to_the_errors_since_the_refit():
+    policy = _policy(refit_every=100)
+    policy.record(np.ones((2, 4)), np.zeros((2, 4)))
+    assert policy.due() is None
+    policy.record([[1.0], [20.0]], [[0.0], [0.0]])
+    np.testing.assert_array_equal(policy.drifted(), [False, True])
+
+
+def test_policy_state_round_trip():
+    policy = _policy()
+    policy.record([[1.0, 2.0], [np.nan, 4.0]], np.zeros((2, 2)))
+    policy.n_updates = 2
+    restored = _policy()
+    restored.restore(policy.n_updates, policy.state(2))
+    assert restored.n_updates == 2
+    np.testing.assert_allclose(restored.error, policy.error)
+    np.testing.assert_array_equal(restored.drifted(), policy.drifted())
+
+    # A state saved right after a refit restores a fresh period
+    fresh = _policy()
+    fresh.restore(0, {})
+    assert fresh.error is None and fresh.scale is None
+
+
+def test_model_update_rolls_the_stored_state_forward(tmp_path):
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2024-01-01", periods=40)
+    df = pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b", "c"], len(ds)),
+            "ds": np.tile(ds, 3),
+            "y": rng.poisson(0.5, 3 * len(ds)).astype(float),
+        }
+    )
+    registry = ModelRegistry(tmp_path)
+    reasons = []
+    for day in range(30, 36):
+        history = df[df["ds"] < ds[day]]
+        if day == 33:
+            # One series without new data, then back the next day
+            history = history[history["unique_id"] != "c"]
+        forecasts, report = model_update(
+            history, "croston", 3, registry, policy=_policy(refit_every=10)
+        )
+        reasons.append(report.attrs["refit"])
+        expected, _ = model_run(history, "croston", 3, n_jobs=1)
+        merged = forecasts.merge(expected, on=["unique_id", "ds"], suffixes=("", "_"))
+        assert len(merged) == len(expected) == len(forecasts)
+        np.testing.assert_allclose(merged["croston"], merged["croston_"])
+    assert reasons == ["no_state"] + [None] * 5
+    assert registry.open("croston").manifest["metadata"]["n_updates"] == 5
+
+
+def test_model_update_of_arima_matches_kalman_update(tmp_path):
+    from src.models.arima import ARIMA
+
+    rng = np.random.default_rng(1)
+    ds = pd.date_range("2024-01-01", periods=80)
+    t = np.arange(len(ds))
+    df = pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b"], len(ds)),
+            "ds": np.tile(ds, 2),
+            "y": np.concatenate(
+                [
+                    10 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, len(t)),
+                    np.cumsum(rng.normal(0, 1, len(t))),
+                ]
+            ),
+        }
+    )
+    registry = ModelRegistry(tmp_path)
+    history = df[df["ds"] < ds[75]]
+    _, report = model_update(history, "arima", 3, registry, n_jobs=1)
+    assert report.attrs["refit"] == "no_state"
+    forecasts, report = model_update(df, "arima", 3, registry, n_jobs=1)
+    assert report.attrs["refit"] is None
+
+    model = ARIMA(n_jobs=1).train(history).update(df[df["ds"] >= ds[75]])
+    expected = model.forecast(3)
+    merged = forecasts.merge(expected, on=["unique_id", "ds"])
+    assert len(merged) == len(forecasts) == 6
+    np.testing.assert_allclose(merged["arima_x"], merged["arima_y"])
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.inference_service import InferenceService
+from src.models.model_run import model_run
+from src.models.registry import ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def registry(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2023-01-01", periods=60)
+    df = pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b", "c"], len(ds)),
+            "ds": np.tile(ds, 3),
+            "y": np.where(rng.random(3 * len(ds)) < 0.4, rng.gamma(2, 5, 180), 0.0),
+        }
+    )
+    registry = ModelRegistry(tmp_path_factory.mktemp("registry"))
+    for model_name in ("croston", "tsb", "adida"):
+        model_run(df, model_name, 7, n_jobs=1, registry=registry)
+    return registry
+
+
+def test_eviction_answers_queued_requests(registry):
+    async def scenario():
+        service = InferenceService(registry, max_models=1, max_wait_ms=200)
+        pending = asyncio.create_task(service.predict("croston", ["a"], 7))
+        await asyncio.sleep(0.05)
+        # Loading tsb evicts croston while its request waits for a batch
+        other = await service.predict("tsb", ["b"], 7)
+        return await asyncio.wait_for(pending, 2), other
+
+    croston, tsb = asyncio.run(scenario())
+    assert len(croston) == 7 and croston["croston"].notna().all()
+    assert len(tsb) == 7
+
+
+def test_refresh_answers_requests_in_flight(registry):
+    async def scenario():
+        service = InferenceService(registry, max_wait_ms=200)
+        pending = asyncio.create_task(service.predict("adida", ["a", "c"], 3))
+        await asyncio.sleep(0.05)
+        service.refresh("adida")
+        first = await asyncio.wait_for(pending, 2)
+        # Later requests are served by a fresh batcher
+        second = await asyncio.wait_for(service.predict("adida", ["b"], 3), 2)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(first) == 6 and len(second) == 3
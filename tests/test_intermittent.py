@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from src.models.intermittent import IntermittentForecaster
+
+nan = np.nan
+HISTORY = np.array(
+    [
+        [0.0, 3.0, 0.0, 0.0, 2.0, 0.0],
+        [1.0, 0.0, nan, nan, nan, nan],
+        [nan, 0.0, 4.0, 0.0, nan, nan],
+    ]
+)
+NEW = np.array([[0.0, 5.0], [2.0, 0.0], [0.0, 1.0]])
+REFIT = np.array(
+    [
+        [0.0, 3.0, 0.0, 0.0, 2.0, 0.0, 0.0, 5.0],
+        [1.0, 0.0, 2.0, 0.0, nan, nan, nan, nan],
+        [nan, 0.0, 4.0, 0.0, 0.0, 1.0, nan, nan],
+    ]
+)
+
+
+@pytest.mark.parametrize("method", IntermittentForecaster.METHODS)
+def test_update_matches_refit_on_ragged_panel(method):
+    updated = IntermittentForecaster(method, alpha=0.2, beta=0.3).fit(HISTORY)
+    updated.update(NEW[:, :1]).update(NEW[:, 1:])
+    refit = IntermittentForecaster(method, alpha=0.2, beta=0.3).fit(REFIT)
+    np.testing.assert_allclose(updated.forecast(2), refit.forecast(2))
+
+
+@pytest.mark.parametrize("method", ["croston", "croston_sba", "tsb"])
+def test_update_from_stored_state_matches_refit(method):
+    fitted = IntermittentForecaster(method, alpha=0.2, beta=0.3).fit(HISTORY)
+    resumed = IntermittentForecaster.from_state(
+        method, fitted.state(), alpha=0.2, beta=0.3
+    )
+    resumed.update(NEW)
+    refit = IntermittentForecaster(method, alpha=0.2, beta=0.3).fit(REFIT)
+    np.testing.assert_allclose(resumed.forecast(2), refit.forecast(2))
+
+
+def _reference_croston(y, alpha, sba=False):
+    """Textbook Croston over one series, one observation at a time."""
+    size = interval = None
+    periods = 0
+    for value in y:
+        if np.isnan(value):
+            continue
+        periods += 1
+        if value > 0:
+            if size is None:
+                size, interval = value, periods
+            else:
+                size += alpha * (value - size)
+                interval += alpha * (periods - interval)
+            periods = 0
+    if size is None:
+        return 0.0
+    return size / interval * (1 - alpha / 2 if sba else 1)
+
+
+def _reference_tsb(y, alpha, beta):
+    """Textbook TSB over one series, one observation at a time."""
+    size = probability = None
+    for value in y:
+        if np.isnan(value):
+            continue
+        occurred = float(value > 0)
+        if probability is None:
+            probability = occurred
+        else:
+            probability += beta * (occurred - probability)
+        if value > 0:
+            size = value if size is None else size + alpha * (value - size)
+    return 0.0 if size is None else probability * size
+
+
+@pytest.fixture
+def intermittent_panel():
+    rng = np.random.default_rng(0)
+    panel = rng.poisson(3, (20, 40)) * (rng.random((20, 40)) < 0.3)
+    panel = panel.astype(np.float64)
+    panel[rng.random((20, 40)) < 0.1] = nan
+    panel[0] = 0.0
+    return panel
+
+
+@pytest.mark.parametrize("method", ["croston", "croston_sba"])
+def test_croston_matches_reference_loop(method, intermittent_panel):
+    model = IntermittentForecaster(method, alpha=0.15).fit(intermittent_panel)
+    expected = [
+        _reference_croston(y, 0.15, sba=method == "croston_sba")
+        for y in intermittent_panel
+    ]
+    np.testing.assert_allclose(model.forecast(3)[:, 0], expected)
+    np.testing.assert_allclose(model.forecast(3)[:, 2], expected)
+
+
+def test_tsb_matches_reference_loop(intermittent_panel):
+    model = IntermittentForecaster("tsb", alpha=0.15, beta=0.25).fit(
+        intermittent_panel
+    )
+    expected = [_reference_tsb(y, 0.15, 0.25) for y in intermittent_panel]
+    np.testing.assert_allclose(model.forecast(1)[:, 0], expected)
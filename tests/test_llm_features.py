@@ -0,0 +1,185 @@
+import asyncio
+import json
+import types
+
+import pandas as pd
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.models import llm_features
+from src.models.llm_features import DEFAULT_FEATURES, LLMFeatureExtractor
+
+# Unpatched sleep, for the stub's own latency
+_sleep = asyncio.sleep
+
+REPLY = {
+    "sentiment_score": 0.5,
+    "supply_chain_risk": 0.2,
+    "demand_indicator": 0.7,
+    "price_pressure": -0.1,
+    "market_volatility": 0.3,
+    "key_events": ["launch", "strike"],
+}
+
+
+class StubChatModel:
+    """Local chat model answering with fixed JSON, failing on request."""
+
+    def __init__(self, failures=None, delay=0.01):
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def _ainvoke(self, prompt):
+        text = prompt.to_string()
+        self.calls.append(text)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await _sleep(self.delay)
+            for marker, remaining in self.failures.items():
+                if marker in text and remaining:
+                    self.failures[marker] = remaining - 1
+                    raise RuntimeError(f"stub failure for {marker}")
+            return json.dumps(REPLY)
+        finally:
+            self.active -= 1
+
+    def runnable(self):
+        return RunnableLambda(lambda prompt: json.dumps(REPLY), afunc=self._ainvoke)
+
+
+def _extractor(stub, tmp_path, **settings):
+    extractor = LLMFeatureExtractor(
+        llm=stub.runnable(), cache_path=tmp_path / "cache.sqlite"
+    )
+    for name, value in settings.items():
+        setattr(extractor, name, value)
+    return extractor
+
+
+def _news(n):
+    return pd.DataFrame(
+        {
+            "date": pd.date_range("2024-01-01", periods=n),
+            "news": [f"story {i}" for i in range(n)],
+        }
+    )
+
+
+@pytest.fixture
+def no_wait(monkeypatch):
+    """Skip retry backoff sleeps and record their delays."""
+    delays = []
+
+    async def _record(delay):
+        delays.append(delay)
+        await _sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", _record)
+    return delays
+
+
+def test_requests_are_batched_concurrently_and_deduplicated(tmp_path):
+    stub = StubChatModel(delay=0.05)
+    extractor = _extractor(stub, tmp_path, max_concurrency=3)
+    df = pd.concat([_news(8), _news(8)], ignore_index=True)
+
+    out = extractor.add_news_features(df, "date", "news")
+
+    assert len(stub.calls) == 8
+    assert 1 < stub.max_active <= 3
+    assert (out["news_sentiment"] == REPLY["sentiment_score"]).all()
+    assert (out["event_count"] == 2).all()
+
+
+def test_second_run_is_served_from_the_cache(tmp_path):
+    df = _news(5)
+    first = _extractor(StubChatModel(), tmp_path).add_news_features(df, "date", "news")
+
+    stub = StubChatModel()
+    second = _extractor(stub, tmp_path).add_news_features(df, "date", "news")
+
+    assert stub.calls == []
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_rate_limiter_waits_for_the_window(monkeypatch):
+    clock = [0.0]
+    waits = []
+
+    async def _advance(delay):
+        waits.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr(
+        llm_features, "time", types.SimpleNamespace(monotonic=lambda: clock[0])
+    )
+    monkeypatch.setattr(
+        llm_features,
+        "asyncio",
+        types.SimpleNamespace(Lock=asyncio.Lock, sleep=_advance),
+    )
+
+    async def scenario():
+        limiter = llm_features._RateLimiter(
+            requests_per_minute=2, tokens_per_minute=1000
+        )
+        for tokens in (100, 100, 100):
+            await limiter.acquire(tokens)
+        by_tokens = llm_features._RateLimiter(tokens_per_minute=1000)
+        await by_tokens.acquire(800)
+        await by_tokens.acquire(300)
+
+    asyncio.run(scenario())
+    # The third request waits for the first to leave the one-minute window,
+    # and 800 + 300 tokens exceed the token limit
+    assert waits == [60.0, 60.0]
+
+
+def test_failed_calls_are_retried_then_defaulted(tmp_path, no_wait):
+    stub = StubChatModel(failures={"story 0": 2, "story 1": 99})
+    extractor = _extractor(stub, tmp_path, max_retries=3)
+
+    out = extractor.add_news_features(_news(3), "date", "news")
+
+    # story 0 succeeds on its third attempt, story 1 never does
+    assert out.loc[0, "news_sentiment"] == REPLY["sentiment_score"]
+    assert out.loc[1, list(DEFAULT_FEATURES)].tolist() == list(
+        DEFAULT_FEATURES.values()
+    )
+    assert sum("story 1" in call for call in stub.calls) == 4
+    assert len(no_wait) == 2 + 3
+    assert all(delay >= 1 for delay in no_wait)
+
+    # Failures are not cached, so the next run retries them
+    retry = StubChatModel()
+    _extractor(retry, tmp_path).add_news_features(_news(3), "date", "news")
+    assert len(retry.calls) == 1 and "story 1" in retry.calls[0]
+
+
+def test_features_can_be_added_from_a_running_event_loop(tmp_path):
+    df = _news(4)
+    for name in ("sync", "nested", "async"):
+        (tmp_path / name).mkdir()
+    expected = _extractor(StubChatModel(), tmp_path / "sync").add_news_features(
+        df, "date", "news"
+    )
+
+    async def handler():
+        # E.g. a notebook cell or a FastAPI endpoint
+        sync = _extractor(StubChatModel(), tmp_path / "nested").add_news_features(
+            df, "date", "news"
+        )
+        stub = StubChatModel()
+        awaited = await _extractor(stub, tmp_path / "async").aadd_news_features(
+            df, "date", "news"
+        )
+        return sync, awaited, stub
+
+    sync, awaited, stub = asyncio.run(handler())
+    assert len(stub.calls) == 4
+    pd.testing.assert_frame_equal(sync, expected)
+    pd.testing.assert_frame_equal(awaited, expected)
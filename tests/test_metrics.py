@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import (
+    mean_absolute_error,
+    mean_absolute_percentage_error,
+    mean_pinball_loss,
+    mean_squared_error,
+    mean_squared_log_error,
+)
+
+from src.helper import metrics
+from src.helper.utils import quantile_column
+
+Y_TRUE = np.array([3.0, 5.0, 2.0, 8.0, 6.0])
+Y_PRED = np.array([2.5, 5.0, 4.0, 7.0, 9.0])
+Y_TRAIN = np.array([1.0, 4.0, 2.0, 6.0, 5.0, 7.0])
+
+
+def test_point_metrics_match_sklearn():
+    assert metrics.mae(Y_TRUE, Y_PRED) == pytest.approx(
+        mean_absolute_error(Y_TRUE, Y_PRED)
+    )
+    assert metrics.rmse(Y_TRUE, Y_PRED) == pytest.approx(
+        np.sqrt(mean_squared_error(Y_TRUE, Y_PRED))
+    )
+    assert metrics.mape(Y_TRUE, Y_PRED) == pytest.approx(
+        mean_absolute_percentage_error(Y_TRUE, Y_PRED)
+    )
+    assert metrics.rmsle(Y_TRUE, Y_PRED) == pytest.approx(
+        np.sqrt(mean_squared_log_error(Y_TRUE, Y_PRED))
+    )
+
+
+def test_ratio_and_scaled_metrics_match_hand_computed_values():
+    # Errors -0.5, 0, 2, -1, 3 against actuals summing to 24
+    assert metrics.wape(Y_TRUE, Y_PRED) == pytest.approx(6.5 / 24)
+    assert metrics.bias(Y_TRUE, Y_PRED) == pytest.approx(3.5 / 24)
+    # Naive errors of the history: 3, 2, 4, 1, 2; lag-2 errors: 1, 2, 3, 1
+    assert metrics.mase(Y_TRUE, Y_PRED, Y_TRAIN) == pytest.approx(1.3 / 2.4)
+    assert metrics.rmsse(Y_TRUE, Y_PRED, Y_TRAIN) == pytest.approx(
+        np.sqrt(14.25 / 5 / (34 / 5))
+    )
+    assert metrics.mase(Y_TRUE, Y_PRED, Y_TRAIN, seasonality=2) == pytest.approx(
+        1.3 / 1.75
+    )
+
+
+def test_mape_skips_zero_actuals_and_nan_is_ignored():
+    y_true = np.array([0.0, 2.0, np.nan, 4.0])
+    y_pred = np.array([1.0, 3.0, 5.0, 2.0])
+    assert metrics.mape(y_true, y_pred) == pytest.approx((0.5 + 0.5) / 2)
+    assert metrics.mae(y_true, y_pred) == pytest.approx(4 / 3)
+
+
+def test_panel_scores_per_series_and_pooled():
+    y_true = np.vstack([Y_TRUE, Y_TRUE[::-1]])
+    y_pred = np.vstack([Y_PRED, Y_PRED + 1])
+    per_series = metrics.wape(y_true, y_pred)
+    np.testing.assert_allclose(
+        per_series,
+        [metrics.wape(t, p) for t, p in zip(y_true, y_pred)],
+    )
+
+    df = pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b"], len(Y_TRUE)),
+            "y": y_true.ravel(),
+            "model": y_pred.ravel(),
+        }
+    )
+    scores = metrics.evaluate(df, ["model"], metrics=["mae", "wape"])
+    np.testing.assert_allclose(scores["series"]["wape"], per_series)
+    overall = scores["overall"].iloc[0]
+    assert overall["mae"] == pytest.approx(
+        mean_absolute_error(y_true.ravel(), y_pred.ravel())
+    )
+    assert overall["wape"] == pytest.approx(
+        np.abs(y_pred - y_true).sum() / np.abs(y_true).sum()
+    )
+
+
+def test_quantile_scores_match_sklearn_pinball_loss():
+    quantiles = [0.1, 0.5, 0.9]
+    offsets = np.array([-2.0, 0.0, 2.0])
+    df = pd.DataFrame({"unique_id": "a", "y": Y_TRUE})
+    for q, offset in zip(quantiles, offsets):
+        df[quantile_column("model", q)] = Y_PRED + offset
+
+    scores = metrics.evaluate_quantiles(df, ["model"], quantiles)["overall"].iloc[0]
+    expected = np.mean(
+        [
+            mean_pinball_loss(Y_TRUE, Y_PRED + offset, alpha=q)
+            for q, offset in zip(quantiles, offsets)
+        ]
+    )
+    assert scores["pinball"] == pytest.approx(expected)
+    inside = (Y_TRUE >= Y_PRED - 2) & (Y_TRUE <= Y_PRED + 2)
+    assert scores["coverage_0.8"] == pytest.approx(inside.mean())
+    assert metrics.coverage(Y_TRUE, Y_PRED - 2, Y_PRED + 2) == pytest.approx(
+        inside.mean()
+    )
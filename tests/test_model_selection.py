@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.helper.cache import StageCache
+from src.models.model_selection import ModelTournament
+
+MODELS = ["naive", "mean", "croston"]
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2024-01-01", periods=60)
+    return pd.DataFrame(
+        {
+            "unique_id": np.repeat(["a", "b", "c"], len(ds)),
+            "ds": np.tile(ds, 3),
+            "y": np.concatenate(
+                [
+                    np.cumsum(rng.normal(0, 1, len(ds))) + 50,
+                    rng.normal(10, 1, len(ds)),
+                    rng.poisson(0.5, len(ds)).astype(float),
+                ]
+            ),
+        }
+    )
+
+
+def _tournament(cache=None, **kwargs):
+    return ModelTournament(
+        MODELS, 7, metric="mae", n_folds=2, n_jobs=1, cache=cache, **kwargs
+    )
+
+
+def _count_scoring(monkeypatch):
+    scored = []
+    score = ModelTournament._score
+
+    def _score(self, df):
+        scored.append(sorted(df["unique_id"].unique()))
+        return score(self, df)
+
+    monkeypatch.setattr(ModelTournament, "_score", _score)
+    return scored
+
+
+def test_inverse_error_weights():
+    errors = pd.DataFrame(
+        [[1.0, 2.0, 4.0], [0.0, 1.0, np.nan], [np.nan, np.nan, np.nan]],
+        columns=MODELS,
+    )
+    weights = _tournament(strategy="ensemble", top_k=2)._weigh(errors)
+    np.testing.assert_allclose(
+        weights, [[2 / 3, 1 / 3, 0.0], [1.0, 0.0, 0.0], [1.0, 0.0, 0.0]]
+    )
+    selected = _tournament(strategy="select")._weigh(errors)
+    np.testing.assert_allclose(selected[0], [1.0, 0.0, 0.0])
+
+
+def test_fit_weights_every_series(panel):
+    weights = _tournament(strategy="select").fit(panel)
+    assert len(weights) == 3 * len(MODELS)
+    totals = weights.groupby("unique_id")["weight"].sum()
+    np.testing.assert_allclose(totals, 1.0)
+    best = weights.loc[weights["weight"] == 1.0].set_index("unique_id")["model"]
+    # A random walk is best followed, white noise best averaged
+    assert best["a"] == "naive"
+    assert best["b"] == "mean"
+
+
+def test_combine_spreads_weights_of_missing_forecasts():
+    weights = pd.DataFrame(
+        {
+            "unique_id": ["a"] * 3,
+            "model": MODELS,
+            "score": [1.0, 2.0, 3.0],
+            "weight": [0.5, 0.3, 0.2],
+        }
+    )
+    forecasts = pd.DataFrame(
+        {
+            "unique_id": ["a", "b"],
+            "ds": pd.to_datetime(["2024-03-01"] * 2),
+            "naive": [10.0, 1.0],
+            "mean": [np.nan, 2.0],
+            "croston": [20.0, 3.0],
+        }
+    )
+    blended = _tournament().combine(forecasts, weights)
+    # Series "b" has no weights and takes the plain average
+    np.testing.assert_allclose(blended["forecast"], [(5 + 4) / 0.7, 2.0])
+
+
+def test_scores_are_reused_until_data_or_config_change(panel, tmp_path, monkeypatch):
+    scored = _count_scoring(monkeypatch)
+    cache = StageCache(tmp_path)
+    first = _tournament(cache).fit(panel)
+    assert scored == [["a", "b", "c"]]
+
+    # An unchanged rerun scores nothing
+    rerun = _tournament(cache).fit(panel)
+    assert len(scored) == 1
+    pd.testing.assert_frame_equal(
+        rerun.sort_values(["unique_id", "model"], ignore_index=True),
+        first.sort_values(["unique_id", "model"], ignore_index=True),
+    )
+
+    # New data of one series only rescored that series
+    changed = panel.copy()
+    changed.loc[changed["unique_id"] == "b", "y"] += 1.0
+    _tournament(cache).fit(changed)
+    assert scored[-1] == ["b"]
+
+    # The configuration of a candidate model invalidates every score
+    params = config.FORECASTING_CONFIG["models"]["intermittent"]["params"]
+    monkeypatch.setitem(params, "alpha", 0.3)
+    _tournament(cache).fit(changed)
+    assert scored[-1] == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize(
+    "section, key, value",
+    [
+        ("models", None, {}),
+        ("num_trails", None, 5),
+        ("tuning", "patience", 1),
+        ("target", None, "sales"),
+        ("partition_dim", None, "sku"),
+        ("backtest", "window", "rolling"),
+    ],
+)
+def test_cache_key_covers_the_model_configuration(
+    tmp_path, monkeypatch, section, key, value
+):
+    tournament = ModelTournament(
+        ["croston", "exponential_smoothing"], 7, cache=StageCache(tmp_path)
+    )
+    before = tournament._cache_key()
+    if key is None:
+        monkeypatch.setitem(config.FORECASTING_CONFIG, section, value)
+    else:
+        monkeypatch.setitem(config.FORECASTING_CONFIG[section], key, value)
+    assert tournament._cache_key() != before
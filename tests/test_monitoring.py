@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.helper.monitoring import ForecastMonitor
+
+
+@pytest.fixture
+def train():
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2024-01-01", periods=60)
+    return pd.DataFrame(
+        {
+            "unique_id": np.repeat(["stable", "worse", "drift"], len(ds)),
+            "ds": np.tile(ds, 3),
+            "y": rng.normal(10, 1, 3 * len(ds)),
+            "group": np.repeat(["a", "a", "b"], len(ds)),
+        }
+    )
+
+
+@pytest.fixture
+def actuals():
+    rng = np.random.default_rng(1)
+    ds = pd.date_range("2024-03-01", periods=40)
+    frames = []
+    for series_id in ("stable", "worse", "drift"):
+        y = rng.normal(30 if series_id == "drift" else 10, 1, len(ds))
+        forecast = np.full(len(ds), 10.0)
+        if series_id == "worse":
+            forecast[30:] = 20.0
+        if series_id == "drift":
+            # Tracked closely, so only the values move, not the error
+            forecast = y + rng.normal(0, 0.5, len(ds))
+        frames.append(
+            pd.DataFrame(
+                {"unique_id": series_id, "ds": ds, "y": y, "forecast": forecast}
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _monitor(tmp_path, train):
+    return ForecastMonitor("test", path=tmp_path / "test.npz").set_reference(
+        train, seasonality=7, group_col="group"
+    )
+
+
+def test_degraded_and_drifted_series_are_flagged(tmp_path, train, actuals):
+    monitor = _monitor(tmp_path, train).ingest(actuals, "forecast")
+    status = monitor.status().set_index("unique_id")
+    assert status.loc["worse", "error_degraded"]
+    assert not status.loc["worse", "drifted"]
+    assert status.loc["drift", "drifted"]
+    assert not status.loc["drift", "error_degraded"]
+    assert not status.loc["stable", "degraded"]
+    assert monitor.retrain_queue() == ["worse", "drift"]
+
+
+def test_too_few_observations_are_never_flagged(tmp_path, train, actuals):
+    monitor = _monitor(tmp_path, train)
+    monitor.ingest(actuals.groupby("unique_id").head(5), "forecast")
+    assert not monitor.status()["degraded"].any()
+
+
+def test_save_load_round_trip_continues_the_statistics(tmp_path, train, actuals):
+    first = actuals[actuals["ds"] < "2024-03-21"]
+    rest = actuals[actuals["ds"] >= "2024-03-21"]
+    monitor = _monitor(tmp_path, train).ingest(first, "forecast")
+    monitor.save()
+    ForecastMonitor.load("test", path=tmp_path / "test.npz").ingest(
+        rest, "forecast"
+    ).save()
+
+    expected = _monitor(tmp_path, train).ingest(actuals, "forecast").status()
+    loaded = ForecastMonitor.load("test", path=tmp_path / "test.npz")
+    pd.testing.assert_frame_equal(loaded.status(), expected)
+
+
+def test_scores_match_hand_computed_wape(tmp_path, train, actuals):
+    monitor = _monitor(tmp_path, train).ingest(actuals, "forecast")
+    abs_err = (actuals["forecast"] - actuals["y"]).abs()
+    by_series = abs_err.groupby(actuals["unique_id"]).sum() / actuals.groupby(
+        "unique_id"
+    )["y"].sum()
+    scores = monitor.scores(["wape"])
+    np.testing.assert_allclose(scores["wape"], by_series.reindex(scores.index))
+
+    group = actuals["unique_id"].map({"stable": "a", "worse": "a", "drift": "b"})
+    by_group = abs_err.groupby(group).sum() / actuals.groupby(group)["y"].sum()
+    scores = monitor.scores(["wape"], level="group")
+    np.testing.assert_allclose(scores["wape"], by_group.reindex(scores.index))
+    overall = monitor.scores(["wape"], level="overall")["wape"].iloc[0]
+    assert overall == pytest.approx(abs_err.sum() / actuals["y"].sum())
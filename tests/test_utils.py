@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.helper.utils import series_hashes, split_series, stack_series
+
+
+def _panel(categories):
+    ds = pd.date_range("2023-01-01", periods=5)
+    return pd.DataFrame(
+        {
+            "unique_id": pd.Categorical(["b"] * 5 + ["a"] * 3, categories=categories),
+            "ds": list(ds) + list(ds[:3]),
+            "y": [1.0, 2.0, 3.0, 4.0, 5.0, 10.0, 20.0, 30.0],
+        }
+    )
+
+
+def test_split_series_with_unsorted_categories():
+    # Categories in non-lexical order, as load_data and user frames may give
+    for categories in (["b", "a"], ["a", "b"]):
+        df = _panel(categories).sample(frac=1, random_state=0)
+        ids, starts, ends, values, last_ds = split_series(df, "unique_id", "ds", "y")
+        series = {i: values[s:e].tolist() for i, s, e in zip(ids, starts, ends)}
+        assert series == {"a": [10.0, 20.0, 30.0], "b": [1.0, 2.0, 3.0, 4.0, 5.0]}
+        assert (ends - starts > 0).all()
+        panel, lengths = stack_series(starts, ends, values)
+        assert sorted(lengths.tolist()) == [3, 5]
+        assert dict(zip(ids, last_ds.day)) == {"a": 3, "b": 5}
+
+
+def test_split_series_empty():
+    df = _panel(["a", "b"]).iloc[:0]
+    ids, starts, ends, values, _ = split_series(df, "unique_id", "ds", "y")
+    assert len(ids) == len(starts) == len(ends) == len(values) == 0
+    assert np.asarray(starts).dtype.kind == "i"
+
+
+def test_series_hashes_with_unsorted_categories():
+    df = _panel(["b", "a"])
+    hashes = series_hashes(df, "unique_id", "ds", "y")
+    changed = df.copy()
+    changed.loc[changed["unique_id"] == "a", "y"] += 1
+    new_hashes = series_hashes(changed, "unique_id", "ds", "y")
+    assert new_hashes["a"] != hashes["a"]
+    assert new_hashes["b"] == hashes["b"]
+    # Rows of "b" alone hash to the same value as within the panel
+    alone = df[df["unique_id"] == "b"]
+    assert series_hashes(alone, "unique_id", "ds", "y")["b"] == hashes["b"]